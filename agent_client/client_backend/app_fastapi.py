@@ -9,12 +9,13 @@ import uuid
 import logging
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from dataclasses import asdict
 from contextlib import asynccontextmanager
 
+from json_codec import dumps_bytes, loads
 from isek_client import get_client, initialize_client, SessionConfig, MessageConfig, AgentConfig, NetworkStatus
 
 # Configure logging
@@ -41,12 +42,18 @@ async def lifespan(app: FastAPI):
         # Shutdown
         logger.info("Shutting down ISEK client")
 
+class CodecJSONResponse(JSONResponse):
+    """JSON response rendered by the shared codec (orjson/msgspec when installed)"""
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
+
 # Create FastAPI app with lifespan
 app = FastAPI(
     title="ISEK UI Backend",
     description="ISEK Node Client Integration with native async support",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=CodecJSONResponse
 )
 
 # Add CORS middleware
@@ -260,7 +267,7 @@ async def get_chat_history(sessionId: str):
 async def chat(request: Request):
     """Chat endpoint - Send message to agent through ISEK node"""
     try:
-        data = await request.json()
+        data = loads(await request.body())
         session_id = data.get('sessionId')
         messages = data.get('messages', [])
         system = data.get('system', '')
@@ -375,7 +382,6 @@ async def chat(request: Request):
 async def _create_streaming_response(response_data: Dict[str, Any]):
     """Create streaming response for chat"""
     import asyncio
-    import json
     
     content = response_data["aiMessage"]["content"]
     
@@ -394,7 +400,7 @@ async def _create_streaming_response(response_data: Dict[str, Any]):
         chunk_size = 3
         for i in range(0, len(text_to_send), chunk_size):
             text_chunk = text_to_send[i:i+chunk_size]
-            yield f'0:{{"type":"text","text":{json.dumps(text_chunk)}}}\n'
+            yield b'0:{"type":"text","text":' + dumps_bytes(text_chunk) + b'}\n'
             await asyncio.sleep(0.04)
     
     # Send tool calls if present
@@ -425,7 +431,7 @@ async def _create_streaming_response(response_data: Dict[str, Any]):
                     "toolName": tool_name,
                     "args": tool_call.get("function", {}).get("arguments", {})
                 }
-                yield f'0:{json.dumps(formatted_tool_call)}\n'
+                yield b'0:' + dumps_bytes(formatted_tool_call) + b'\n'
                 await asyncio.sleep(0.1)
     
     # Finish response
@@ -436,12 +442,11 @@ async def _create_streaming_response(response_data: Dict[str, Any]):
             "completionTokens": len(content) if isinstance(content, str) else 0
         }
     }
-    yield f'd:{json.dumps(finish_data)}\n'
+    yield b'd:' + dumps_bytes(finish_data) + b'\n'
 
 async def _simulate_team_formation_streaming(call_id: str, tool_call: Dict[str, Any]):
     """Simulate streaming progress for team formation using server data"""
     import asyncio
-    import json
     
     # Get initial data from server response
     server_args = tool_call.get("function", {}).get("arguments", {})
@@ -469,7 +474,7 @@ async def _simulate_team_formation_streaming(call_id: str, tool_call: Dict[str,
             "toolName": "team-formation", 
             "args": final_args
         }
-        yield f'0:{json.dumps(final_call)}\n'
+        yield b'0:' + dumps_bytes(final_call) + b'\n'
         return
     
     # Initial call with starting progress
@@ -485,7 +490,7 @@ async def _simulate_team_formation_streaming(call_id: str, tool_call: Dict[str,
             "members": []
         }
     }
-    yield f'0:{json.dumps(initial_call)}\n'
+    yield b'0:' + dumps_bytes(initial_call) + b'\n'
     await asyncio.sleep(0.8)
     
     # Simulate recruitment progress for each member
@@ -507,7 +512,7 @@ async def _simulate_team_formation_streaming(call_id: str, tool_call: Dict[str,
                 "members": current_members.copy()
             }
         }
-        yield f'0:{json.dumps(update_call)}\n'
+        yield b'0:' + dumps_bytes(update_call) + b'\n'
         await asyncio.sleep(0.6)
     
     # Final completion call
@@ -527,7 +532,7 @@ async def _simulate_team_formation_streaming(call_id: str, tool_call: Dict[str,
             }
         }
     }
-    yield f'0:{json.dumps(final_call)}\n'
+    yield b'0:' + dumps_bytes(final_call) + b'\n'
 
 @app.get("/health")
 async def health_check():
@@ -20,6 +20,7 @@ nest_asyncio.apply()
 
 from isek.node.node_v2 import Node
 from isek.node.etcd_registry import EtcdRegistry
+from json_codec import JSONDecodeError, dumps, loads
 from shared_formats import (
     create_chat_message_json, create_session_lifecycle_message_json, 
     parse_agent_response, AgentConfig
@@ -176,7 +177,7 @@ class ISEKClient:
                         else:
                             # Request adapter card info from the agent
                             try:
-                                request_message = json.dumps({
+                                request_message = dumps({
                                     "type": "agent_config_request",
                                     "node_id": node_id
                                 })
@@ -185,7 +186,7 @@ class ISEKClient:
                                 
                                 if agent_config_response and agent_config_response.strip():
                                     try:
-                                        config_data = json.loads(agent_config_response)
+                                        config_data = loads(agent_config_response)
                                         
                                         agent = AgentConfig(
                                             name=config_data.get('name', node_id),
@@ -197,7 +198,7 @@ class ISEKClient:
                                             address=metadata.get('url', '')
                                         )
                                         agents.append(agent)
-                                    except json.JSONDecodeError as json_err:
+                                    except JSONDecodeError as json_err:
                                         logger.warning(f"Failed to parse agent config for {node_id}")
                                         # Fallback to metadata or basic info
                                         agent = AgentConfig(
@@ -345,7 +346,7 @@ class ISEKClient:
         try:
             # Try to parse as JSON first
             if response.strip().startswith('{'):
-                data = json.loads(response)
+                data = loads(response)
                 return {
                     "content": data.get("content", response),
                     "tool_calls": data.get("tool_calls", []),
@@ -362,7 +363,7 @@ class ISEKClient:
                     "tool_calls": [],
                     "success": True
                 }
-        except json.JSONDecodeError:
+        except JSONDecodeError:
             # If not valid JSON, treat as plain text
             # Check for team formation keywords to simulate tool calls (for testing)
             if self._should_trigger_team_formation(response):
@@ -488,7 +489,7 @@ class ISEKClient:
                     return []
                 
                 try:
-                    request_message = json.dumps({
+                    request_message = dumps({
                         "type": "session_list_request",
                         "user_id": current_user_id,
                         "timestamp": datetime.now().isoformat(),
@@ -498,7 +499,7 @@ class ISEKClient:
                     # 使用超时来避免阻塞
                     response = self.node.send_message(agent.node_id, request_message)
                     if response and not ("Error:" in response and "failed" in response):
-                        session_data = json.loads(response)
+                        session_data = loads(response)
                         if session_data.get("success") and session_data.get("sessions"):
                             return session_data["sessions"]
                 except Exception as e:
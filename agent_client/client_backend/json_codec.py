@@ -0,0 +1,24 @@
+"""
+JSON codec for the client backend
+
+Loads agent_server/shared/json_codec.py itself rather than a copy, so both
+sides of the wire always encode and decode identically. See that module for
+the API and the ISEK_JSON_BACKEND switch.
+"""
+
+import importlib.util
+import os
+
+_SHARED_CODEC = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir,
+                             "agent_server", "shared", "json_codec.py")
+
+_spec = importlib.util.spec_from_file_location("isek_shared_json_codec", os.path.normpath(_SHARED_CODEC))
+_codec = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_codec)
+
+BACKEND = _codec.BACKEND
+BACKENDS = _codec.BACKENDS
+JSONDecodeError = _codec.JSONDecodeError
+dumps = _codec.dumps
+dumps_bytes = _codec.dumps_bytes
+loads = _codec.loads
@@ -7,7 +7,7 @@ from dataclasses import dataclass, field
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import uuid
-import json
+from json_codec import JSONDecodeError, dumps, loads
 
 
 @dataclass
@@ -58,6 +58,18 @@ class TaskMessage:
     request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
 
+@dataclass
+class SearchMessage:
+    """Full-text search over a user's session messages"""
+    type: str = "search"
+    user_id: str = ""  # client's node_id
+    query: str = ""
+    limit: int = 20
+    cursor: str = ""  # next_cursor from the previous page, empty for the first page
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+
 def create_chat_message_json(session_id: str, user_id: str, messages: List[Dict], 
                             system_prompt: str = "", user_message: str = "") -> str:
     """Create a standardized chat message JSON"""
@@ -68,7 +80,7 @@ def create_chat_message_json(session_id: str, user_id: str, messages: List[Dict]
         system_prompt=system_prompt,
         user_message=user_message
     )
-    return json.dumps({
+    return dumps({
         "type": msg.type,
         "session_id": msg.session_id,
         "user_id": msg.user_id,
@@ -87,7 +99,7 @@ def create_session_lifecycle_message_json(session_id: str, user_id: str, action:
         user_id=user_id,
         action=action
     )
-    return json.dumps({
+    return dumps({
         "type": msg.type,
         "session_id": msg.session_id,
         "user_id": msg.user_id,
@@ -105,7 +117,7 @@ def create_task_message_json(session_id: str, user_id: str, task_type: str, task
         task_type=task_type,
         task_data=task_data
     )
-    return json.dumps({
+    return dumps({
         "type": msg.type,
         "session_id": msg.session_id,
         "user_id": msg.user_id,
@@ -116,6 +128,25 @@ def create_task_message_json(session_id: str, user_id: str, task_type: str, task
     })
 
 
+def create_search_message_json(user_id: str, query: str, limit: int = 20, cursor: str = "") -> str:
+    """Create a standardized search message JSON"""
+    msg = SearchMessage(
+        user_id=user_id,
+        query=query,
+        limit=limit,
+        cursor=cursor
+    )
+    return dumps({
+        "type": msg.type,
+        "user_id": msg.user_id,
+        "query": msg.query,
+        "limit": msg.limit,
+        "cursor": msg.cursor,
+        "timestamp": msg.timestamp,
+        "request_id": msg.request_id
+    })
+
+
 def parse_agent_response(response_json: str) -> Dict[str, Any]:
     """Parse standardized agent response"""
     try:
@@ -141,7 +172,7 @@ def parse_agent_response(response_json: str) -> Dict[str, Any]:
                 "error": response_json.strip()
             }
         
-        data = json.loads(response_json)
+        data = loads(response_json)
         return {
             "success": data.get("success", False),
             "content": data.get("content", ""),
@@ -150,7 +181,7 @@ def parse_agent_response(response_json: str) -> Dict[str, Any]:
             "request_id": data.get("request_id", ""),
             "error": data.get("error", "")
         }
-    except json.JSONDecodeError as e:
+    except JSONDecodeError as e:
         # Log the raw response for debugging
         import logging
         logger = logging.getLogger(__name__)
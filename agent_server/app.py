@@ -13,6 +13,7 @@ from session_adapter import SessionAdapter
 
 # Import optional plugin modules
 from modules import DefaultSessionManager, DefaultTaskManager, DefaultMessageHandler
+from mapper import shutdown as shutdown_storage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -65,6 +66,9 @@ def main():
     except Exception as e:
         logger.error(f"Failed to start server: {e}")
         raise
+    finally:
+        # Flush queued message writes before the process exits
+        shutdown_storage()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -15,6 +15,9 @@ from isek.node.etcd_registry import EtcdRegistry
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
 from session_adapter import SessionAdapter
 from modules import DefaultSessionManager, DefaultTaskManager, DefaultMessageHandler
+from modules.idempotency import IdempotencyCache
+from modules.response_cache import response_cache_from_config
+from modules.scheduler import SessionScheduler
 
 
 # Load environment variables from .env file in project root
@@ -180,19 +183,22 @@ def main():
         members=[memory_tool_agent]
     )
 
-    # 3. Create SessionAdapter with the Agent Team
+    # 3. Load configuration
+    config = load_config()
+    
+    # 4. Create SessionAdapter with the Agent Team (caching, deduplication and worker pool as configured in config.json)
     session_adapter = SessionAdapter(
         agent=agent_team,  # Connect the agent team to the session adapter
         session_manager=DefaultSessionManager(),
         task_manager=DefaultTaskManager(),
-        message_handler=DefaultMessageHandler()
+        message_handler=DefaultMessageHandler(),
+        response_cache=response_cache_from_config(config.get("response_cache")),
+        idempotency=IdempotencyCache.from_dict(config.get("idempotency")),
+        scheduler=SessionScheduler.from_dict(config.get("scheduler"))
     )
     
-    # 4. Load configuration and start the Node Server with SessionAdapter
+    # 5. Start the Node Server with SessionAdapter
     try:
-        # Load configuration
-        config = load_config()
-        
         # Create etcd registry from config
         etcd_registry = EtcdRegistry(
             host=config["registry"]["host"], 
@@ -220,6 +226,8 @@ def main():
     except Exception as e:
         log.error(f"Failed to start Lyra Agent server: {e}")
         raise
+    finally:
+        session_adapter.shutdown()
     # print(server_node.adapter.run("random a number 0-10"))
 
 if __name__ == "__main__":
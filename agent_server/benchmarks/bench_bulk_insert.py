@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Per-row create_message versus batched create_messages.
+
+Creates --sessions sessions for one user, then inserts --messages messages
+spread over them, once through SessionService.create_message in a loop and
+once through SessionService.create_messages, each into a fresh database with
+the given durability mode. Both paths maintain session counters and the
+search index, so the resulting databases are equivalent.
+
+    python benchmarks/bench_bulk_insert.py --messages 50000 --durability sync
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mapper.backend import SqliteBackend
+from mapper.models import Session, Message
+from service.session_service import SessionService
+
+CREATOR_ID = "bench-user"
+
+
+def make_sessions(count: int):
+    return [Session(id=f"session-{i}", title=f"Session {i}", creatorId=CREATOR_ID,
+                    createdAt="2025-01-01T00:00:00", updatedAt="2025-01-01T00:00:00")
+            for i in range(count)]
+
+
+def make_messages(count: int, sessions: int):
+    return [Message(id=f"message-{n}", sessionId=f"session-{n % sessions}",
+                    content=f"message {n} of a synthetic conversation", tool="",
+                    role="user" if n % 2 == 0 else "assistant",
+                    timestamp=f"2025-01-01T00:00:{n:08d}", creatorId=CREATOR_ID)
+            for n in range(count)]
+
+
+def run(path: str, args, bulk: bool) -> float:
+    backend = SqliteBackend(path, durability=args.durability)
+    service = SessionService(backend)
+    service.create_sessions(make_sessions(args.sessions))
+    messages = make_messages(args.messages, args.sessions)
+    start = time.perf_counter()
+    if bulk:
+        service.create_messages(messages, CREATOR_ID)
+    else:
+        for message in messages:
+            service.create_message(message, CREATOR_ID)
+    backend.flush()
+    seconds = time.perf_counter() - start
+    backend.close()
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--durability", choices=["sync", "group", "async"], default="sync")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        per_row = run(os.path.join(workdir, "per_row.db"), args, bulk=False)
+        bulk = run(os.path.join(workdir, "bulk.db"), args, bulk=True)
+
+    print(f"{args.messages} messages over {args.sessions} sessions, durability={args.durability}")
+    print(f"create_message loop: {per_row:.2f}s  {args.messages / per_row:,.0f} msg/s")
+    print(f"create_messages:     {bulk:.2f}s  {args.messages / bulk:,.0f} msg/s  ({per_row / bulk:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Prompt construction per chat turn: last-N history re-read versus the
+incremental token-budgeted context window.
+
+Plays --turns turns in each of --sessions sessions against a real
+SessionService. Each turn stores the user's message, builds the agent prompt,
+then stores the reply. Most messages are short; every --long-every-th user
+message is a --long-chars paste. The prompt is built two ways:
+
+  last-n   the previous DefaultMessageHandler logic: read the last 10
+           messages, rebuild the history list and json-serialize the whole
+           inbound payload around it
+  window   modules.context_window: seed once, then read only messages newer
+           than the window's last seq and join cached JSON fragments,
+           trimmed to --budget estimated tokens
+
+Reports build time per turn (storage reads included) and prompt size.
+
+    python benchmarks/bench_context_window.py --sessions 20 --turns 100 --budget 3000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mapper.backend import SqliteBackend
+from mapper.models import Session, Message
+from modules.context_window import ContextWindowCache
+from service.session_service import SessionService
+from shared.json_codec import dumps
+
+CREATOR_ID = "bench-user"
+LEGACY_HISTORY_WINDOW = 10
+
+
+def legacy_prompt(service: SessionService, data: dict) -> str:
+    """_create_agent_prompt as it was, including the history read before it"""
+    history = service.get_last_messages(data["session_id"], CREATOR_ID, LEGACY_HISTORY_WINDOW)
+    messages = [{"role": m.role, "content": m.content} for m in history[-LEGACY_HISTORY_WINDOW:]]
+    messages.append({"role": "user", "content": data["user_message"]})
+    enriched = data.copy()
+    enriched["messages"] = messages
+    return dumps(enriched)
+
+
+def window_prompt(service: SessionService, windows: ContextWindowCache, data: dict) -> str:
+    """DefaultMessageHandler._context_window followed by _create_agent_prompt"""
+    session_id = data["session_id"]
+    window = windows.get(session_id, CREATOR_ID)
+    if window is not None:
+        messages = service.get_messages_since(session_id, CREATOR_ID, window.last_seq, windows.seed_messages)
+        if len(messages) < windows.seed_messages:
+            window.extend(messages)
+        else:
+            window = None
+    if window is None:
+        messages = service.get_last_messages(session_id, CREATOR_ID, windows.seed_messages)
+        window = windows.seed(session_id, CREATOR_ID, messages)
+    head = dumps({key: value for key, value in data.items() if key != "messages"})
+    return f'{head[:-1]},"messages":{window.messages_json("user", data["user_message"])}}}'
+
+
+def play(args, strategy: str, workdir: str):
+    backend = SqliteBackend(os.path.join(workdir, f"{strategy}.db"))
+    service = SessionService(backend)
+    windows = ContextWindowCache(token_budget=args.budget)
+    sessions = [f"session-{s}" for s in range(args.sessions)]
+    service.create_sessions(Session(id=session_id, title=session_id, creatorId=CREATOR_ID) for session_id in sessions)
+    client_history = {session_id: [] for session_id in sessions}
+    timings, sizes = [], []
+    for turn in range(args.turns):
+        for session_id in sessions:
+            text = (f"turn {turn}: " + "pasted log line with some detail\n" * (args.long_chars // 33)
+                    if args.long_every and turn % args.long_every == args.long_every - 1
+                    else f"turn {turn}: a short question about the previous answer")
+            service.create_message(Message(id=f"{session_id}-u{turn}", sessionId=session_id, content=text,
+                                           role="user", creatorId=CREATOR_ID), CREATOR_ID)
+            # The client sends its own copy of the conversation with every message
+            data = {"type": "chat", "session_id": session_id, "user_id": CREATOR_ID,
+                    "messages": client_history[session_id], "system_prompt": "", "user_message": text,
+                    "timestamp": "2025-01-01T00:00:00", "request_id": f"r-{turn}"}
+            start = time.perf_counter()
+            if strategy == "last-n":
+                prompt = legacy_prompt(service, data)
+            else:
+                prompt = window_prompt(service, windows, data)
+            timings.append(time.perf_counter() - start)
+            sizes.append(len(prompt))
+            reply = f"answer {turn}: " + "explanation " * 20
+            service.create_message(Message(id=f"{session_id}-a{turn}", sessionId=session_id, content=reply,
+                                           role="assistant", creatorId=CREATOR_ID), CREATOR_ID)
+            client_history[session_id] = client_history[session_id] + [
+                {"role": "user", "content": text}, {"role": "assistant", "content": reply}]
+    backend.close()
+    return timings, sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=100, help="turns per session")
+    parser.add_argument("--budget", type=int, default=3000, help="context window token budget")
+    parser.add_argument("--long-every", type=int, default=10, help="every Nth user message is a long paste (0: never)")
+    parser.add_argument("--long-chars", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.turns} turns, budget {args.budget} tokens")
+    print(f"{'strategy':>8} {'mean us':>9} {'p99 us':>9} {'mean bytes':>11} {'max bytes':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for strategy in ("last-n", "window"):
+            timings, sizes = play(args, strategy, workdir)
+            timings.sort()
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            print(f"{strategy:>8} {sum(timings) / len(timings) * 1e6:>9.1f} {p99 * 1e6:>9.1f} "
+                  f"{sum(sizes) / len(sizes):>11,.0f} {max(sizes):>10,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+ISEK envelope extraction: legacy regex/replace parser versus the one-pass decoder.
+
+Wraps chat messages of --sizes bytes in the string form of an A2A message
+(what the node hands the adapter) and times extracting the JSON payload
+with the previous DefaultMessageHandler logic and with
+modules.envelope.extract_envelope_text. Each size is measured for three
+payloads: plain ASCII, "escaped" (newlines, tabs and double quotes, as
+typical chat JSON carries) and "tricky" (also single quotes, backslashes
+and non-ASCII text). The "ok" column shows whether the extracted text
+equals the original payload.
+
+    python benchmarks/bench_envelope.py --sizes 1024 65536 1048576
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules.envelope import extract_envelope_text
+
+
+def legacy_extract(message: str) -> str:
+    """The extraction DefaultMessageHandler.parse_message used before the envelope decoder"""
+    if "contextId=" in message and "messageId=" in message and "parts=[Part(root=TextPart(" in message:
+        import re
+        json_match = re.search(r"text='([^']*)'", message)
+        if not json_match:
+            raise ValueError("Could not extract JSON from ISEK message wrapper")
+        json_str = json_match.group(1)
+        return json_str.replace('\\"', '"').replace('\\\\', '\\')
+    raise ValueError("not an envelope")
+
+
+FILLERS = {
+    "plain": "plain ascii chat text ",
+    "escaped": "first line\n\tsecond \"quoted\" line ",
+    "tricky": "It's a \"quoted\" C:\\path — 多语言 ",
+}
+
+
+def make_payload(size: int, kind: str) -> str:
+    filler = FILLERS[kind]
+    text = (filler * (size // len(filler) + 1))[:size]
+    return json.dumps({"type": "chat", "user_id": "bench-user", "session_id": "bench-session",
+                       "user_message": text, "request_id": "bench"}, ensure_ascii=False)
+
+
+def make_envelope(payload: str) -> str:
+    return (f"contextId='ctx-1' extensions=None kind='message' messageId='msg-1' metadata=None "
+            f"parts=[Part(root=TextPart(kind='text', metadata=None, text={payload!r}))] "
+            f"referenceTaskIds=None role=<Role.user: 'user'> taskId=None")
+
+
+def measure(fn, envelope: str, payload: str, repeat: int):
+    try:
+        ok = fn(envelope) == payload
+    except ValueError:
+        return None, False
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(envelope)
+    return (time.perf_counter() - start) / repeat, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 16384, 262144, 1048576])
+    parser.add_argument("--repeat", type=int, default=0, help="iterations per case (default: scaled by size)")
+    args = parser.parse_args()
+
+    print(f"{'size':>9} {'payload':>8} {'parser':>8} {'us/op':>11} {'MB/s':>9} {'ok':>4}")
+    for size in args.sizes:
+        repeat = args.repeat or max(5, 2_000_000 // size)
+        for kind in FILLERS:
+            payload = make_payload(size, kind)
+            envelope = make_envelope(payload)
+            for name, fn in (("legacy", legacy_extract), ("decoder", extract_envelope_text)):
+                seconds, ok = measure(fn, envelope, payload, repeat)
+                if seconds is None:
+                    print(f"{size:>9} {kind:>8} {name:>8} {'error':>11} {'':>9} {'no':>4}")
+                    continue
+                print(f"{size:>9} {kind:>8} {name:>8} {seconds * 1e6:>11.1f} "
+                      f"{len(envelope) / seconds / 1e6:>9.0f} {'yes' if ok else 'no':>4}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Retried chat requests with and without request_id deduplication.
+
+Sends --requests distinct chat messages through SessionAdapter.run from
+--threads threads, each delivered 1 + --retries times (as ISEK's
+send_message and the client's rediscovery retry do), half of the copies
+while the first is still running and half after it finished. The agent
+sleeps --agent-ms per call. Reports agent calls, stored session messages and
+wall time with deduplication defeated (every copy gets its own request_id,
+as if the server ignored it) and working (copies share the request_id).
+
+    python benchmarks/bench_idempotency.py --requests 200 --retries 2 --agent-ms 20
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mapper.backend import SqliteBackend
+from mapper.models import Session
+from modules.session_manager import DefaultSessionManager
+from service.session_service import SessionService
+from session_adapter import SessionAdapter
+from shared import create_chat_message, dumps
+
+CREATOR_ID = "bench-user"
+
+
+class SleepyAgent:
+    """Stands in for a model call: fixed latency, counts calls"""
+    name = "bench-agent"
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def run(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.seconds)
+        return "answer " * 20
+
+
+def play(args, dedupe: bool, workdir: str):
+    backend = SqliteBackend(os.path.join(workdir, f"{dedupe}.db"))
+    service = SessionService(backend)
+    manager = DefaultSessionManager.__new__(DefaultSessionManager)
+    manager.session_service = service
+    sessions = [f"session-{n}" for n in range(args.requests)]
+    service.create_sessions(Session(id=session_id, title=session_id, creatorId=CREATOR_ID) for session_id in sessions)
+    agent = SleepyAgent(args.agent_ms / 1000)
+    adapter = SessionAdapter(agent=agent, session_manager=manager)
+
+    def deliver(session_id: str):
+        copies = []
+        for copy in range(1 + args.retries):
+            message = create_chat_message(session_id, CREATOR_ID, [], user_message=f"question for {session_id}")
+            message["request_id"] = f"{session_id}-r" if dedupe else f"{session_id}-r{copy}"
+            copies.append(dumps(message))
+        # Retries race the original for half the copies, and follow it for the rest
+        with ThreadPoolExecutor(max_workers=len(copies)) as racing:
+            racing.map(adapter.run, copies[:len(copies) // 2 + 1])
+        for message in copies[len(copies) // 2 + 1:]:
+            adapter.run(message)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(deliver, sessions))
+    elapsed = time.perf_counter() - start
+    stored = sum(len(service.get_last_messages(session_id, CREATOR_ID, 100)) for session_id in sessions)
+    backend.close()
+    return agent.calls, stored, elapsed, adapter.get_idempotency_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--retries", type=int, default=2, help="extra deliveries of every request")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--agent-ms", type=float, default=20, help="simulated model latency per call")
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests x {1 + args.retries} deliveries, agent {args.agent_ms} ms per call")
+    print(f"{'dedupe':>6} {'agent calls':>12} {'stored msgs':>12} {'wall s':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for dedupe in (False, True):
+            calls, stored, elapsed, stats = play(args, dedupe, workdir)
+            print(f"{'on' if dedupe else 'off':>6} {calls:>12} {stored:>12} {elapsed:>8.2f}")
+    print("metrics:", stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Index benchmark: per-session lookup cost as the message table grows.
+
+Builds databases of increasing size with and without the lookup indexes
+(schema version 1 vs. latest) and times get_messages_by_session,
+get_sessions and get_by_session_id against a random sample of sessions.
+
+    python benchmarks/bench_indexes.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mapper.engine import SqliteEngine
+from mapper.migrations import migrate, LATEST_VERSION
+from mapper.session_mapper import SessionMapper
+from mapper.message_mapper import MessageMapper
+from mapper.task_mapper import TaskMapper
+
+MESSAGE_INSERT = ('INSERT INTO message (id, sessionId, content, tool, role, timestamp, creatorId) '
+                  'VALUES (?, ?, ?, ?, ?, ?, ?)')
+MESSAGES_PER_SESSION = 50
+# Schema version that adds per-session message sequence numbers
+SEQUENCE_VERSION = 7
+SESSIONS_PER_USER = 20
+
+
+def populate(engine: SqliteEngine, total_messages: int):
+    """Bulk-load synthetic users, sessions, tasks and messages"""
+    session_count = max(1, total_messages // MESSAGES_PER_SESSION)
+    sessions = []
+    for i in range(session_count):
+        creator_id = f"user-{i // SESSIONS_PER_USER}"
+        sessions.append((f"session-{i}", f"Session {i}", creator_id, f"2025-01-01T00:{i % 60:02d}:00"))
+
+    engine.executemany(
+        'INSERT INTO session (id, title, creatorId, createdAt, updatedAt) VALUES (?, ?, ?, ?, ?)',
+        [(sid, title, creator, ts, ts) for sid, title, creator, ts in sessions]
+    )
+    engine.executemany(
+        'INSERT INTO task (id, sessionId, title, status, creatorId) VALUES (?, ?, ?, ?, ?)',
+        [(str(uuid.uuid4()), sid, 'task', 'init', creator) for sid, _, creator, _ in sessions]
+    )
+
+    batch = []
+    for n in range(total_messages):
+        sid, _, creator, _ = sessions[n % session_count]
+        batch.append((str(uuid.uuid4()), sid, '"hello"', '""', 'user',
+                      f"2025-01-01T00:00:{n:012d}", creator))
+        if len(batch) >= 50000:
+            engine.executemany(MESSAGE_INSERT, batch)
+            batch = []
+    if batch:
+        engine.executemany(MESSAGE_INSERT, batch)
+    return sessions
+
+
+def time_lookups(fn, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e6
+
+
+def run(size: int, version: int, samples: int, workdir: str):
+    db_path = os.path.join(workdir, f"bench-{size}-v{version}.db")
+    engine = SqliteEngine(db_path)
+    # Raw inserts carry no sequence numbers; populate below the seq migration
+    # and let mapper construction backfill them.
+    migrate(engine, target=min(version, SEQUENCE_VERSION - 1))
+    sessions = populate(engine, size)
+
+    session_mapper = SessionMapper(engine=engine)
+    message_mapper = MessageMapper(engine=engine)
+    task_mapper = TaskMapper(engine=engine)
+    # Mapper construction migrates to the latest schema; roll the indexes back
+    # for the unindexed baseline.
+    if version < 2:
+        for index in ('idx_message_session_seq', 'idx_session_creator_updated', 'idx_task_session_creator'):
+            engine.execute(f'DROP INDEX IF EXISTS {index}')
+
+    sample = random.sample(sessions, min(samples, len(sessions)))
+    results = {
+        "get_messages_by_session": time_lookups(message_mapper.get_messages_by_session,
+                                                [(s[0],) for s in sample]),
+        "get_sessions": time_lookups(session_mapper.get_sessions, [(s[2],) for s in sample]),
+        "get_by_session_id": time_lookups(task_mapper.get_by_session_id, [(s[0], s[2]) for s in sample]),
+    }
+    engine.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'messages':>10} {'schema':>8} {'get_messages_by_session':>24} "
+              f"{'get_sessions':>14} {'get_by_session_id':>18}   (us/op)")
+        for size in args.sizes:
+            for version in (1, LATEST_VERSION):
+                r = run(size, version, args.samples, workdir)
+                label = "indexed" if version >= 2 else "none"
+                print(f"{size:>10} {label:>8} {r['get_messages_by_session']:>24.1f} "
+                      f"{r['get_sessions']:>14.1f} {r['get_by_session_id']:>18.1f}")
+
+
+if __name__ == '__main__':
+    main()
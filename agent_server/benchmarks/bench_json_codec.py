@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+JSON encode/decode cost of typical chat and task payloads per codec backend.
+
+Builds the messages the adapter exchanges with clients -- a chat message
+carrying --history prior turns, an agent response with tool calls, and a
+task message with nested task_data -- and times, for each backend that is
+importable here:
+
+  dumps        object -> str (what the ISEK transport sends)
+  dumps_bytes  object -> bytes (HTTP bodies, archive segments)
+  loads        str -> object
+
+"stdlib" is the call the code used before the codec module
+(json.dumps(..., ensure_ascii=False) / json.loads); the other rows go
+through shared.json_codec with the named backend forced.
+
+    python benchmarks/bench_json_codec.py --history 20 --repeat 20000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared import create_agent_response, create_chat_message, create_task_message
+from shared.json_codec import BACKENDS, _select_backend
+
+
+def make_payloads(history: int):
+    turns = [{"role": "user" if n % 2 == 0 else "assistant",
+              "content": f"turn {n}: can you summarise the previous answer — 要点是什么？ " * 3}
+             for n in range(history)]
+    chat = create_chat_message(str(uuid.uuid4()), "bench-user", turns,
+                               system_prompt="You are a helpful assistant.", user_message="What next?")
+    response = create_agent_response(
+        content="Here is the plan:\n1. gather\n2. \"verify\"\n3. ship",
+        tool_calls=[{"id": f"call_{n}", "type": "function",
+                     "function": {"name": "team-formation",
+                                  "arguments": {"members": [{"name": f"member-{m}", "role": "analyst"}
+                                                            for m in range(4)],
+                                                "progress": 0.5, "status": "recruiting"}}}
+                    for n in range(3)],
+        request_id=str(uuid.uuid4()))
+    task = create_task_message(str(uuid.uuid4()), "bench-user", "batch_analysis", {
+        "items": [{"id": n, "score": n / 7, "tags": ["a", "b", "c"], "ok": n % 3 == 0}
+                  for n in range(50)],
+        "created_at": datetime.now().isoformat(),
+    })
+    return {"chat": chat, "response": response, "task": task}
+
+
+def stdlib_codec():
+    return ("stdlib", lambda obj: json.dumps(obj, ensure_ascii=False),
+            lambda obj: json.dumps(obj, ensure_ascii=False).encode("utf-8"), json.loads)
+
+
+def codecs():
+    yield stdlib_codec()
+    for name in BACKENDS:
+        backend, dumps, dumps_bytes, loads = _select_backend(name)
+        if backend == name:
+            yield f"codec:{name}", dumps, dumps_bytes, loads
+        else:
+            print(f"# {name} not installed, skipped")
+
+
+def per_call(fn, arg, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(arg)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=20, help="prior turns carried by the chat message")
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.history)
+    available = list(codecs())
+    print(f"{'payload':>9} {'bytes':>7} {'codec':>14} {'dumps us':>9} {'bytes us':>9} {'loads us':>9} {'speedup':>8}")
+    for kind, payload in payloads.items():
+        text = json.dumps(payload, ensure_ascii=False)
+        baseline = None
+        for name, dumps, dumps_bytes, loads in available:
+            assert loads(dumps(payload)) == payload
+            timings = [per_call(dumps, payload, args.repeat), per_call(dumps_bytes, payload, args.repeat),
+                       per_call(loads, text, args.repeat)]
+            total = sum(timings)
+            baseline = baseline or total
+            print(f"{kind:>9} {len(text.encode('utf-8')):>7} {name:>14} "
+                  + " ".join(f"{seconds * 1e6:>9.2f}" for seconds in timings)
+                  + f" {baseline / total:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
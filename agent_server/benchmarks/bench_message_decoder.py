@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Inbound message validation: hand-written if-chains on dicts versus the
+typed decoders.
+
+Builds each message type a client sends (chat with --history prior turns,
+session_lifecycle, task, search, agent_config_request) as JSON text and
+measures messages/second for:
+
+  legacy   json parse + the per-type if/elif validation parse_message used
+           before the decoders (result: the dict)
+  decoder  shared.message_decoder.decode_message on the JSON text (result:
+           the slotted dataclass; msgspec parses and validates the tagged
+           Structs in one pass, the legacy decoder parses with
+           shared.json_codec first)
+
+The legacy path parses with the shared.json_codec backend. "mix" cycles
+through all types.
+Set ISEK_MESSAGE_DECODER=legacy to measure the fallback decoder.
+
+    python benchmarks/bench_message_decoder.py --repeat 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared import (create_chat_message, create_search_message, create_session_lifecycle_message,
+                    create_task_message, decode_message, dumps)
+from shared.json_codec import BACKEND, loads
+from shared.message_decoder import BACKEND as DECODER_BACKEND, MAX_SEARCH_LIMIT
+
+
+def legacy_parse(text: str) -> dict:
+    """The validation DefaultMessageHandler.parse_message ran before the typed decoders"""
+    data = loads(text)
+    msg_type = data.get("type")
+    if not msg_type:
+        raise ValueError("Message must contain 'type' field")
+    if msg_type == "chat":
+        for field in ["user_id", "session_id", "user_message"]:
+            if field not in data:
+                raise ValueError(f"Chat message missing required field: {field}")
+        if not data["user_message"].strip():
+            raise ValueError("Chat message cannot be empty")
+    elif msg_type == "agent_config_request":
+        if "node_id" not in data:
+            raise ValueError("agent_config_request missing required field: node_id")
+    elif msg_type == "session_lifecycle":
+        for field in ["action", "session_id", "user_id"]:
+            if field not in data:
+                raise ValueError(f"session_lifecycle message missing required field: {field}")
+    elif msg_type == "task":
+        if "task_type" not in data:
+            raise ValueError("task message missing required field: task_type")
+    elif msg_type == "search":
+        for field in ["user_id", "query"]:
+            if field not in data:
+                raise ValueError(f"search message missing required field: {field}")
+        if not str(data["query"]).strip():
+            raise ValueError("Search query cannot be empty")
+        limit = data.get("limit", 20)
+        if not isinstance(limit, int) or not 1 <= limit <= MAX_SEARCH_LIMIT:
+            raise ValueError(f"search limit must be an integer between 1 and {MAX_SEARCH_LIMIT}")
+    else:
+        raise ValueError(f"Unsupported message type: {msg_type}")
+    return data
+
+
+def typed_parse(text: str):
+    return decode_message(text)
+
+
+def make_messages(history: int) -> dict:
+    turns = [{"role": "user" if n % 2 == 0 else "assistant", "content": f"turn {n} of the conversation"}
+             for n in range(history)]
+    return {
+        "chat": dumps(create_chat_message("session-1", "user-1", turns, user_message="What next?")),
+        "session_lifecycle": dumps(create_session_lifecycle_message("session-1", "user-1", "created")),
+        "task": dumps(create_task_message("session-1", "user-1", "summarize", {"limit": 5, "tags": ["a", "b"]})),
+        "search": dumps(create_search_message("user-1", "quarterly report", limit=10)),
+        "agent_config_request": dumps({"type": "agent_config_request", "node_id": "agent-1"}),
+    }
+
+
+def rate(fn, texts, repeat: int) -> float:
+    """Messages per second of fn over `repeat` messages cycling through texts"""
+    count = len(texts)
+    start = time.perf_counter()
+    for n in range(repeat):
+        fn(texts[n % count])
+    return repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=0, help="prior turns carried by chat messages")
+    parser.add_argument("--repeat", type=int, default=100000, help="messages per measurement")
+    args = parser.parse_args()
+
+    messages = make_messages(args.history)
+    cases = [(kind, [text]) for kind, text in messages.items()] + [("mix", list(messages.values()))]
+    print(f"json backend: {BACKEND}, decoder: {DECODER_BACKEND}")
+    print(f"{'message':>21} {'legacy msg/s':>13} {'decoder msg/s':>14} {'speedup':>8}")
+    for kind, texts in cases:
+        legacy = rate(legacy_parse, texts, args.repeat)
+        typed = rate(typed_parse, texts, args.repeat)
+        print(f"{kind:>21} {legacy:>13,.0f} {typed:>14,.0f} {typed / legacy:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Row materialization cost: dict rows + eager JSON decoding versus slotted
+models built from tuples with lazy content decoding.
+
+Seeds one session with --messages messages, then loads them repeatedly
+through two paths:
+
+  legacy  SELECT * with sqlite3.Row, dict(row), json.loads of content and
+          tool for every row, then a plain @dataclass (the old Message)
+  slotted MessageMapper.get_messages_by_session (tuple row factory,
+          __slots__, content/tool decoded on first access)
+
+Each path is measured without touching content (list views, counters) and
+with content read on every message, reporting wall time and the
+tracemalloc peak of the materialized list.
+
+    python benchmarks/bench_models.py --messages 100000 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mapper.backend import SqliteBackend
+from mapper.codec import decode_payload
+from mapper.models import Session, Message
+from service.session_service import SessionService
+
+CREATOR_ID = "bench-user"
+SESSION_ID = "bench-session"
+
+
+@dataclass
+class LegacyMessage:
+    id: str
+    sessionId: str
+    content: Any
+    tool: Any
+    role: str
+    timestamp: str
+    creatorId: str
+    seq: int
+    ts: int
+
+
+def load_legacy(path: str):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute('SELECT * FROM message WHERE sessionId = ? ORDER BY seq', (SESSION_ID,)).fetchall()
+    messages = []
+    for row in rows:
+        data = dict(row)
+        codec = data.pop('codec')
+        data['content'] = json.loads(decode_payload(data['content'], codec))
+        data['tool'] = json.loads(decode_payload(data['tool'], codec))
+        messages.append(LegacyMessage(**data))
+    conn.close()
+    return messages
+
+
+def measure(load, touch: bool, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        messages = load()
+        if touch:
+            for message in messages:
+                message.content
+        best = min(best, time.perf_counter() - start)
+        del messages
+    tracemalloc.start()
+    messages = load()
+    if touch:
+        for message in messages:
+            message.content
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "models.db")
+        backend = SqliteBackend(path)
+        service = SessionService(backend)
+        service.create_session(Session(id=SESSION_ID, title="bench", creatorId=CREATOR_ID))
+        service.create_messages([
+            Message(id=f"message-{n}", sessionId=SESSION_ID,
+                    content={"text": f"message {n} of a synthetic conversation", "index": n},
+                    tool=[{"name": "search", "arguments": {"q": f"query {n}"}}] if n % 4 == 0 else "",
+                    role="user" if n % 2 == 0 else "assistant",
+                    timestamp=f"2025-01-01T00:00:{n:08d}", creatorId=CREATOR_ID)
+            for n in range(args.messages)], CREATOR_ID)
+        backend.flush()
+        mapper = backend.mappers(CREATOR_ID).message_mapper
+
+        paths = [
+            ("legacy", lambda: load_legacy(path)),
+            ("slotted", lambda: mapper.get_messages_by_session(SESSION_ID)),
+        ]
+        print(f"{args.messages} messages, best of {args.repeat}")
+        for touch in (False, True):
+            results = {name: measure(load, touch, args.repeat) for name, load in paths}
+            label = "content read" if touch else "no content access"
+            legacy_seconds, legacy_peak = results["legacy"]
+            for name, (seconds, peak) in results.items():
+                print(f"{label:18} {name:8} {seconds * 1000:8.1f} ms  peak {peak / 2**20:7.1f} MiB"
+                      f"  ({legacy_seconds / seconds:.1f}x time, {legacy_peak / peak:.1f}x memory)")
+        backend.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Agent response cache: request latency with and without caching.
+
+Sends --requests chat messages through SessionAdapter.arun to an agent that
+sleeps --agent-ms per call. Prompts are drawn from --distinct texts with a
+Zipf-like skew (a few prompts are very common, as with prompt-optimization
+requests); about half of the repeats differ only in whitespace. Runs once
+without a cache and once with a ResponseCache, then reports latency
+percentiles and the cache's hit/miss metrics. A second section times bare
+ResponseCache get/put.
+
+    python benchmarks/bench_response_cache.py --requests 2000 --distinct 200 --agent-ms 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from modules.response_cache import ResponseCache, response_key
+from session_adapter import SessionAdapter
+from shared import create_chat_message, dumps
+
+
+class SleepyAgent:
+    """Stands in for a model call: fixed latency, deterministic reply"""
+    name = "bench-agent"
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.calls = 0
+
+    async def arun(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        return f"optimized: {prompt[:200]}"
+
+
+def make_requests(args):
+    rng = random.Random(args.seed)
+    texts = [f"Optimize this prompt for ChatGPT: write a {n}-step plan for launching product {n}"
+             for n in range(args.distinct)]
+    weights = [1 / (rank + 1) for rank in range(args.distinct)]
+    requests = []
+    for _ in range(args.requests):
+        text = rng.choices(texts, weights)[0]
+        if rng.random() < 0.5:
+            text = "  " + text.replace(" ", "  ", 2) + "\n"
+        requests.append(dumps(create_chat_message("", "bench-user", [], user_message=text)))
+    return requests
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def play(adapter: SessionAdapter, requests):
+    latencies = []
+    for request in requests:
+        start = time.perf_counter()
+        await adapter.arun(request)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--distinct", type=int, default=200, help="distinct prompt texts")
+    parser.add_argument("--agent-ms", type=float, default=20, help="simulated model latency per call")
+    parser.add_argument("--max-bytes", type=int, default=64 * 2**20)
+    parser.add_argument("--ttl", type=float, default=3600)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    requests = make_requests(args)
+    print(f"{args.requests} requests over {args.distinct} prompts, agent {args.agent_ms} ms per call")
+    print(f"{'cache':>6} {'agent calls':>12} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    cache = None
+    for cache in (None, ResponseCache(max_bytes=args.max_bytes, ttl_seconds=args.ttl)):
+        agent = SleepyAgent(args.agent_ms / 1000)
+        adapter = SessionAdapter(agent=agent, response_cache=cache)
+        latencies = asyncio.run(play(adapter, requests))
+        print(f"{'on' if cache else 'off':>6} {agent.calls:>12} {sum(latencies) / len(latencies) * 1000:>9.3f} "
+              f"{percentile(latencies, 0.5) * 1000:>9.3f} {percentile(latencies, 0.99) * 1000:>9.3f}")
+    print("metrics:", cache.stats())
+
+    keys = [response_key("bench-agent", f"prompt {n}") for n in range(10000)]
+    for key in keys:
+        cache.put(key, "reply " * 100)
+    start = time.perf_counter()
+    for key in keys:
+        cache.get(key)
+    get_us = (time.perf_counter() - start) / len(keys) * 1e6
+    start = time.perf_counter()
+    for n in range(len(keys)):
+        response_key("bench-agent", f"prompt {n}")
+    key_us = (time.perf_counter() - start) / len(keys) * 1e6
+    print(f"response_key {key_us:.2f} us, get (hit) {get_us:.2f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Agent runs across sessions: worker pool size versus throughput, latency and
+per-session ordering.
+
+Sends --turns chat turns in each of --sessions sessions through
+SessionAdapter.arun all at once, interleaved across sessions, against a
+real SessionService and an agent that blocks for --agent-ms per call. Each
+pool size in --workers is played in turn; a pool of 1 is the old behaviour
+of running every agent call inline, one after the other. Reports wall time,
+mean and p99 request latency, whether any session saw its turns out of order
+or overlapping, and the scheduler's queue metrics.
+
+    python benchmarks/bench_scheduler.py --sessions 16 --turns 5 --agent-ms 50 --workers 1 4 8 16
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mapper.backend import SqliteBackend
+from mapper.models import Session
+from modules.scheduler import SessionScheduler
+from modules.session_manager import DefaultSessionManager
+from service.session_service import SessionService
+from session_adapter import SessionAdapter
+from shared import create_chat_message, dumps, loads
+
+CREATOR_ID = "bench-user"
+
+
+class SleepyAgent:
+    """Stands in for a blocking model call; records the turn order and overlap per session"""
+    name = "bench-agent"
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.turns = {}
+        self.busy = set()
+        self.overlaps = 0
+        self._lock = threading.Lock()
+
+    def run(self, prompt: str) -> str:
+        data = loads(prompt)
+        session_id = data["session_id"]
+        with self._lock:
+            if session_id in self.busy:
+                self.overlaps += 1
+            self.busy.add(session_id)
+            self.turns.setdefault(session_id, []).append(int(data["user_message"].split()[1]))
+        time.sleep(self.seconds)
+        with self._lock:
+            self.busy.discard(session_id)
+        return f"answer to {data['user_message']}"
+
+
+async def timed(adapter: SessionAdapter, message: str) -> float:
+    start = time.perf_counter()
+    await adapter.arun(message)
+    return time.perf_counter() - start
+
+
+def play(args, workers: int, workdir: str):
+    backend = SqliteBackend(os.path.join(workdir, f"{workers}.db"))
+    service = SessionService(backend)
+    manager = DefaultSessionManager.__new__(DefaultSessionManager)
+    manager.session_service = service
+    sessions = [f"session-{n}" for n in range(args.sessions)]
+    service.create_sessions(Session(id=session_id, title=session_id, creatorId=CREATOR_ID) for session_id in sessions)
+    agent = SleepyAgent(args.agent_ms / 1000)
+    scheduler = SessionScheduler(max_workers=workers)
+    adapter = SessionAdapter(agent=agent, session_manager=manager, scheduler=scheduler)
+    messages = [dumps(create_chat_message(session_id, CREATOR_ID, [], user_message=f"turn {turn}"))
+                for turn in range(args.turns) for session_id in sessions]
+
+    async def run_all():
+        return await asyncio.gather(*(timed(adapter, message) for message in messages))
+
+    start = time.perf_counter()
+    latencies = sorted(asyncio.run(run_all()))
+    elapsed = time.perf_counter() - start
+    in_order = all(turns == sorted(turns) for turns in agent.turns.values())
+    stats = scheduler.stats()
+    scheduler.shutdown()
+    backend.close()
+    return elapsed, latencies, in_order and not agent.overlaps, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=5, help="turns per session")
+    parser.add_argument("--agent-ms", type=float, default=50, help="simulated model latency per call")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16], help="pool sizes to compare")
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.turns} turns, agent {args.agent_ms} ms per call")
+    print(f"{'workers':>7} {'wall s':>8} {'mean ms':>9} {'p99 ms':>9} {'ordered':>8} {'peak queued':>12} {'mean wait ms':>13}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for workers in args.workers:
+            elapsed, latencies, ordered, stats = play(args, workers, workdir)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{workers:>7} {elapsed:>8.2f} {sum(latencies) / len(latencies) * 1000:>9.1f} {p99 * 1000:>9.1f} "
+                  f"{'yes' if ordered else 'NO':>8} {stats['peak_queued']:>12} {stats['mean_wait_ms']:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
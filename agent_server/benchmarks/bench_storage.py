@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Storage benchmark suite: what a chat turn costs in the persistence layer.
+
+Generates --users synthetic users with --sessions sessions each, then times
+the SessionService operations a conversation exercises, in this order:
+
+  create_message        --messages messages per session (one per call)
+  get_session_messages  --reads full-history reads of random sessions
+  get_last_messages     --reads history-window reads (last --window messages)
+  get_user_sessions     --reads session-list reads of random users
+  delete_session        every session, messages included
+
+Each operation is split evenly over N worker threads (one run per value of
+--threads, each against a fresh database) and reported as throughput plus
+p50/p99/max latency. Results go to --output as JSON; pass a previous results
+file as --baseline to print the throughput ratio per operation.
+
+    python benchmarks/bench_storage.py --users 20 --sessions 10 --messages 50 --threads 1 4 8
+    python benchmarks/bench_storage.py --backend sharded --shards 4 --baseline before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mapper.backend import create_backend
+from mapper.models import Session, Message
+from service.session_service import SessionService
+
+CONTENT = "message {n} of a synthetic conversation about storage benchmarks " * 2
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(operation: str, threads: int, latencies, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        "operation": operation,
+        "threads": threads,
+        "ops": count,
+        "seconds": round(seconds, 4),
+        "ops_per_sec": round(count / seconds, 1) if seconds > 0 else 0.0,
+        "mean_ms": round(sum(latencies) / count * 1000, 4) if count else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4) if count else 0.0,
+    }
+
+
+def run_phase(operation: str, fn, jobs, threads: int, flush=None) -> dict:
+    """Run fn(*job) for every job on `threads` workers and time each call"""
+    partitions = [jobs[i::threads] for i in range(threads)]
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(partition):
+        local = []
+        for job in partition:
+            start = time.perf_counter()
+            fn(*job)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(worker, partition) for partition in partitions]:
+            future.result()
+    # Deferred writes (group/async durability) count towards the phase
+    if flush is not None:
+        flush()
+    return summarize(operation, threads, latencies, time.perf_counter() - start)
+
+
+def storage_config(args, workdir: str) -> dict:
+    config = {
+        "backend": args.backend,
+        "db_path": os.path.join(workdir, "bench.db"),
+        "durability": args.durability,
+        "shards": args.shards,
+    }
+    if args.compression:
+        # Compress every payload; the synthetic messages are below the default threshold
+        config["compression"] = {"codec": args.compression, "threshold": 0}
+    return config
+
+
+def run_suite(args, threads: int, workdir: str):
+    backend = create_backend(storage_config(args, workdir))
+    service = SessionService(backend)
+    rng = random.Random(args.seed)
+
+    users = [f"user-{u}" for u in range(args.users)]
+    sessions = [(f"session-{u}-{s}", user) for u, user in enumerate(users) for s in range(args.sessions)]
+    service.create_sessions(Session(id=session_id, title=session_id, creatorId=user)
+                            for session_id, user in sessions)
+
+    # Messages are issued round-robin over sessions, as interleaved conversations would be
+    message_jobs = []
+    for n in range(args.messages):
+        for session_id, user in sessions:
+            message_jobs.append((Message(id=f"{session_id}-{n}", sessionId=session_id,
+                                         content=CONTENT.format(n=n), role="user" if n % 2 == 0 else "assistant",
+                                         creatorId=user), user))
+    read_jobs = [rng.choice(sessions) for _ in range(args.reads)]
+    user_jobs = [(rng.choice(users),) for _ in range(args.reads)]
+    delete_jobs = list(sessions)
+    rng.shuffle(delete_jobs)
+
+    results = [
+        run_phase("create_message", service.create_message, message_jobs, threads, backend.flush),
+        run_phase("get_session_messages", service.get_session_messages, read_jobs, threads),
+        run_phase("get_last_messages", service.get_last_messages,
+                  [(session_id, user, args.window) for session_id, user in read_jobs], threads),
+        run_phase("get_user_sessions", service.get_user_sessions, user_jobs, threads),
+        run_phase("delete_session", service.delete_session, delete_jobs, threads, backend.flush),
+    ]
+    backend.close()
+    return results
+
+
+def print_results(results, baseline):
+    reference = {(r["operation"], r["threads"]): r for r in (baseline or {}).get("results", [])}
+    print(f"{'operation':<22} {'threads':>7} {'ops':>8} {'ops/s':>11} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+          + ("   vs baseline" if reference else ""))
+    for r in results:
+        line = (f"{r['operation']:<22} {r['threads']:>7} {r['ops']:>8} {r['ops_per_sec']:>11,.0f} "
+                f"{r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['max_ms']:>9.3f}")
+        before = reference.get((r["operation"], r["threads"]))
+        if before and before["ops_per_sec"]:
+            line += f"   {r['ops_per_sec'] / before['ops_per_sec']:.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=10, help="sessions per user")
+    parser.add_argument("--messages", type=int, default=20, help="messages per session")
+    parser.add_argument("--reads", type=int, default=2000, help="calls per read operation")
+    parser.add_argument("--window", type=int, default=20, help="message count for get_last_messages")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--backend", choices=["sqlite", "sharded", "memory"], default="sqlite")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--durability", choices=["sync", "group", "async"], default="sync")
+    parser.add_argument("--compression", choices=["zlib", "zstd"], default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_storage.json", help="results file (JSON)")
+    parser.add_argument("--baseline", default=None, help="previous results file to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = []
+    for threads in args.threads:
+        with tempfile.TemporaryDirectory() as workdir:
+            results.extend(run_suite(args, threads, workdir))
+
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{args.users} users x {args.sessions} sessions x {args.messages} messages, "
+          f"backend={args.backend}, durability={args.durability}")
+    print_results(results, baseline)
+    print(f"results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+JSONL export/import throughput on a synthetic dataset.
+
+Seeds a database with --messages messages (50 per session), exports it to a
+(gzip) JSONL file, imports the file into an empty database and reports rows/s
+for both directions, optionally with the peak Python heap during export.
+
+    python benchmarks/bench_transfer.py --messages 1000000 --gzip
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mapper.backend import SqliteBackend
+from service.session_service import SessionService
+from service.transfer import export_jsonl, import_jsonl, open_stream
+
+MESSAGES_PER_SESSION = 50
+SESSIONS_PER_USER = 20
+
+
+def synthetic_records(total_messages: int):
+    session_count = max(1, total_messages // MESSAGES_PER_SESSION)
+    for i in range(session_count):
+        creator_id = f"user-{i // SESSIONS_PER_USER}"
+        session_id = f"session-{i}"
+        yield {"type": "session", "data": {"id": session_id, "title": f"Session {i}", "creatorId": creator_id,
+                                           "createdAt": "2025-01-01T00:00:00", "updatedAt": "2025-01-01T00:00:00",
+                                           "messageCount": MESSAGES_PER_SESSION}}
+        for n in range(MESSAGES_PER_SESSION):
+            yield {"type": "message", "data": {"id": f"{session_id}-{n}", "sessionId": session_id,
+                                               "content": f"message {n} of a synthetic conversation",
+                                               "tool": "", "role": "user" if n % 2 == 0 else "assistant",
+                                               "timestamp": f"2025-01-01T00:00:{n:06d}", "creatorId": creator_id}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="report peak heap during export (tracemalloc slows the export down)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source = SqliteBackend(os.path.join(workdir, "source.db"))
+        SessionService(source).import_records(synthetic_records(args.messages), args.batch_size)
+
+        path = os.path.join(workdir, "export.jsonl" + (".gz" if args.gzip else ""))
+        if args.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with open_stream(path, 'w') as fp:
+            exported = export_jsonl(SessionService(source), fp)
+        export_seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else 0
+        tracemalloc.stop()
+        source.close()
+
+        target = SqliteBackend(os.path.join(workdir, "target.db"))
+        start = time.perf_counter()
+        with open_stream(path, 'r') as fp:
+            imported = import_jsonl(SessionService(target), fp, args.batch_size)
+        import_seconds = time.perf_counter() - start
+        target.close()
+
+        rows = exported["session"] + exported["message"] + exported["task"]
+        print(f"rows: {rows} ({exported['message']} messages), file: {os.path.getsize(path) / 1e6:.1f} MB")
+        print(f"export: {export_seconds:.2f}s  {rows / export_seconds:,.0f} rows/s"
+              + (f"  peak heap {peak / 1e6:.1f} MB" if args.trace_memory else ""))
+        print(f"import: {import_seconds:.2f}s  "
+              f"{(imported['session'] + imported['message'] + imported['task']) / import_seconds:,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,58 @@
+import json
+import os
+import warnings
+from mapper.engine import BaseEngine, SqliteEngine, MemoryEngine, get_engine, DEFAULT_DB_PATH
 from mapper.session_mapper import SessionMapper
 from mapper.message_mapper import MessageMapper
 from mapper.task_mapper import TaskMapper
+from mapper.async_mapper import AsyncSessionMapper, AsyncMessageMapper, AsyncTaskMapper
+from mapper.backend import (
+    StorageBackend, SqliteBackend, MemoryBackend, ShardedSqliteBackend, MapperSet, create_backend
+)
+from mapper.retention import RetentionPolicy, Compactor
 
-sessionMapper = SessionMapper()
-messageMapper = MessageMapper()
-taskMapper = TaskMapper()
+
+def load_storage_config() -> dict:
+    """读取config.json中的storage配置，缺省时使用默认值"""
+    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.json')
+    try:
+        with open(config_path, 'r') as f:
+            return json.load(f).get("storage", {})
+    except (OSError, ValueError):
+        return {}
+
+
+storage_config = load_storage_config()
+storageBackend = create_backend(storage_config)
+
+# 已废弃的模块级mapper，指向默认存储后端的mapper；新代码请使用storageBackend.mappers(creator_id)
+_DEPRECATED_MAPPERS = {
+    "sessionMapper": "session_mapper",
+    "messageMapper": "message_mapper",
+    "taskMapper": "task_mapper",
+}
+
+
+def __getattr__(name: str):
+    if name in _DEPRECATED_MAPPERS:
+        warnings.warn(f"mapper.{name} is deprecated, use mapper.storageBackend.mappers(creator_id)",
+                      DeprecationWarning, stacklevel=2)
+        return getattr(storageBackend.default_mappers(), _DEPRECATED_MAPPERS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# 保留策略默认关闭：开启后由后台线程按间隔删除过期数据并回收空间
+retention_config = storage_config.get("retention", {})
+compactor = Compactor(storageBackend, RetentionPolicy.from_dict(retention_config))
+if retention_config.get("enabled", False) and compactor.policy.has_rules():
+    compactor.start()
+
+
+def compaction_stats() -> dict:
+    """后台压缩的进度和累计指标（删除的会话/消息数、回收的字节数）"""
+    return compactor.stats()
+
+
+def shutdown():
+    """停止后台压缩，刷新排队中的写入并关闭存储后端（进程退出时也会自动执行）"""
+    compactor.stop()
+    storageBackend.close()
@@ -0,0 +1,169 @@
+"""
+冷数据归档：把长时间未活跃会话的消息移出热数据库，压缩后写入按时间分桶的段文件（每个会话一个文件），
+删除会话时直接删除它的段文件
+
+    python -m mapper.archive --max-idle-days 30
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from shared.json_codec import dumps_bytes, loads
+
+DEFAULT_BUCKET_FORMAT = '%Y-%m'
+SEGMENT_SUFFIX = '.seg'
+
+
+def archive_dir_for(db_path: str) -> str:
+    """数据库文件对应的归档目录：isek_database.db -> isek_database.archive/"""
+    return os.path.splitext(db_path)[0] + '.archive'
+
+
+class ArchiveStore:
+    """归档段文件，每次归档一个会话写一个文件；记录的位置(segment, offset, length)保存在数据库的message_archive表中。
+    旧版本按时间桶共享的段文件仍可读取，最后一个引用删除后由drop_archive_entry交给remove删除"""
+
+    def __init__(self, directory: str, bucket_format: str = DEFAULT_BUCKET_FORMAT):
+        self.directory = directory
+        self.bucket_format = bucket_format
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def segment_for(self, timestamp: str, session_id: str) -> str:
+        """段文件名：<会话最后活跃时间的时间桶>/<会话id摘要>-<随机后缀>.seg；
+        随机后缀保证并发归档同一会话时各写各的文件，放弃的一方可以安全删除自己的文件"""
+        try:
+            moment = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            moment = datetime.now()
+        digest = hashlib.blake2b(session_id.encode('utf-8'), digest_size=8).hexdigest()
+        return f"{moment.strftime(self.bucket_format)}/{digest}-{uuid.uuid4().hex[:8]}{SEGMENT_SUFFIX}"
+
+    def append(self, rows: List[Dict], timestamp: str, session_id: str) -> Tuple[str, int, int]:
+        """压缩一个会话的消息写入新的段文件，落盘后返回(segment, offset, length)"""
+        payload = zlib.compress(dumps_bytes(rows))
+        segment = self.segment_for(timestamp, session_id)
+        path = os.path.join(self.directory, segment)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'xb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        return segment, 0, len(payload)
+
+    def read(self, segment: str, offset: int, length: int) -> List[Dict]:
+        """按位置读取并解压一个会话的归档消息"""
+        with open(os.path.join(self.directory, segment), 'rb') as f:
+            f.seek(offset)
+            payload = f.read(length)
+        return loads(zlib.decompress(payload))
+
+    def remove(self, segment: str) -> int:
+        """删除一个不再被引用的段文件，返回释放的字节数（文件已不存在时为0）"""
+        path = os.path.join(self.directory, segment)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                return 0
+        return size
+
+    def _segments(self) -> Iterator[Tuple[str, str]]:
+        """所有段文件的(相对名, 路径)，相对名与message_archive.segment的写法一致"""
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(SEGMENT_SUFFIX):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, self.directory).replace(os.sep, '/'), path
+
+    def size_bytes(self) -> int:
+        """所有段文件的总大小"""
+        return sum(os.path.getsize(path) for _, path in self._segments())
+
+    def remove_segments(self, referenced: Iterable[str], min_age_seconds: float = 86400) -> Tuple[int, int]:
+        """删除不再被message_archive引用的段文件（例如进程在归档提交前退出留下的），返回(文件数, 字节数)；
+        最近写入的段可能属于还未提交的归档，跳过"""
+        referenced = set(referenced)
+        cutoff = time.time() - min_age_seconds
+        removed, reclaimed = 0, 0
+        with self._lock:
+            for segment, path in list(self._segments()):
+                if segment in referenced or os.path.getmtime(path) > cutoff:
+                    continue
+                reclaimed += os.path.getsize(path)
+                os.remove(path)
+                removed += 1
+        return removed, reclaimed
+
+
+def drop_archive_entry(conn: sqlite3.Connection, session_id: str) -> Optional[Tuple[int, Optional[str]]]:
+    """在写事务内删除会话的归档记录并清除session.archived，返回(归档的消息数, 可以删除的段文件)，没有记录时返回None。
+    段文件还被其他会话引用（旧版本共享的段）时不返回；调用方在事务提交后用ArchiveStore.remove删除段文件"""
+    row = conn.execute('SELECT segment, messageCount FROM message_archive WHERE sessionId = ?',
+                       (session_id,)).fetchone()
+    if row is None:
+        return None
+    segment, count = row
+    conn.execute('DELETE FROM message_archive WHERE sessionId = ?', (session_id,))
+    conn.execute('UPDATE session SET archived = 0 WHERE id = ?', (session_id,))
+    if conn.execute('SELECT 1 FROM message_archive WHERE segment = ? LIMIT 1', (segment,)).fetchone():
+        return count, None
+    return count, segment
+
+
+def archive_idle_sessions(message_mapper, max_idle_days: float, batch_size: int = 100) -> Dict[str, int]:
+    """归档最后活跃时间早于max_idle_days天前、且热库中仍有消息的会话"""
+    cutoff = (datetime.now() - timedelta(days=max_idle_days)).isoformat()
+    stats = {"sessions": 0, "messages": 0}
+    while True:
+        rows = message_mapper.engine.query('''
+            SELECT s.id, s.updatedAt FROM session s
+            WHERE s.updatedAt < ? AND EXISTS (SELECT 1 FROM message m WHERE m.sessionId = s.id)
+            LIMIT ?
+        ''', (cutoff, batch_size))
+        if not rows:
+            break
+        archived_in_batch = 0
+        for session_id, updated_at in rows:
+            moved = message_mapper.archive_session(session_id, updated_at)
+            if moved:
+                stats["sessions"] += 1
+                stats["messages"] += moved
+                archived_in_batch += 1
+        # 本批次全部因并发写入而跳过时停止，避免重复扫描同一批会话
+        if archived_in_batch == 0:
+            break
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move idle sessions to the compressed archive tier")
+    parser.add_argument("--max-idle-days", type=float, default=None,
+                        help="archive sessions idle for longer than this (default: storage.archive.max_idle_days)")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    from mapper import storageBackend, storage_config
+    max_idle_days = args.max_idle_days
+    if max_idle_days is None:
+        max_idle_days = storage_config.get("archive", {}).get("max_idle_days", 30)
+    for mapper_set in storageBackend.all_mappers():
+        if mapper_set.message_mapper.archive is None:
+            print(f"Archiving is disabled for {mapper_set.engine.db_path} (set storage.archive.enabled in config.json)")
+            continue
+        stats = archive_idle_sessions(mapper_set.message_mapper, max_idle_days, args.batch_size)
+        print(f"{mapper_set.engine.db_path}: archived {stats['sessions']} sessions, "
+              f"{stats['messages']} messages -> {mapper_set.message_mapper.archive.directory}")
+    storageBackend.close()
+
+
+if __name__ == '__main__':
+    main()
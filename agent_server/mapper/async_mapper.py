@@ -0,0 +1,129 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+from mapper.models import Session, Message, Task, SearchHit
+from mapper.session_mapper import SessionMapper
+from mapper.message_mapper import MessageMapper
+from mapper.task_mapper import TaskMapper
+
+DEFAULT_ASYNC_WORKERS = 8
+
+
+def create_executor(max_workers: int = DEFAULT_ASYNC_WORKERS) -> ThreadPoolExecutor:
+    """创建有界线程池，异步mapper在其中执行阻塞的SQLite调用"""
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sqlite-async')
+
+
+async def run_blocking(executor: Optional[ThreadPoolExecutor], fn: Callable, *args, **kwargs) -> Any:
+    """在线程池中执行阻塞调用，不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+class AsyncSessionMapper:
+    """SessionMapper的异步版本"""
+
+    def __init__(self, mapper: SessionMapper, executor: Optional[ThreadPoolExecutor] = None):
+        self.mapper = mapper
+        self.executor = executor or create_executor()
+
+    async def create_session(self, session: Session) -> Session:
+        """创建新会话"""
+        return await run_blocking(self.executor, self.mapper.create_session, session)
+
+    async def create_sessions(self, sessions: List[Session]) -> List[Session]:
+        """批量创建会话"""
+        return await run_blocking(self.executor, self.mapper.create_sessions, sessions)
+
+    async def get_sessions(self, creator_id: str) -> List[Session]:
+        """获取指定creator_id的所有会话"""
+        return await run_blocking(self.executor, self.mapper.get_sessions, creator_id)
+
+    async def list_sessions(self, creator_id: str, order: str = 'recent', limit: int = 20,
+                            cursor: Optional[str] = None) -> List[Session]:
+        """按更新时间分页列出用户会话"""
+        return await run_blocking(self.executor, self.mapper.list_sessions, creator_id, order, limit, cursor)
+
+    async def delete_session(self, session_id: str, creator_id: str) -> bool:
+        """删除会话，必须验证creator_id权限"""
+        return await run_blocking(self.executor, self.mapper.delete_session, session_id, creator_id)
+
+    async def get_by_id(self, session_id: str, creator_id: str) -> Optional[Session]:
+        """根据ID获取session"""
+        return await run_blocking(self.executor, self.mapper.get_by_id, session_id, creator_id)
+
+    async def get_creator_id(self, session_id: str) -> Optional[str]:
+        """根据主键获取会话的creatorId"""
+        return await run_blocking(self.executor, self.mapper.get_creator_id, session_id)
+
+
+class AsyncMessageMapper:
+    """MessageMapper的异步版本"""
+
+    def __init__(self, mapper: MessageMapper, executor: Optional[ThreadPoolExecutor] = None):
+        self.mapper = mapper
+        self.executor = executor or create_executor()
+
+    async def create_message(self, message: Message) -> Message:
+        """创建新消息"""
+        return await run_blocking(self.executor, self.mapper.create_message, message)
+
+    async def create_messages(self, messages: List[Message]) -> List[Message]:
+        """批量创建消息"""
+        return await run_blocking(self.executor, self.mapper.create_messages, messages)
+
+    async def get_messages_by_session(self, session_id: str, limit: Optional[int] = None,
+                                      before_cursor: Optional[str] = None) -> List[Message]:
+        """根据会话ID获取消息，支持游标分页"""
+        return await run_blocking(self.executor, self.mapper.get_messages_by_session,
+                                  session_id, limit, before_cursor)
+
+    async def get_last_messages(self, session_id: str, n: int) -> List[Message]:
+        """获取会话最近的n条消息"""
+        return await run_blocking(self.executor, self.mapper.get_last_messages, session_id, n)
+
+    async def get_messages_since(self, session_id: str, after_seq: int, limit: Optional[int] = None) -> List[Message]:
+        """获取会话中seq大于after_seq的消息"""
+        return await run_blocking(self.executor, self.mapper.get_messages_since, session_id, after_seq, limit)
+
+    async def get_message(self, session_id: str, message_id: str) -> Optional[Message]:
+        """按id获取会话中的一条消息"""
+        return await run_blocking(self.executor, self.mapper.get_message, session_id, message_id)
+
+    async def delete_messages_by_session(self, session_id: str) -> bool:
+        """根据会话ID删除所有消息"""
+        return await run_blocking(self.executor, self.mapper.delete_messages_by_session, session_id)
+
+    async def search_messages(self, creator_id: str, query: str, limit: int = 20,
+                              cursor: Optional[str] = None) -> Tuple[List[SearchHit], Optional[str]]:
+        """全文搜索用户的消息"""
+        return await run_blocking(self.executor, self.mapper.search_messages, creator_id, query, limit, cursor)
+
+
+class AsyncTaskMapper:
+    """TaskMapper的异步版本"""
+
+    def __init__(self, mapper: TaskMapper, executor: Optional[ThreadPoolExecutor] = None):
+        self.mapper = mapper
+        self.executor = executor or create_executor()
+
+    async def create(self, task: Task, creator_id: str) -> Optional[Task]:
+        """创建新任务"""
+        return await run_blocking(self.executor, self.mapper.create, task, creator_id)
+
+    async def get_by_id(self, task_id: str, creator_id: str) -> Optional[Task]:
+        """根据ID获取任务"""
+        return await run_blocking(self.executor, self.mapper.get_by_id, task_id, creator_id)
+
+    async def get_by_session_id(self, session_id: str, creator_id: str) -> List[Task]:
+        """根据会话ID获取任务列表"""
+        return await run_blocking(self.executor, self.mapper.get_by_session_id, session_id, creator_id)
+
+    async def processing(self, task_id: str, updater_id: str) -> bool:
+        """将任务状态设置为processing"""
+        return await run_blocking(self.executor, self.mapper.processing, task_id, updater_id)
+
+    async def finish(self, task_id: str, updater_id: str, result: str) -> bool:
+        """将任务状态设置为finished"""
+        return await run_blocking(self.executor, self.mapper.finish, task_id, updater_id, result)
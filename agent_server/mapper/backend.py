@@ -0,0 +1,183 @@
+import logging
+import os
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional
+from mapper.archive import ArchiveStore, archive_dir_for
+from mapper.codec import ContentCodec, create_codec
+from mapper.engine import BaseEngine, MemoryEngine, get_engine, DEFAULT_DB_PATH
+from mapper.session_mapper import SessionMapper
+from mapper.message_mapper import MessageMapper
+from mapper.task_mapper import TaskMapper
+from mapper.async_mapper import (
+    AsyncSessionMapper, AsyncMessageMapper, AsyncTaskMapper, create_executor, DEFAULT_ASYNC_WORKERS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class MapperSet(NamedTuple):
+    """绑定到同一个引擎的一组mapper"""
+    engine: BaseEngine
+    session_mapper: SessionMapper
+    message_mapper: MessageMapper
+    task_mapper: TaskMapper
+    async_session_mapper: AsyncSessionMapper
+    async_message_mapper: AsyncMessageMapper
+    async_task_mapper: AsyncTaskMapper
+
+
+def build_mapper_set(engine: BaseEngine, executor: ThreadPoolExecutor,
+                     codec: Optional[ContentCodec] = None, archive: bool = False) -> MapperSet:
+    """为引擎创建一组同步和异步mapper；archive为True时在数据库旁创建归档目录"""
+    archive_store = ArchiveStore(archive_dir_for(engine.db_path)) if archive else None
+    session_mapper = SessionMapper(engine=engine)
+    message_mapper = MessageMapper(engine=engine, codec=codec, archive=archive_store)
+    task_mapper = TaskMapper(engine=engine)
+    return MapperSet(
+        engine=engine,
+        session_mapper=session_mapper,
+        message_mapper=message_mapper,
+        task_mapper=task_mapper,
+        async_session_mapper=AsyncSessionMapper(session_mapper, executor),
+        async_message_mapper=AsyncMessageMapper(message_mapper, executor),
+        async_task_mapper=AsyncTaskMapper(task_mapper, executor)
+    )
+
+
+class StorageBackend(ABC):
+    """存储后端接口：按creatorId返回该用户数据所在的mapper"""
+
+    def __init__(self, executor: Optional[ThreadPoolExecutor] = None, codec: Optional[ContentCodec] = None,
+                 archive: bool = False):
+        self.executor = executor or create_executor()
+        self.codec = codec
+        self.archive = archive
+        self._purge_listeners: List[Callable[[str], None]] = []
+
+    @abstractmethod
+    def mappers(self, creator_id: str) -> MapperSet:
+        """获取creator_id的数据所在的mapper"""
+        pass
+
+    @abstractmethod
+    def all_mappers(self) -> List[MapperSet]:
+        """获取所有mapper（用于跨用户的维护任务）"""
+        pass
+
+    def default_mappers(self) -> MapperSet:
+        """不按用户路由的旧接口（mapper.sessionMapper等）使用的mapper；分片后端为第一个分片"""
+        return self.all_mappers()[0]
+
+    def add_purge_listener(self, listener: Callable[[str], None]):
+        """注册回调：保留策略删除会话或裁剪会话的消息后以session_id调用，用于清理进程内的缓存"""
+        self._purge_listeners.append(listener)
+
+    def session_purged(self, session_id: str):
+        """通知所有回调会话已被保留策略删除或裁剪，单个回调出错不影响其他回调"""
+        for listener in list(self._purge_listeners):
+            try:
+                listener(session_id)
+            except Exception as e:
+                logger.error(f"Purge listener failed for session {session_id}: {e}")
+
+    def flush(self):
+        """等待所有排队中的写入提交"""
+        for mapper_set in self.all_mappers():
+            mapper_set.engine.flush()
+
+    def close(self):
+        """刷新写入并关闭所有引擎"""
+        self.executor.shutdown(wait=True)
+        for mapper_set in self.all_mappers():
+            mapper_set.engine.close()
+
+
+class SqliteBackend(StorageBackend):
+    """单文件SQLite后端"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, executor: Optional[ThreadPoolExecutor] = None,
+                 codec: Optional[ContentCodec] = None, archive: bool = False, **engine_options):
+        super().__init__(executor, codec, archive)
+        self._mappers = build_mapper_set(get_engine(db_path, **engine_options), self.executor, codec, archive)
+
+    def mappers(self, creator_id: str) -> MapperSet:
+        return self._mappers
+
+    def all_mappers(self) -> List[MapperSet]:
+        return [self._mappers]
+
+
+class MemoryBackend(StorageBackend):
+    """纯内存后端，数据随进程结束丢弃（不支持归档）"""
+
+    def __init__(self, executor: Optional[ThreadPoolExecutor] = None, codec: Optional[ContentCodec] = None):
+        super().__init__(executor, codec)
+        self._mappers = build_mapper_set(MemoryEngine(), self.executor, codec)
+
+    def mappers(self, creator_id: str) -> MapperSet:
+        return self._mappers
+
+    def all_mappers(self) -> List[MapperSet]:
+        return [self._mappers]
+
+
+def shard_path(db_path: str, index: int) -> str:
+    """分片数据库文件名：isek_database.db -> isek_database.shard0.db"""
+    base, ext = os.path.splitext(db_path)
+    return f"{base}.shard{index}{ext or '.db'}"
+
+
+class ShardedSqliteBackend(StorageBackend):
+    """按hash(creatorId)路由到N个SQLite文件的分片后端，每个分片有自己的写线程"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, shards: int = 4,
+                 executor: Optional[ThreadPoolExecutor] = None, codec: Optional[ContentCodec] = None,
+                 archive: bool = False, **engine_options):
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        super().__init__(executor, codec, archive)
+        self._shards = [
+            build_mapper_set(get_engine(shard_path(db_path, i), **engine_options), self.executor, codec, archive)
+            for i in range(shards)
+        ]
+
+    def shard_index(self, creator_id: str) -> int:
+        """稳定的分片路由（不使用进程内随机化的hash()）"""
+        return zlib.crc32((creator_id or '').encode('utf-8')) % len(self._shards)
+
+    def mappers(self, creator_id: str) -> MapperSet:
+        return self._shards[self.shard_index(creator_id)]
+
+    def all_mappers(self) -> List[MapperSet]:
+        return list(self._shards)
+
+
+BACKENDS = {
+    "sqlite": SqliteBackend,
+    "memory": MemoryBackend,
+    "sharded": ShardedSqliteBackend,
+}
+
+
+def create_backend(config: dict) -> StorageBackend:
+    """根据config.json的storage配置创建存储后端"""
+    backend = config.get("backend", "sqlite")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    executor = create_executor(config.get("async_workers", DEFAULT_ASYNC_WORKERS))
+    codec = create_codec(config.get("compression"))
+    if backend == "memory":
+        return MemoryBackend(executor, codec)
+
+    engine_options = {
+        "durability": config.get("durability", "sync"),
+        "group_commit_size": config.get("group_commit_size", 64),
+        "group_commit_interval_ms": config.get("group_commit_interval_ms", 0),
+    }
+    db_path = config.get("db_path", DEFAULT_DB_PATH)
+    archive = config.get("archive", {}).get("enabled", False)
+    if backend == "sharded":
+        return ShardedSqliteBackend(db_path, config.get("shards", 4), executor, codec, archive, **engine_options)
+    return SqliteBackend(db_path, executor, codec, archive, **engine_options)
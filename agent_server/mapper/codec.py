@@ -0,0 +1,76 @@
+import threading
+import zlib
+from typing import Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:  # zstd为可选依赖
+    zstandard = None
+
+CODEC_ZLIB = 'zlib'
+CODEC_ZSTD = 'zstd'
+
+Payload = Union[str, bytes]
+
+
+def available_codecs() -> Tuple[str, ...]:
+    """当前环境可用的压缩算法"""
+    return (CODEC_ZLIB, CODEC_ZSTD) if zstandard else (CODEC_ZLIB,)
+
+
+class ContentCodec:
+    """消息内容压缩：超过阈值的行压缩为BLOB，并在codec列记录压缩算法"""
+
+    def __init__(self, name: str = CODEC_ZLIB, threshold: int = 1024, level: Optional[int] = None):
+        if name not in available_codecs():
+            raise ValueError(f"Codec '{name}' is not available, choose from {available_codecs()}")
+        self.name = name
+        self.threshold = threshold
+        self.level = level
+        # ZstdCompressor不能被多个线程同时使用，每个线程各建一个
+        self._local = threading.local()
+
+    def compress(self, data: bytes) -> bytes:
+        if self.name == CODEC_ZSTD:
+            compressor = getattr(self._local, 'compressor', None)
+            if compressor is None:
+                compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level or 3)
+            return compressor.compress(data)
+        return zlib.compress(data, 6 if self.level is None else self.level)
+
+    def encode(self, content: str, tool: str) -> Tuple[Payload, Payload, Optional[str]]:
+        """压缩一行的content和tool，返回(content, tool, codec标记)；未压缩时标记为None"""
+        content_bytes = content.encode('utf-8')
+        tool_bytes = tool.encode('utf-8')
+        if len(content_bytes) + len(tool_bytes) < self.threshold:
+            return content, tool, None
+        packed_content = self.compress(content_bytes)
+        packed_tool = self.compress(tool_bytes)
+        # 压缩后没有变小则按原文存储
+        if len(packed_content) + len(packed_tool) >= len(content_bytes) + len(tool_bytes):
+            return content, tool, None
+        return packed_content, packed_tool, self.name
+
+
+def decode_payload(value: Payload, codec: Optional[str]) -> str:
+    """按行的codec标记解压，返回文本"""
+    if codec is None or value is None:
+        return value
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(value).decode('utf-8')
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Row is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(value).decode('utf-8')
+    raise ValueError(f"Unknown codec marker: {codec}")
+
+
+def create_codec(config: Optional[dict]) -> Optional[ContentCodec]:
+    """根据storage.compression配置创建codec，未显式启用时返回None"""
+    if not config or not config.get("enabled"):
+        return None
+    return ContentCodec(
+        name=config.get("codec", CODEC_ZLIB),
+        threshold=config.get("threshold", 1024),
+        level=config.get("level")
+    )
@@ -0,0 +1,436 @@
+import atexit
+import itertools
+import logging
+import os
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+from mapper.search import register_search_functions
+
+DEFAULT_DB_PATH = 'isek_database.db'
+
+# 批量写入时每个事务处理的行数
+DEFAULT_CHUNK_SIZE = 1000
+
+# 持久化模式
+# sync:  每条写命令单独提交，调用方等待提交完成
+# group: 写线程把排队的写命令合并到一个事务提交（组提交），调用方等待提交完成
+# async: 与group相同的合并提交，但消息写入不等待提交（write_behind立即返回）
+DURABILITY_SYNC = 'sync'
+DURABILITY_GROUP = 'group'
+DURABILITY_ASYNC = 'async'
+DURABILITY_MODES = (DURABILITY_SYNC, DURABILITY_GROUP, DURABILITY_ASYNC)
+
+# 行工厂：(cursor, row元组) -> 对象
+RowFactory = Callable[[sqlite3.Cursor, tuple], Any]
+
+_STOP = object()
+# 标记不能在事务内执行的维护命令（VACUUM、wal_checkpoint）
+_MAINTENANCE = object()
+
+logger = logging.getLogger(__name__)
+
+
+class BaseEngine(ABC):
+    """存储引擎接口：mapper只通过这些方法读写数据库；写命令fn在事务内以连接为参数执行"""
+
+    def __init__(self, db_path: str, read_pool_size: int, durability: str = DURABILITY_SYNC,
+                 group_commit_size: int = 1, group_commit_interval_ms: float = 0):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}")
+        self.db_path = db_path
+        self.read_pool_size = read_pool_size
+        self.durability = durability
+        self.group_commit_size = 1 if durability == DURABILITY_SYNC else max(1, group_commit_size)
+        self.group_commit_interval = group_commit_interval_ms / 1000.0
+        self.schema_version = 0
+        self._closed = False
+
+    @abstractmethod
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        """提交写命令，返回在事务提交后完成的Future"""
+
+    @abstractmethod
+    def maintenance(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """在事务之外执行fn（用于VACUUM、wal_checkpoint等），等待并返回结果"""
+
+    @abstractmethod
+    def reader(self):
+        """借出一个可读的连接（上下文管理器）"""
+
+    @abstractmethod
+    def close(self):
+        """提交排队中的写命令并关闭所有连接"""
+
+    def write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """提交写命令并等待事务提交，返回fn的结果"""
+        return self.submit(fn).result()
+
+    def write_behind(self, fn: Callable[[sqlite3.Connection], Any]) -> Optional[Future]:
+        """按持久化模式提交写命令：sync/group等待提交，async立即返回Future"""
+        future = self.submit(fn)
+        if self.durability != DURABILITY_ASYNC:
+            future.result()
+        else:
+            future.add_done_callback(_log_write_error)
+        return future
+
+    def flush(self):
+        """等待此前提交的所有写命令完成提交"""
+        self.write(lambda conn: None)
+
+    def execute(self, sql: str, params: Sequence = ()) -> int:
+        """执行单条写语句，返回影响行数"""
+        return self.write(lambda conn: conn.execute(sql, params).rowcount)
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Sequence]) -> int:
+        """批量执行写语句，返回影响行数"""
+        return self.write(lambda conn: conn.executemany(sql, seq_of_params).rowcount)
+
+    def query(self, sql: str, params: Sequence = (), row_factory: Optional[RowFactory] = None) -> List[Any]:
+        """只读查询，返回所有行；指定row_factory时由它把每个结果元组直接转换为对象"""
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            if row_factory is not None:
+                cursor.row_factory = row_factory
+            return cursor.execute(sql, params).fetchall()
+
+    def query_one(self, sql: str, params: Sequence = (), row_factory: Optional[RowFactory] = None) -> Optional[Any]:
+        """只读查询，返回第一行"""
+        with self.reader() as conn:
+            cursor = conn.cursor()
+            if row_factory is not None:
+                cursor.row_factory = row_factory
+            return cursor.execute(sql, params).fetchone()
+
+
+class SqliteEngine(BaseEngine):
+    """共享的SQLite存储引擎：WAL模式，单写线程 + 只读连接池"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, read_pool_size: int = 4,
+                 busy_timeout_ms: int = 5000, durability: str = DURABILITY_SYNC,
+                 group_commit_size: int = 64, group_commit_interval_ms: float = 0):
+        super().__init__(os.path.abspath(db_path), read_pool_size, durability,
+                         group_commit_size, group_commit_interval_ms)
+        self.busy_timeout_ms = busy_timeout_ms
+        self._commands: "queue.Queue" = queue.Queue()
+        self._readers: "queue.LifoQueue" = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._deferred = None
+        # 写线程异常退出的原因；之后的写命令直接失败，而不是永远等待
+        self._writer_error: Optional[BaseException] = None
+        # 保证检查写线程状态和入队是原子的，写线程退出时不会漏掉刚入队的命令
+        self._submit_lock = threading.Lock()
+
+        ready: Future = Future()
+        self._writer = threading.Thread(target=self._writer_loop, args=(ready,),
+                                        name='sqlite-writer', daemon=True)
+        self._writer.start()
+        # 写连接创建失败时直接抛出
+        ready.result()
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """创建连接并设置通用PRAGMA"""
+        if read_only:
+            # as_uri对路径中的?、#、%等字符做百分号转义
+            uri = pathlib.Path(self.db_path).resolve().as_uri() + '?mode=ro'
+            conn = sqlite3.connect(uri, uri=True,
+                                   check_same_thread=False, isolation_level=None)
+        else:
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            # 新建的数据库文件支持incremental_vacuum回收空闲页（已有文件需VACUUM一次才生效）
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('PRAGMA journal_mode=WAL')
+            # async模式允许掉电丢失最近提交，其余模式每次提交都fsync
+            synchronous = 'NORMAL' if self.durability == DURABILITY_ASYNC else 'FULL'
+            conn.execute(f'PRAGMA synchronous={synchronous}')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.row_factory = sqlite3.Row
+        register_search_functions(conn)
+        return conn
+
+    def _writer_loop(self, ready: Future):
+        """写线程：取出排队的写命令，按组合并到一个事务中提交"""
+        try:
+            conn = self._connect()
+        except Exception as e:
+            ready.set_exception(e)
+            return
+        ready.set_result(True)
+
+        batch = []
+        stopping = False
+        try:
+            while not stopping:
+                batch, stopping = self._next_batch()
+                if batch and batch[0][1] is _MAINTENANCE:
+                    self._run_maintenance(conn, batch[0])
+                elif batch:
+                    self._commit_batch(conn, batch)
+        except BaseException as e:
+            logger.error(f"SQLite writer thread for {self.db_path} died: {e!r}")
+            self._fail_pending(batch, e)
+        finally:
+            conn.close()
+
+    def _fail_pending(self, batch, error: BaseException):
+        """写线程退出前调用：让正在执行和排队的写命令都以错误结束，之后的submit直接抛出"""
+        with self._submit_lock:
+            self._writer_error = error
+            items = list(batch)
+            if self._deferred is not None:
+                items.append(self._deferred)
+                self._deferred = None
+            while True:
+                try:
+                    items.append(self._commands.get_nowait())
+                except queue.Empty:
+                    break
+        failure = RuntimeError(f'SqliteEngine writer thread died: {error!r}')
+        failure.__cause__ = error
+        for item in items:
+            if item is _STOP:
+                continue
+            future = item[-1]
+            if future.done():
+                continue
+            if future.running() or future.set_running_or_notify_cancel():
+                future.set_exception(failure)
+
+    def _next_batch(self):
+        """阻塞等待第一条命令，再收集最多group_commit_size条或等待group_commit_interval"""
+        if self._deferred is not None:
+            item, self._deferred = self._deferred, None
+        else:
+            item = self._commands.get()
+        if item is _STOP:
+            return [], True
+        if item[1] is _MAINTENANCE:
+            return [item], False
+        batch = [item]
+        deadline = time.monotonic() + self.group_commit_interval
+        while len(batch) < self.group_commit_size:
+            try:
+                timeout = deadline - time.monotonic()
+                item = self._commands.get(timeout=timeout) if timeout > 0 else self._commands.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            if item[1] is _MAINTENANCE:
+                # 维护命令单独执行，留到下一轮
+                self._deferred = item
+                break
+            batch.append(item)
+        return batch, False
+
+    @staticmethod
+    def _run_maintenance(conn: sqlite3.Connection, item):
+        """在事务外执行维护命令"""
+        fn, _, future = item
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = fn(conn)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch):
+        """一个事务执行一组命令，每条命令有自己的SAVEPOINT，失败只回滚该命令"""
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute('SAVEPOINT command')
+                try:
+                    result = fn(conn)
+                except BaseException as e:
+                    conn.execute('ROLLBACK TO command')
+                    conn.execute('RELEASE command')
+                    results.append((future, e, None))
+                else:
+                    conn.execute('RELEASE command')
+                    results.append((future, None, result))
+            conn.execute('COMMIT')
+        except BaseException as e:
+            # 提交本身失败：整组命令都未持久化
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            for fn, future in batch:
+                if future.done():
+                    continue
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_exception(e)
+            return
+        # 只有事务提交后才通知调用方
+        for future, error, result in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _enqueue(self, item):
+        """把命令放入写线程的队列；引擎已关闭或写线程已退出时抛出RuntimeError"""
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError('SqliteEngine is closed')
+            if self._writer_error is not None:
+                raise RuntimeError(f'SqliteEngine writer thread died: {self._writer_error!r}')
+            self._commands.put(item)
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        """提交写命令到写线程，fn在事务内以写连接为参数执行"""
+        future: Future = Future()
+        self._enqueue((fn, future))
+        return future
+
+    def maintenance(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """在写线程上、事务之外执行fn（用于VACUUM、wal_checkpoint等），等待并返回结果"""
+        future: Future = Future()
+        self._enqueue((fn, _MAINTENANCE, future))
+        return future.result()
+
+    @contextmanager
+    def reader(self):
+        """从只读连接池借出一个连接"""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            self._readers.put(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._reader_lock:
+            if self._reader_count < self.read_pool_size:
+                self._reader_count += 1
+                try:
+                    return self._connect(read_only=True)
+                except Exception:
+                    self._reader_count -= 1
+                    raise
+        return self._readers.get()
+
+    def close(self):
+        """停止写线程（等待队列中的写命令完成）并关闭所有连接"""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._commands.put(_STOP)
+        self._writer.join()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class MemoryEngine(BaseEngine):
+    """纯内存SQLite引擎：单连接加锁，读写都在调用线程执行，进程结束即丢弃，用于测试和临时agent"""
+
+    def __init__(self):
+        super().__init__(':memory:', read_pool_size=1)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        register_search_functions(self._conn)
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> Future:
+        """在调用线程内以事务执行写命令，返回已完成的Future"""
+        if self._closed:
+            raise RuntimeError('SqliteEngine is closed')
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+        with self._lock:
+            try:
+                self._conn.execute('BEGIN IMMEDIATE')
+                result = fn(self._conn)
+                self._conn.execute('COMMIT')
+            except BaseException as e:
+                if self._conn.in_transaction:
+                    self._conn.execute('ROLLBACK')
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        return future
+
+    @contextmanager
+    def reader(self):
+        """独占唯一的连接进行读取"""
+        with self._lock:
+            yield self._conn
+
+    def flush(self):
+        """写命令都是同步执行的，无需刷新"""
+
+    def maintenance(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """在事务外执行维护命令"""
+        if self._closed:
+            raise RuntimeError('SqliteEngine is closed')
+        with self._lock:
+            return fn(self._conn)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            self._conn.close()
+
+
+def _log_write_error(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Write-behind command failed: {future.exception()}")
+
+
+def chunked(items: Iterable, size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List]:
+    """把可迭代对象按size切分为列表，用于分块批量写入"""
+    if size < 1:
+        raise ValueError("chunk size must be at least 1")
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+_engines: Dict[str, SqliteEngine] = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(db_path: str = DEFAULT_DB_PATH, **options) -> SqliteEngine:
+    """按数据库文件获取共享引擎，同一文件只创建一个引擎（options仅在首次创建时生效）"""
+    key = os.path.abspath(db_path)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None or engine._closed or engine._writer_error is not None:
+            engine = SqliteEngine(db_path, **options)
+            _engines[key] = engine
+        return engine
+
+
+@atexit.register
+def _close_engines():
+    """进程退出时提交所有排队的写命令并关闭引擎"""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.close()
+        _engines.clear()
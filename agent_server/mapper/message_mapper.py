@@ -1,69 +1,397 @@
-import json
-import sqlite3
-from typing import List
-from mapper.models import Message
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+from mapper.archive import ArchiveStore, drop_archive_entry
+from mapper.codec import ContentCodec, decode_payload
+from mapper.engine import BaseEngine, get_engine, chunked, DEFAULT_DB_PATH, DEFAULT_CHUNK_SIZE
+from mapper.migrations import migrate
+from mapper.models import Message, SearchHit, PREVIEW_LENGTH, epoch_micros, message_text
+from mapper.search import (
+    index_message, index_messages, unindex_session, owner_match, split_query, search_sql, like_pattern, like_snippet,
+    encode_search_cursor, decode_search_cursor
+)
+from shared.json_codec import dumps, loads
+
+# 按Message.STORED_COLUMNS顺序查询，配合Message.from_row直接构造（content/tool延迟解码）
+MESSAGE_SELECT = f"SELECT {', '.join(Message.STORED_COLUMNS)} FROM message"
+MESSAGE_INTO = ('INTO message (id, sessionId, content, tool, role, timestamp, creatorId, codec, ts, seq) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
+# 会话当前最大的seq：取session.lastSeq和热库中最大seq的较大者（会话行不存在时也能递增）
+LAST_SEQ_SQL = '''
+    SELECT MAX(COALESCE((SELECT lastSeq FROM session WHERE id = ?), 0),
+               COALESCE((SELECT MAX(seq) FROM message WHERE sessionId = ?), 0))
+'''
+# 会话已归档时读不到热库中的消息（包括归档后新写入的），读取方据此先取回再读取
+NOT_ARCHIVED = ' AND NOT EXISTS (SELECT 1 FROM session WHERE id = ? AND archived = 1)'
+
+
+def encode_cursor(message: Message) -> str:
+    """生成分页游标：取该消息之前的消息时使用"""
+    return str(message.seq)
+
+
+def decode_cursor(cursor: str) -> int:
+    """解析分页游标，返回消息的seq"""
+    try:
+        return int(cursor)
+    except ValueError:
+        raise ValueError(f"Invalid message cursor: {cursor}")
+
 
 class MessageMapper:
-    def __init__(self, db_path: str = 'isek_database.db'):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, engine: Optional[BaseEngine] = None,
+                 codec: Optional[ContentCodec] = None, archive: Optional[ArchiveStore] = None):
+        self.engine = engine or get_engine(db_path)
+        self.codec = codec
+        self.archive = archive
         self._init_db()
     
     def _init_db(self):
-        """初始化数据库，如果表不存在则创建"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS message (
-                id TEXT PRIMARY KEY,
-                sessionId TEXT,
-                content TEXT,
-                tool TEXT,
-                role TEXT,
-                timestamp TEXT,
-                creatorId TEXT
-            )
-        ''')
-        self.conn.commit()
+        """初始化数据库，执行未应用的schema迁移"""
+        migrate(self.engine)
     
     def create_message(self, message: Message) -> Message:
-        """创建新消息"""
-        cursor = self.conn.cursor()
+        """创建新消息（按引擎的持久化模式同步、组提交或异步写入）；message.seq在写事务内分配，
+        异步模式下返回时可能还是None。id已存在时不重复写入，message.seq取已有消息的seq"""
+        text = message_text(message.content)
+        preview = text[:PREVIEW_LENGTH]
         # if isinstance(message.content, list):
-        message.content = json.dumps(message.content)
-        message.tool = json.dumps(message.tool)
-        cursor.execute('''
-            INSERT INTO message (
-                id, sessionId, content, tool, role, timestamp, creatorId
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        message.content = dumps(message.content)
+        message.tool = dumps(message.tool)
+        if message.ts is None:
+            message.ts = epoch_micros(message.timestamp)
+        content, tool, codec = message.content, message.tool, None
+        if self.codec:
+            content, tool, codec = self.codec.encode(content, tool)
+        params = (
             message.id,
             message.sessionId,
-            message.content,
-            message.tool,
+            content,
+            tool,
             message.role,
             message.timestamp,
-            message.creatorId
-        ))
-        self.conn.commit()
+            message.creatorId,
+            codec,
+            message.ts
+        )
+        session_params = (message.timestamp, preview, message.sessionId)
+
+        def insert(conn):
+            # 重试的请求沿用同一消息id，已写入过的消息不再计数和索引
+            existing = conn.execute('SELECT seq FROM message WHERE id = ?', (message.id,)).fetchone()
+            if existing is not None:
+                message.seq = existing[0]
+                return
+            assigned = message.seq is None
+            self._assign_seqs(conn, [message])
+            try:
+                conn.execute('INSERT ' + MESSAGE_INTO, params + (message.seq,))
+            except Exception:
+                if assigned:
+                    message.seq = None
+                raise
+            # 同一事务内维护会话的消息数、更新时间和最后一条消息预览
+            conn.execute('''
+                UPDATE session
+                SET messageCount = messageCount + 1, updatedAt = ?, lastMessagePreview = ?
+                WHERE id = ?
+            ''', session_params)
+            index_message(conn, message.id, message.sessionId, message.creatorId,
+                          message.role, message.timestamp, text)
+
+        self.engine.write_behind(insert)
         return message
     
-    def get_messages_by_session(self, session_id: str) -> List[Message]:
-        """根据会话ID获取所有消息"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM message WHERE sessionId = ? ORDER BY timestamp', (session_id,))
-        messages = []
-        for row in cursor.fetchall():
-            message = Message.from_dict(row)
-            message.content = json.loads(message.content)
-            message.tool = json.loads(message.tool)
-            messages.append(message)
+    def get_messages_by_session(self, session_id: str, limit: Optional[int] = None,
+                                before_cursor: Optional[str] = None) -> List[Message]:
+        """根据会话ID获取消息（按时间正序）；指定limit/before_cursor时只读取游标之前的最近limit条"""
+        if limit is None and before_cursor is None:
+            return self._query_session(session_id, ' ORDER BY seq', [])
+
+        sql, params = '', []
+        if before_cursor:
+            sql += ' AND seq < ?'
+            params.append(decode_cursor(before_cursor))
+        # 沿索引倒序取尾部，再翻转为正序
+        sql += ' ORDER BY seq DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        messages = self._query_session(session_id, sql, params)
+        messages.reverse()
         return messages
+
+    def get_last_messages(self, session_id: str, n: int) -> List[Message]:
+        """获取会话最近的n条消息（按时间正序）"""
+        return self.get_messages_by_session(session_id, limit=n)
+
+    def get_messages_since(self, session_id: str, after_seq: int, limit: Optional[int] = None) -> List[Message]:
+        """获取会话中seq大于after_seq的消息（按seq正序），用于增量同步"""
+        return self._query_session(session_id, ' AND seq > ? ORDER BY seq LIMIT ?',
+                                   [after_seq, -1 if limit is None else limit])
+
+    def get_message(self, session_id: str, message_id: str) -> Optional[Message]:
+        """按id获取会话中的一条消息，不存在时返回None"""
+        messages = self._query_session(session_id, ' AND id = ?', [message_id])
+        return messages[0] if messages else None
+
+    def _query_session(self, session_id: str, condition: str, params: list) -> List[Message]:
+        """按sessionId加condition读取热库消息；结果为空时才检查归档并取回后重新读取，未归档会话的读取不额外查询"""
+        if self.archive is None:
+            return self.engine.query(MESSAGE_SELECT + ' WHERE sessionId = ?' + condition,
+                                     [session_id] + params, Message.from_row)
+        sql = MESSAGE_SELECT + ' WHERE sessionId = ?' + NOT_ARCHIVED + condition
+        messages = self.engine.query(sql, [session_id, session_id] + params, Message.from_row)
+        if not messages and self._rehydrate_if_archived(session_id) is not None:
+            messages = self.engine.query(sql, [session_id, session_id] + params, Message.from_row)
+        return messages
+
+    def search_messages(self, creator_id: str, query: str, limit: int = 20,
+                        cursor: Optional[str] = None) -> Tuple[List[SearchHit], Optional[str]]:
+        """全文搜索用户热库中的消息（已归档的会话取回后才能搜到），按相关度返回命中片段和下一页游标；
+        短于trigram长度的词用LIKE过滤"""
+        match, short_terms = split_query(query)
+        if not match and not short_terms:
+            return [], None
+        offset = decode_search_cursor(cursor)
+        params = [owner_match(creator_id, match)] + [like_pattern(term) for term in short_terms]
+        hits = self.engine.query(search_sql(bool(match), len(short_terms)), params + [limit + 1, offset],
+                                 SearchHit.from_row)
+        if not match:
+            for hit in hits[:limit]:
+                hit.snippet = like_snippet(hit.snippet, short_terms[0])
+        next_cursor = encode_search_cursor(offset + limit) if len(hits) > limit else None
+        return hits[:limit], next_cursor
+
+    @staticmethod
+    def _from_record(data: dict) -> Message:
+        """归档记录（未压缩的JSON文本）转换为Message，content/tool同样延迟解码"""
+        return Message.from_row(None, tuple(data.get(column) for column in Message.STORED_COLUMNS))
+
+    @staticmethod
+    def _sequence_records(records: List[dict]) -> List[dict]:
+        """增加seq之前归档的记录没有seq/ts，按记录顺序补齐（迁移时热库消息的序号从归档条数之后开始）"""
+        for position, data in enumerate(records, 1):
+            if data.get('seq') is None:
+                data['seq'] = position
+            if data.get('ts') is None:
+                data['ts'] = epoch_micros(data.get('timestamp'))
+        return records
     
+    def iter_messages(self, session_id: str, batch_size: int = 1000) -> Iterator[Message]:
+        """按时间正序分批遍历会话消息；已归档的会话直接从段文件读取，不写回热库"""
+        if self.archive is not None:
+            location = self._archive_location(session_id)
+            if location is not None:
+                try:
+                    records = self.archive.read(location[0], location[1], location[2])
+                except FileNotFoundError:
+                    # 并发取回已把消息写回热库并删除了段文件
+                    if self._archive_location(session_id) is not None:
+                        raise
+                    records = []
+                for data in self._sequence_records(records):
+                    yield self._from_record(data)
+        last_seq = 0
+        while True:
+            messages = self.engine.query(MESSAGE_SELECT + ' WHERE sessionId = ? AND seq > ? ORDER BY seq LIMIT ?',
+                                         (session_id, last_seq, batch_size), Message.from_row)
+            if not messages:
+                return
+            yield from messages
+            last_seq = messages[-1].seq
+
+    def _encode_row(self, message: Message) -> Tuple[tuple, str]:
+        """编码一条消息的写入参数（不含seq，seq在写事务内分配），返回(INSERT参数, 全文索引文本)"""
+        content, tool, codec = dumps(message.content), dumps(message.tool), None
+        if self.codec:
+            content, tool, codec = self.codec.encode(content, tool)
+        if message.ts is None:
+            message.ts = epoch_micros(message.timestamp)
+        params = (message.id, message.sessionId, content, tool, message.role,
+                  message.timestamp, message.creatorId, codec, message.ts)
+        return params, message_text(message.content)
+
+    @staticmethod
+    def _assign_seqs(conn, messages: List[Message]) -> List[Message]:
+        """在写事务内按输入顺序为seq为None的消息分配会话内递增的seq（已有seq的保留），并推进session.lastSeq；
+        单写线程保证分配是原子的"""
+        last_seqs = {}
+        for message in messages:
+            session_id = message.sessionId
+            if session_id not in last_seqs:
+                last_seqs[session_id] = conn.execute(LAST_SEQ_SQL, (session_id, session_id)).fetchone()[0]
+            if message.seq is None:
+                last_seqs[session_id] += 1
+                message.seq = last_seqs[session_id]
+            else:
+                last_seqs[session_id] = max(last_seqs[session_id], message.seq)
+        conn.executemany('UPDATE session SET lastSeq = ? WHERE id = ?',
+                         [(seq, session_id) for session_id, seq in last_seqs.items()])
+        return messages
+
+    @classmethod
+    def _insert_rows(cls, conn, messages: List[Message], rows: List[Tuple[tuple, str]], ignore_existing: bool) -> int:
+        """在写事务内分配seq，用executemany写入消息及其全文索引，返回写入条数；失败时撤销本次分配的seq"""
+        assigned = [message for message in messages if message.seq is None]
+        cls._assign_seqs(conn, messages)
+        try:
+            verb = 'INSERT OR IGNORE ' if ignore_existing else 'INSERT '
+            count = conn.executemany(verb + MESSAGE_INTO, [params + (message.seq,)
+                                                           for message, (params, _) in zip(messages, rows)]).rowcount
+            index_messages(conn, [(params[0], params[1], params[6], params[4], params[5], text)
+                                  for params, text in rows])
+        except Exception:
+            for message in assigned:
+                message.seq = None
+            raise
+        return count
+
+    def create_messages(self, messages: Iterable[Message], chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Message]:
+        """批量创建消息：每chunk_size条在一个事务中用executemany写入，同一事务内按会话汇总更新计数和预览；
+        某个分块失败（如id重复）时该分块整体回滚"""
+        created = []
+        for chunk in chunked(messages, chunk_size):
+            rows = [self._encode_row(message) for message in chunk]
+            # 与逐条create_message相同：updatedAt和预览取每个会话在输入中的最后一条
+            counters = {}
+            for message, (_, text) in zip(chunk, rows):
+                count = counters[message.sessionId][0] + 1 if message.sessionId in counters else 1
+                counters[message.sessionId] = (count, message.timestamp, text[:PREVIEW_LENGTH])
+            session_params = [(count, timestamp, preview, session_id)
+                              for session_id, (count, timestamp, preview) in counters.items()]
+
+            def insert(conn, chunk=chunk, rows=rows, session_params=session_params):
+                self._insert_rows(conn, chunk, rows, ignore_existing=False)
+                conn.executemany('''
+                    UPDATE session
+                    SET messageCount = messageCount + ?, updatedAt = ?, lastMessagePreview = ?
+                    WHERE id = ?
+                ''', session_params)
+
+            self.engine.write(insert)
+            created.extend(chunk)
+        return created
+
+    def import_messages(self, messages: Iterable[Message]) -> int:
+        """在一个事务中批量导入消息并建立全文索引（不修改会话计数，计数随会话一起导入），
+        导出时带的seq原样保留，没有seq的接在会话末尾；已存在的id或会话内已占用的seq跳过"""
+        messages = list(messages)
+        rows = [self._encode_row(message) for message in messages]
+        return self.engine.write(lambda conn: self._insert_rows(conn, messages, rows, ignore_existing=True))
+
     def delete_messages_by_session(self, session_id: str) -> bool:
-        """根据会话ID删除所有消息"""
-        cursor = self.conn.cursor()
-        cursor.execute('DELETE FROM message WHERE sessionId = ?', (session_id,))
-        self.conn.commit()
-        return cursor.rowcount > 0
+        """根据会话ID删除所有消息，已归档的会话同时删除它的段文件"""
+        segments = []
+
+        def delete(conn):
+            segments.clear()
+            unindex_session(conn, session_id)
+            rowcount = conn.execute('DELETE FROM message WHERE sessionId = ?', (session_id,)).rowcount
+            dropped = drop_archive_entry(conn, session_id)
+            if dropped is not None:
+                rowcount += 1
+                segments.append(dropped[1])
+            conn.execute("UPDATE session SET messageCount = 0, lastMessagePreview = '' WHERE id = ?",
+                         (session_id,))
+            return rowcount
+
+        deleted = self.engine.write(delete) > 0
+        # 事务提交后再删除文件，回滚时段文件仍可读取
+        self._remove_segments(segments)
+        return deleted
+
+    def _remove_segments(self, segments: List[Optional[str]]):
+        for segment in segments:
+            if segment is not None and self.archive is not None:
+                self.archive.remove(segment)
+
+    def _archive_location(self, session_id: str) -> Optional[tuple]:
+        return self.engine.query_one('SELECT segment, offset, length FROM message_archive WHERE sessionId = ?',
+                                     (session_id,))
+
+    def archive_session(self, session_id: str, updated_at: str = "") -> int:
+        """把会话的消息移到归档段文件，返回归档的消息数；期间有新消息写入时放弃并返回0"""
+        if self.archive is None:
+            raise RuntimeError("Archiving is not enabled for this mapper")
+        # 已归档过的会话先取回，保证一个会话只对应一条归档记录
+        self._rehydrate_if_archived(session_id)
+        rows = self.engine.query('SELECT * FROM message WHERE sessionId = ? ORDER BY seq', (session_id,))
+        if not rows:
+            return 0
+        records = []
+        for row in rows:
+            data = dict(row)
+            codec = data.pop('codec', None)
+            data['content'] = decode_payload(data['content'], codec)
+            data['tool'] = decode_payload(data['tool'], codec)
+            records.append(data)
+        segment, offset, length = self.archive.append(records, updated_at, session_id)
+
+        def move(conn):
+            count = conn.execute('SELECT COUNT(*) FROM message WHERE sessionId = ?', (session_id,)).fetchone()[0]
+            if count != len(records):
+                return 0
+            # 已归档的消息不留索引，取回时重新索引
+            unindex_session(conn, session_id)
+            conn.execute('DELETE FROM message WHERE sessionId = ?', (session_id,))
+            conn.execute('''
+                INSERT INTO message_archive (sessionId, segment, offset, length, messageCount, archivedAt)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (session_id, segment, offset, length, len(records), datetime.now().isoformat()))
+            conn.execute('UPDATE session SET archived = 1 WHERE id = ?', (session_id,))
+            return len(records)
+
+        try:
+            moved = self.engine.write(move)
+        except BaseException:
+            self.archive.remove(segment)
+            raise
+        if moved == 0:
+            # 放弃的归档不留下段文件
+            self.archive.remove(segment)
+        return moved
+
+    def _rehydrate_if_archived(self, session_id: str) -> Optional[int]:
+        """会话已归档时把消息从段文件写回热库并删除段文件，返回取回的消息数；会话没有归档记录时返回None"""
+        if self.archive is None:
+            return None
+        location = self._archive_location(session_id)
+        if location is None:
+            return None
+        try:
+            records = self._sequence_records(self.archive.read(location[0], location[1], location[2]))
+        except FileNotFoundError:
+            # 并发的取回已经完成并删除了段文件
+            if self._archive_location(session_id) is not None:
+                raise
+            return 0
+        rows, docs = [], []
+        for data in records:
+            data = dict(data)
+            docs.append((data['id'], data['sessionId'], data['creatorId'], data['role'], data['timestamp'],
+                         message_text(loads(data['content']))))
+            data['codec'] = None
+            if self.codec:
+                data['content'], data['tool'], data['codec'] = self.codec.encode(data['content'], data['tool'])
+            rows.append(data)
+
+        segments = []
 
+        def restore(conn):
+            segments.clear()
+            # 并发读取时只有第一个取回生效
+            dropped = drop_archive_entry(conn, session_id)
+            if dropped is None:
+                return 0
+            segments.append(dropped[1])
+            for data in rows:
+                columns = ', '.join(data.keys())
+                placeholders = ', '.join('?' * len(data))
+                conn.execute(f'INSERT OR IGNORE INTO message ({columns}) VALUES ({placeholders})',
+                             tuple(data.values()))
+            index_messages(conn, docs)
+            return len(rows)
 
+        restored = self.engine.write(restore)
+        self._remove_segments(segments)
+        return restored
@@ -0,0 +1,214 @@
+from typing import Callable, List, Optional, Tuple, Union
+import sqlite3
+from mapper.codec import decode_payload
+from mapper.engine import BaseEngine
+from mapper.models import epoch_micros, message_preview, message_text
+from mapper.search import create_search_tables, index_message, owner_key
+from shared.json_codec import loads
+
+
+def _backfill_session_counters(conn: sqlite3.Connection):
+    """根据已有消息回填会话的messageCount、updatedAt和最后一条消息预览"""
+    conn.execute('''
+        UPDATE session SET
+            messageCount = (SELECT COUNT(*) FROM message WHERE message.sessionId = session.id),
+            updatedAt = COALESCE(
+                (SELECT MAX(timestamp) FROM message WHERE message.sessionId = session.id), updatedAt)
+    ''')
+    rows = conn.execute('''
+        SELECT s.id,
+               (SELECT m.content FROM message m WHERE m.sessionId = s.id
+                ORDER BY m.timestamp DESC, m.id DESC LIMIT 1),
+               (SELECT m.codec FROM message m WHERE m.sessionId = s.id
+                ORDER BY m.timestamp DESC, m.id DESC LIMIT 1)
+        FROM session s
+    ''').fetchall()
+    for session_id, content, codec in rows:
+        if content is None:
+            continue
+        preview = message_preview(loads(decode_payload(content, codec)))
+        conn.execute('UPDATE session SET lastMessagePreview = ? WHERE id = ?', (preview, session_id))
+
+
+def _add_session_counters(conn: sqlite3.Connection):
+    conn.execute("ALTER TABLE session ADD COLUMN lastMessagePreview TEXT DEFAULT ''")
+    conn.execute('DROP INDEX IF EXISTS idx_session_creator_updated')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_session_creator_updated ON session(creatorId, updatedAt, id)')
+    _backfill_session_counters(conn)
+
+def _add_message_search(conn: sqlite3.Connection):
+    """创建全文索引并索引已有消息（已归档的消息不在热库中，不回填）"""
+    create_search_tables(conn)
+    rows = conn.execute('SELECT id, sessionId, creatorId, role, timestamp, content, codec FROM message')
+    for message_id, session_id, creator_id, role, timestamp, content, codec in rows:
+        text = message_text(loads(decode_payload(content, codec)))
+        index_message(conn, message_id, session_id, creator_id, role, timestamp, text)
+
+def _unindex_archived_sessions(conn: sqlite3.Connection):
+    """归档会话的索引（明文）从热库删除，取回时重新索引；只有短词的搜索按creatorId过滤，为其建索引"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_message_search_creator ON message_search(creatorId, id)')
+    # 此时message_fts可能还是保存明文的旧表（迁移10改为外部内容表），按旧表的方式删除
+    archived = 'SELECT id FROM message_search WHERE sessionId IN (SELECT sessionId FROM message_archive)'
+    conn.execute(f'DELETE FROM message_fts WHERE rowid IN ({archived})')
+    conn.execute(f'DELETE FROM message_search WHERE id IN ({archived})')
+
+def _use_external_content_search(conn: sqlite3.Connection):
+    """message_fts改为读取message表的外部内容表（删除热库中的明文副本），并增加按用户过滤的owner列；
+    新表从现有的message_search重建"""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(message_search)')}
+    if 'ownerKey' not in columns:
+        conn.execute('ALTER TABLE message_search ADD COLUMN ownerKey TEXT')
+    creators = conn.execute('SELECT DISTINCT creatorId FROM message_search WHERE ownerKey IS NULL').fetchall()
+    conn.executemany('UPDATE message_search SET ownerKey = ? WHERE creatorId IS ? AND ownerKey IS NULL',
+                     [(owner_key(creator_id), creator_id) for (creator_id,) in creators])
+    # 消息已删除但索引残留的行无法从message表读取原文
+    conn.execute('DELETE FROM message_search WHERE messageId NOT IN (SELECT id FROM message)')
+    conn.execute('DROP TABLE IF EXISTS message_fts')
+    conn.execute('DROP INDEX IF EXISTS idx_message_search_creator')
+    create_search_tables(conn)
+    conn.execute("INSERT INTO message_fts (message_fts) VALUES ('rebuild')")
+
+def _add_message_sequence(conn: sqlite3.Connection):
+    """增加会话内序号seq和epoch微秒ts，按原来的(timestamp, id)顺序回填；
+    已归档会话的消息排在热库消息之前，序号从归档条数之后开始（归档记录在取回时按顺序补齐）"""
+    conn.execute('ALTER TABLE message ADD COLUMN seq INTEGER')
+    conn.execute('ALTER TABLE message ADD COLUMN ts INTEGER')
+    conn.execute('ALTER TABLE session ADD COLUMN lastSeq INTEGER DEFAULT 0')
+    archived = dict(conn.execute('SELECT sessionId, messageCount FROM message_archive').fetchall())
+    rows = conn.execute('SELECT id, sessionId, timestamp FROM message ORDER BY sessionId, timestamp, id')
+    params = []
+    current, seq = None, 0
+    for message_id, session_id, timestamp in rows:
+        if session_id != current:
+            current, seq = session_id, archived.get(session_id, 0)
+        seq += 1
+        params.append((seq, epoch_micros(timestamp), message_id))
+    conn.executemany('UPDATE message SET seq = ?, ts = ? WHERE id = ?', params)
+    conn.execute('''
+        UPDATE session SET lastSeq = COALESCE(
+            (SELECT MAX(seq) FROM message WHERE message.sessionId = session.id),
+            (SELECT messageCount FROM message_archive WHERE message_archive.sessionId = session.id),
+            0)
+    ''')
+    conn.execute('DROP INDEX IF EXISTS idx_message_session_ts')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_message_session_seq ON message(sessionId, seq)')
+
+# 每个迁移步骤: (版本号, 描述, SQL语句列表或以写连接为参数的函数)
+Step = Union[List[str], Callable[[sqlite3.Connection], None]]
+
+MIGRATIONS: List[Tuple[int, str, Step]] = [
+    (1, 'create session, message and task tables', [
+        '''
+        CREATE TABLE IF NOT EXISTS session (
+            id TEXT PRIMARY KEY,
+            title TEXT,
+            agentId INTEGER,
+            agentName TEXT,
+            agentDescription TEXT,
+            agentAddress TEXT,
+            createdAt TEXT,
+            updatedAt TEXT,
+            messageCount INTEGER DEFAULT 0,
+            creatorId TEXT,
+            updaterId TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS message (
+            id TEXT PRIMARY KEY,
+            sessionId TEXT,
+            content TEXT,
+            tool TEXT,
+            role TEXT,
+            timestamp TEXT,
+            creatorId TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS task (
+            id TEXT PRIMARY KEY,
+            sessionId TEXT,
+            title TEXT,
+            description TEXT,
+            status TEXT,
+            progress INTEGER,
+            createdAt TEXT,
+            updatedAt TEXT,
+            creatorId TEXT,
+            updaterId TEXT,
+            result TEXT
+        )
+        ''',
+    ]),
+    (2, 'add lookup indexes for session, message and task', [
+        'CREATE INDEX IF NOT EXISTS idx_message_session_ts ON message(sessionId, timestamp, id)',
+        'CREATE INDEX IF NOT EXISTS idx_session_creator_updated ON session(creatorId, updatedAt)',
+        'CREATE INDEX IF NOT EXISTS idx_task_session_creator ON task(sessionId, creatorId)',
+    ]),
+    (3, 'add per-row codec marker for compressed message payloads', [
+        'ALTER TABLE message ADD COLUMN codec TEXT',
+    ]),
+    (4, 'maintain session message counters and last message preview', _add_session_counters),
+    (5, 'add offset index for archived sessions', [
+        '''
+        CREATE TABLE IF NOT EXISTS message_archive (
+            sessionId TEXT PRIMARY KEY,
+            segment TEXT,
+            offset INTEGER,
+            length INTEGER,
+            messageCount INTEGER,
+            archivedAt TEXT
+        )
+        ''',
+    ]),
+    (6, 'add FTS5 full-text search index over messages', _add_message_search),
+    (7, 'add per-session message sequence numbers and epoch-microsecond timestamps', _add_message_sequence),
+    (8, 'drop the search index of archived sessions; index search rows by creator', _unindex_archived_sessions),
+    (9, 'flag archived sessions; index archive rows by segment', [
+        'ALTER TABLE session ADD COLUMN archived INTEGER NOT NULL DEFAULT 0',
+        'UPDATE session SET archived = 1 WHERE id IN (SELECT sessionId FROM message_archive)',
+        'CREATE INDEX IF NOT EXISTS idx_message_archive_segment ON message_archive(segment)',
+    ]),
+    (10, 'search through an external-content FTS table filtered by owner', _use_external_content_search),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _current_version(conn: sqlite3.Connection) -> int:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            appliedAt TEXT DEFAULT (datetime('now'))
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+def migrate(engine: BaseEngine, target: Optional[int] = None) -> int:
+    """按版本顺序执行未应用的迁移，返回迁移后的版本号"""
+    if target is None:
+        target = LATEST_VERSION
+    if engine.schema_version >= target:
+        return engine.schema_version
+
+    def run(conn: sqlite3.Connection) -> int:
+        version = _current_version(conn)
+        for step_version, description, step in MIGRATIONS:
+            if step_version <= version or step_version > target:
+                continue
+            if callable(step):
+                step(conn)
+            else:
+                for sql in step:
+                    conn.execute(sql)
+            conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                         (step_version, description))
+            version = step_version
+        return version
+
+    # 整个升级在写线程的同一个事务内完成，失败时全部回滚
+    engine.schema_version = engine.write(run)
+    return engine.schema_version
@@ -1,7 +1,40 @@
-from datetime import datetime
-from dataclasses import dataclass
-from typing import Optional
+import time
+from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass, field
+from typing import Any, Optional
 from enum import Enum, auto
+from mapper.codec import decode_payload
+from shared.json_codec import dumps, loads
+
+# 会话列表中最后一条消息预览的最大长度
+PREVIEW_LENGTH = 100
+
+def message_text(content) -> str:
+    """消息内容的纯文本形式（用于预览和全文索引）"""
+    return content if isinstance(content, str) else dumps(content)
+
+def message_preview(content) -> str:
+    """生成消息预览文本"""
+    return message_text(content)[:PREVIEW_LENGTH]
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def epoch_micros(timestamp: Optional[str] = None) -> int:
+    """ISO时间字符串转换为epoch微秒（不带时区的按本地时间，无法解析时取当前时间），整数运算不损失精度"""
+    if timestamp:
+        try:
+            moment = datetime.fromisoformat(timestamp)
+        except ValueError:
+            pass
+        else:
+            if moment.tzinfo is None:
+                moment = moment.astimezone()
+            return (moment - _EPOCH) // timedelta(microseconds=1)
+    return time.time_ns() // 1000
+
+def now_iso() -> str:
+    """当前本地时间的ISO字符串（用作字段默认值时每个实例单独取值）"""
+    return datetime.now().isoformat()
 
 class TaskStatus(Enum):
     """任务状态枚举"""
@@ -9,7 +42,7 @@ class TaskStatus(Enum):
     PROCESSING = auto()
     FINISH = auto()
 
-@dataclass
+@dataclass(slots=True)
 class Session:
     """会话数据模型"""
     id: Optional[str] = None
@@ -18,34 +51,110 @@ class Session:
     agentName: str = ""
     agentDescription: str = ""
     agentAddress: str = ""
-    createdAt: str = datetime.now().isoformat()
-    updatedAt: str = datetime.now().isoformat()
+    createdAt: str = field(default_factory=now_iso)
+    updatedAt: str = field(default_factory=now_iso)
     messageCount: int = 0
     creatorId: str = ""
     updaterId: str = ""
+    lastMessagePreview: str = ""
     
     @classmethod
     def from_dict(cls, data: dict):
         """从字典创建Session对象"""
         return cls(**data)
 
-@dataclass
+    @classmethod
+    def from_row(cls, cursor, row: tuple):
+        """行工厂：按字段顺序查询的结果直接构造对象，不经过sqlite3.Row和dict"""
+        return cls(*row)
+
+    def to_dict(self) -> dict:
+        """转换为字典（浅拷贝，比dataclasses.asdict快）"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+# 尚未解码的字段
+_PENDING = object()
+
 class Message:
-    """消息数据模型"""
-    id: Optional[str] = None
-    sessionId: str = ""
-    content: str = ""
-    tool: str = ""
-    role: str = ""  # user/assistant
-    timestamp: str = datetime.now().isoformat()
-    creatorId: str = ""
-    
+    """消息数据模型（slots）。从数据库读取的消息保留content/tool编码后的原始值，首次访问时才解压并解析JSON。
+    seq是会话内单调递增的序号（写入时在写事务内分配），用于排序和游标；ts是timestamp对应的epoch微秒"""
+    __slots__ = ('id', 'sessionId', 'role', 'timestamp', 'creatorId', 'seq', 'ts', '_content', '_tool', '_payload')
+
+    # 对外的字段及顺序
+    FIELDS = ('id', 'sessionId', 'content', 'tool', 'role', 'timestamp', 'creatorId', 'seq', 'ts')
+    # 数据库行的列顺序：content/tool为JSON文本或压缩后的BLOB，codec为压缩标记
+    STORED_COLUMNS = ('id', 'sessionId', 'content', 'tool', 'role', 'timestamp', 'creatorId', 'seq', 'ts', 'codec')
+
+    def __init__(self, id: Optional[str] = None, sessionId: str = "", content: Any = "", tool: Any = "",
+                 role: str = "", timestamp: Optional[str] = None, creatorId: str = "",
+                 seq: Optional[int] = None, ts: Optional[int] = None):
+        self.id = id
+        self.sessionId = sessionId
+        self._content = content
+        self._tool = tool
+        self.role = role  # user/assistant
+        self.timestamp = timestamp if timestamp is not None else now_iso()
+        self.creatorId = creatorId
+        self.seq = seq
+        self.ts = ts
+        self._payload = None
+
+    @classmethod
+    def from_row(cls, cursor, row: tuple):
+        """行工厂：由STORED_COLUMNS顺序的行构造消息，content/tool延迟解码"""
+        message = cls.__new__(cls)
+        (message.id, message.sessionId, content, tool, message.role,
+         message.timestamp, message.creatorId, message.seq, message.ts, codec) = row
+        message._content = message._tool = _PENDING
+        message._payload = (content, tool, codec)
+        return message
+
     @classmethod
     def from_dict(cls, data: dict):
         """从字典创建Message对象"""
         return cls(**data)
 
-@dataclass
+    def _decode(self, index: int) -> Any:
+        payload = self._payload
+        value = loads(decode_payload(payload[index], payload[2]))
+        # 两个字段都解码后释放原始值
+        if (self._tool if index == 0 else self._content) is not _PENDING:
+            self._payload = None
+        return value
+
+    @property
+    def content(self) -> Any:
+        if self._content is _PENDING:
+            self._content = self._decode(0)
+        return self._content
+
+    @content.setter
+    def content(self, value: Any):
+        self._content = value
+
+    @property
+    def tool(self) -> Any:
+        if self._tool is _PENDING:
+            self._tool = self._decode(1)
+        return self._tool
+
+    @tool.setter
+    def tool(self, value: Any):
+        self._tool = value
+
+    def to_dict(self) -> dict:
+        """转换为字典（会解码content/tool）"""
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def __eq__(self, other):
+        if not isinstance(other, Message):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return 'Message(' + ', '.join(f'{name}={value!r}' for name, value in self.to_dict().items()) + ')'
+
+@dataclass(slots=True)
 class Task:
     """任务数据模型"""
     id: Optional[str] = None
@@ -54,8 +163,8 @@ class Task:
     description: str = ""
     status: TaskStatus = TaskStatus.INIT
     progress: int = 0
-    createdAt: str = datetime.now().isoformat()
-    updatedAt: str = datetime.now().isoformat()
+    createdAt: str = field(default_factory=now_iso)
+    updatedAt: str = field(default_factory=now_iso)
     creatorId: str = ""
     updaterId: str = ""
     result: str = ""
@@ -63,4 +172,37 @@ class Task:
     @classmethod
     def from_dict(cls, data: dict):
         """从字典创建Task对象"""
-        return cls(**data)
\ No newline at end of file
+        return cls(**data)
+
+    @classmethod
+    def from_row(cls, cursor, row: tuple):
+        """行工厂：按字段顺序查询的结果直接构造对象，不经过sqlite3.Row和dict"""
+        return cls(*row)
+
+    def to_dict(self) -> dict:
+        """转换为字典（浅拷贝，比dataclasses.asdict快）"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+@dataclass(slots=True)
+class SearchHit:
+    """全文搜索结果：命中消息的位置、高亮片段和相关度（bm25，越小越相关）"""
+    messageId: str = ""
+    sessionId: str = ""
+    role: str = ""
+    timestamp: str = ""
+    snippet: str = ""
+    score: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """从字典创建SearchHit对象"""
+        return cls(**data)
+
+    @classmethod
+    def from_row(cls, cursor, row: tuple):
+        """行工厂：按字段顺序查询的结果直接构造对象"""
+        return cls(*row)
+
+    def to_dict(self) -> dict:
+        """转换为字典"""
+        return {name: getattr(self, name) for name in self.__slots__}
@@ -0,0 +1,89 @@
+"""
+一次性迁移工具：按当前压缩配置重写已有消息行，并报告节省的空间
+
+    python -m mapper.recompress --db isek_database.db --codec zlib --threshold 1024 --vacuum
+"""
+
+import argparse
+import os
+import sqlite3
+from typing import Dict, Optional
+from mapper.codec import ContentCodec, available_codecs, decode_payload
+from mapper.engine import BaseEngine, SqliteEngine
+from mapper.migrations import migrate
+
+
+def _size(value) -> int:
+    if value is None:
+        return 0
+    return len(value) if isinstance(value, bytes) else len(value.encode('utf-8'))
+
+
+def recompress(engine: BaseEngine, codec: Optional[ContentCodec], batch_size: int = 500) -> Dict[str, int]:
+    """分批重写message表的content/tool；codec为None时解压为明文。
+    codec标记已是目标算法的行不读取也不重写，只扫描和改写编码会变化的行"""
+    migrate(engine)
+    stats = {"rows_scanned": 0, "rows_rewritten": 0, "payload_bytes_before": 0, "payload_bytes_after": 0}
+    target = codec.name if codec else None
+    last_rowid = 0
+    while True:
+        rows = engine.query('SELECT rowid, content, tool, codec FROM message WHERE rowid > ? AND codec IS NOT ? '
+                            'ORDER BY rowid LIMIT ?', (last_rowid, target, batch_size))
+        if not rows:
+            break
+        updates = []
+        for rowid, content, tool, marker in rows:
+            stats["rows_scanned"] += 1
+            before = _size(content) + _size(tool)
+            text_content = decode_payload(content, marker) or ''
+            text_tool = decode_payload(tool, marker) or ''
+            if codec:
+                new_content, new_tool, new_marker = codec.encode(text_content, text_tool)
+            else:
+                new_content, new_tool, new_marker = text_content, text_tool, None
+            stats["payload_bytes_before"] += before
+            if new_marker == marker:
+                # 明文行仍低于阈值或压缩后没有变小
+                stats["payload_bytes_after"] += before
+                continue
+            stats["payload_bytes_after"] += _size(new_content) + _size(new_tool)
+            updates.append((new_content, new_tool, new_marker, rowid))
+        if updates:
+            engine.executemany('UPDATE message SET content = ?, tool = ?, codec = ? WHERE rowid = ?', updates)
+            stats["rows_rewritten"] += len(updates)
+        last_rowid = rows[-1][0]
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompress stored message payloads")
+    parser.add_argument("--db", default="isek_database.db", help="database file (run once per shard file)")
+    parser.add_argument("--codec", default="zlib", choices=available_codecs() + ("none",))
+    parser.add_argument("--threshold", type=int, default=1024, help="minimum payload size in bytes to compress")
+    parser.add_argument("--level", type=int, default=None, help="compression level")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards so the file shrinks")
+    args = parser.parse_args()
+
+    codec = None if args.codec == "none" else ContentCodec(args.codec, args.threshold, args.level)
+    file_before = os.path.getsize(args.db)
+    engine = SqliteEngine(args.db)
+    stats = recompress(engine, codec, args.batch_size)
+    engine.close()
+    if args.vacuum:
+        conn = sqlite3.connect(args.db)
+        conn.execute('VACUUM')
+        conn.close()
+    file_after = os.path.getsize(args.db)
+
+    saved = stats["payload_bytes_before"] - stats["payload_bytes_after"]
+    print(f"Rows scanned:     {stats['rows_scanned']}")
+    print(f"Rows rewritten:   {stats['rows_rewritten']}")
+    print(f"Payload bytes:    {stats['payload_bytes_before']} -> {stats['payload_bytes_after']} "
+          f"(saved {saved})")
+    print(f"Database file:    {file_before} -> {file_after} bytes"
+          + ("" if args.vacuum else " (run with --vacuum to release free pages)"))
+
+
+if __name__ == '__main__':
+    main()
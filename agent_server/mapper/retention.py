@@ -0,0 +1,349 @@
+"""
+数据保留策略与后台压缩：按规则删除过期会话和超量消息（每个写事务只删一小批，避免长时间持有写锁），
+再用incremental_vacuum把空闲页还给文件系统，并删除不再被引用的归档段文件
+
+    python -m mapper.retention --max-age-days 180 --max-messages-per-session 5000
+    python -m mapper.retention --convert   # 已有数据库一次性切换到auto_vacuum=INCREMENTAL（全量VACUUM）
+"""
+
+import argparse
+import logging
+import threading
+import time
+from dataclasses import dataclass, fields
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from mapper.archive import ArchiveStore, drop_archive_entry
+from mapper.engine import BaseEngine
+from mapper.search import unindex_messages, unindex_session
+
+logger = logging.getLogger(__name__)
+
+# PRAGMA auto_vacuum的取值
+AUTO_VACUUM_INCREMENTAL = 2
+
+Report = Callable[[str, int], None]
+
+
+def _ignore(key: str, value: int):
+    pass
+
+
+@dataclass
+class RetentionPolicy:
+    """数据保留规则，None表示不限制"""
+    max_age_days: Optional[float] = None
+    max_messages_per_session: Optional[int] = None
+    max_sessions_per_user: Optional[int] = None
+    batch_size: int = 500  # 每个写事务最多删除的消息数
+    vacuum_pages: int = 1000  # 每个写事务incremental_vacuum释放的页数
+    interval_seconds: float = 3600  # 后台压缩的间隔
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]):
+        """从config.json的storage.retention创建，忽略未知字段"""
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in (data or {}).items() if key in names})
+
+    def has_rules(self) -> bool:
+        return any(rule is not None for rule in
+                   (self.max_age_days, self.max_messages_per_session, self.max_sessions_per_user))
+
+
+def delete_oldest_messages(engine: BaseEngine, session_id: str, batch_size: int,
+                           keep: Optional[int] = None) -> int:
+    """在一个写事务内删除会话最早的至多batch_size条消息及其索引；指定keep时只删除超出keep条的部分并更新计数"""
+    def delete(conn):
+        limit = batch_size
+        if keep is not None:
+            row = conn.execute('SELECT messageCount FROM session WHERE id = ?', (session_id,)).fetchone()
+            limit = min(batch_size, (row[0] if row else 0) - keep)
+            if limit <= 0:
+                return 0
+        ids = [row[0] for row in conn.execute(
+            'SELECT id FROM message WHERE sessionId = ? ORDER BY seq LIMIT ?', (session_id, limit))]
+        if not ids:
+            return 0
+        unindex_messages(conn, ids)
+        conn.execute(f"DELETE FROM message WHERE id IN ({', '.join('?' * len(ids))})", ids)
+        if keep is not None:
+            conn.execute('UPDATE session SET messageCount = MAX(messageCount - ?, 0) WHERE id = ?',
+                         (len(ids), session_id))
+        return len(ids)
+
+    return engine.write(delete)
+
+
+def purge_session(engine: BaseEngine, session_id: str, batch_size: int,
+                  on_purged: Optional[Callable[[str], None]] = None, archive: Optional[ArchiveStore] = None) -> int:
+    """分批删除会话的消息，最后删除会话本身、任务、归档记录（指定archive时连同段文件）和全文索引，
+    返回删除的消息数（含已归档的）；删除后调用on_purged(session_id)，让持有该会话缓存的组件失效"""
+    deleted = 0
+    while True:
+        count = delete_oldest_messages(engine, session_id, batch_size)
+        if count == 0:
+            break
+        deleted += count
+
+    segments = []
+
+    def delete(conn):
+        segments.clear()
+        # 分批期间新写入的消息一起删除
+        unindex_session(conn, session_id)
+        count = conn.execute('DELETE FROM message WHERE sessionId = ?', (session_id,)).rowcount
+        dropped = drop_archive_entry(conn, session_id)
+        if dropped is not None:
+            count += dropped[0]
+            segments.append(dropped[1])
+        conn.execute('DELETE FROM task WHERE sessionId = ?', (session_id,))
+        conn.execute('DELETE FROM session WHERE id = ?', (session_id,))
+        return count
+
+    deleted += engine.write(delete)
+    # 没有传入archive时段文件留给Compactor的段清理
+    if archive is not None:
+        for segment in segments:
+            if segment is not None:
+                archive.remove(segment)
+    if on_purged is not None:
+        on_purged(session_id)
+    return deleted
+
+
+def apply_retention(engine: BaseEngine, policy: RetentionPolicy, report: Report = _ignore,
+                    on_purged: Optional[Callable[[str], None]] = None,
+                    archive: Optional[ArchiveStore] = None) -> Dict[str, int]:
+    """对一个数据库执行保留策略，每删除一批就通过report(key, count)上报进度；
+    每删除一个会话或裁剪掉一个会话的消息后调用on_purged(session_id)，让缓存了该会话消息的组件失效；
+    指定archive时删除会话的同时删除其归档段文件"""
+    stats = {"sessions_deleted": 0, "messages_deleted": 0}
+
+    def add(key: str, count: int):
+        stats[key] += count
+        report(key, count)
+
+    def purge(session_id: str):
+        add("messages_deleted", purge_session(engine, session_id, policy.batch_size, on_purged, archive))
+        add("sessions_deleted", 1)
+
+    if policy.max_age_days is not None:
+        cutoff = (datetime.now() - timedelta(days=policy.max_age_days)).isoformat()
+        last_id = ''
+        while True:
+            rows = engine.query('SELECT id FROM session WHERE updatedAt < ? AND id > ? ORDER BY id LIMIT ?',
+                                (cutoff, last_id, policy.batch_size))
+            if not rows:
+                break
+            for row in rows:
+                purge(row[0])
+            last_id = rows[-1][0]
+
+    if policy.max_sessions_per_user is not None:
+        creators = engine.query('SELECT creatorId FROM session GROUP BY creatorId HAVING COUNT(*) > ?',
+                                (policy.max_sessions_per_user,))
+        for creator in creators:
+            rows = engine.query('SELECT id FROM session WHERE creatorId = ? '
+                                'ORDER BY updatedAt DESC, id DESC LIMIT -1 OFFSET ?',
+                                (creator[0], policy.max_sessions_per_user))
+            for row in rows:
+                purge(row[0])
+
+    if policy.max_messages_per_session is not None:
+        # 已归档会话的消息不在热库中，取回后再按规则裁剪
+        last_id = ''
+        while True:
+            rows = engine.query('''
+                SELECT id FROM session
+                WHERE messageCount > ? AND id > ? AND archived = 0
+                ORDER BY id LIMIT ?
+            ''', (policy.max_messages_per_session, last_id, policy.batch_size))
+            if not rows:
+                break
+            for row in rows:
+                trimmed = 0
+                while True:
+                    count = delete_oldest_messages(engine, row[0], policy.batch_size,
+                                                   keep=policy.max_messages_per_session)
+                    if count == 0:
+                        break
+                    trimmed += count
+                    add("messages_deleted", count)
+                if trimmed and on_purged is not None:
+                    on_purged(row[0])
+            last_id = rows[-1][0]
+
+    return stats
+
+
+def auto_vacuum_mode(engine: BaseEngine) -> int:
+    """在写连接上读取auto_vacuum（只读连接会缓存打开时的值）"""
+    return engine.maintenance(lambda conn: conn.execute('PRAGMA auto_vacuum').fetchone()[0])
+
+
+def file_size(engine: BaseEngine) -> int:
+    """数据库的逻辑大小（page_count * page_size）"""
+    return engine.query_one('PRAGMA page_count')[0] * engine.query_one('PRAGMA page_size')[0]
+
+
+def incremental_vacuum(engine: BaseEngine, pages: int = 1000) -> int:
+    """分批释放空闲页并截断WAL，返回回收的字节数；数据库不是auto_vacuum=INCREMENTAL时不做任何事"""
+    if auto_vacuum_mode(engine) != AUTO_VACUUM_INCREMENTAL:
+        return 0
+    before = file_size(engine)
+
+    def vacuum(conn):
+        # incremental_vacuum每步释放一页，必须取完结果才会执行完
+        conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+        return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+    while engine.write(vacuum) > 0:
+        pass
+    engine.maintenance(lambda conn: conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall())
+    return before - file_size(engine)
+
+
+def enable_incremental_vacuum(engine: BaseEngine) -> bool:
+    """把已有数据库切换到auto_vacuum=INCREMENTAL；需要一次全量VACUUM，期间阻塞所有写入"""
+    if auto_vacuum_mode(engine) == AUTO_VACUUM_INCREMENTAL:
+        return False
+
+    def convert(conn):
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('VACUUM')
+
+    engine.maintenance(convert)
+    return True
+
+
+class Compactor:
+    """后台压缩线程：按间隔对存储后端的每个数据库执行保留策略、incremental_vacuum和归档段清理"""
+
+    def __init__(self, backend, policy: RetentionPolicy):
+        self.backend = backend
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            "runs": 0,
+            "running": False,
+            "phase": "idle",
+            "database": None,
+            "sessions_deleted": 0,
+            "messages_deleted": 0,
+            "segments_deleted": 0,
+            "bytes_reclaimed": 0,
+            "last_run_at": None,
+            "last_run_seconds": 0.0,
+            "last_error": None,
+        }
+
+    def _report(self, key: str, count: int):
+        with self._lock:
+            self._stats[key] += count
+
+    def _set(self, **values):
+        with self._lock:
+            self._stats.update(values)
+
+    def stats(self) -> Dict:
+        """累计的删除数、回收字节数，以及当前运行的阶段和数据库"""
+        with self._lock:
+            return dict(self._stats)
+
+    def run_once(self):
+        """对所有数据库执行一轮压缩"""
+        started = time.monotonic()
+        self._set(running=True, last_run_at=datetime.now().isoformat(), last_error=None)
+        try:
+            for mapper_set in self.backend.all_mappers():
+                if self._stop.is_set():
+                    break
+                self._compact(mapper_set)
+        except Exception as e:
+            logger.error(f"Compaction failed: {e}")
+            self._set(last_error=str(e))
+        finally:
+            self._set(running=False, phase="idle", database=None,
+                      last_run_seconds=time.monotonic() - started)
+            self._report("runs", 1)
+
+    def _compact(self, mapper_set):
+        engine = mapper_set.engine
+        self._set(database=engine.db_path, phase="retention")
+        archive = mapper_set.message_mapper.archive
+        apply_retention(engine, self.policy, self._report, self.backend.session_purged, archive)
+
+        if archive is not None:
+            self._set(phase="segments")
+            referenced = [row[0] for row in engine.query('SELECT DISTINCT segment FROM message_archive')]
+            removed, reclaimed = archive.remove_segments(referenced)
+            self._report("segments_deleted", removed)
+            self._report("bytes_reclaimed", reclaimed)
+
+        self._set(phase="vacuum")
+        self._report("bytes_reclaimed", incremental_vacuum(engine, self.policy.vacuum_pages))
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.policy.interval_seconds)
+
+    def start(self):
+        """启动后台线程（立即执行第一轮）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='sqlite-compactor', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台线程，正在删除的批次提交后退出"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply retention rules and reclaim free space")
+    parser.add_argument("--max-age-days", type=float, default=None)
+    parser.add_argument("--max-messages-per-session", type=int, default=None)
+    parser.add_argument("--max-sessions-per-user", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--force", action="store_true",
+                        help="apply the rules in config.json even when storage.retention.enabled is false")
+    parser.add_argument("--convert", action="store_true",
+                        help="switch existing databases to auto_vacuum=INCREMENTAL (runs a full VACUUM)")
+    args = parser.parse_args()
+
+    from mapper import storageBackend, storage_config, shutdown
+    # 命令行参数覆盖config.json中的storage.retention；配置中的删除规则只在enabled或--force时生效
+    config = dict(storage_config.get("retention", {}))
+    if not config.get("enabled", False) and not args.force:
+        rules = ("max_age_days", "max_messages_per_session", "max_sessions_per_user")
+        if any(config.get(key) is not None for key in rules):
+            print("storage.retention is disabled: ignoring its rules (pass --force to apply them)")
+        config = {key: value for key, value in config.items() if key not in rules}
+    for key in ("max_age_days", "max_messages_per_session", "max_sessions_per_user", "batch_size"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    policy = RetentionPolicy.from_dict(config)
+
+    if args.convert:
+        for mapper_set in storageBackend.all_mappers():
+            converted = enable_incremental_vacuum(mapper_set.engine)
+            print(f"{mapper_set.engine.db_path}: {'converted' if converted else 'already incremental'}")
+
+    compactor = Compactor(storageBackend, policy)
+    compactor.run_once()
+    stats = compactor.stats()
+    print(f"deleted {stats['sessions_deleted']} sessions, {stats['messages_deleted']} messages, "
+          f"{stats['segments_deleted']} archive segments; reclaimed {stats['bytes_reclaimed']:,} bytes")
+    shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import hashlib
+import sqlite3
+from typing import List, Optional, Tuple
+from mapper.codec import decode_payload
+from mapper.models import message_text
+from shared.json_codec import loads
+
+# 全文检索：message_search保存每条被索引消息的元数据（自增id不会复用），
+# message_fts是以message_search.id为rowid的外部内容（external content）FTS5表，只保存倒排索引，
+# 明文由视图message_fts_source从message表解压得到，热库中不另存一份明文。
+# owner列是creatorId的摘要，搜索时在MATCH内按用户过滤，其他用户的命中不离开FTS5。
+# 删除索引时FTS5需要原文，所以必须在删除message行之前调用unindex_*。
+# 归档会话时同时删除它的索引，取回时重新索引，所以归档的会话在取回前搜索不到。
+
+# 片段高亮标记和长度（token数）
+SNIPPET_OPEN = '['
+SNIPPET_CLOSE = ']'
+SNIPPET_ELLIPSIS = '…'
+SNIPPET_TOKENS = 32
+
+
+def fts_tokenizer() -> str:
+    """trigram分词支持中文等无空格文本的子串搜索（需要SQLite 3.34+），否则退回unicode61"""
+    if sqlite3.sqlite_version_info >= (3, 34, 0):
+        return 'trigram'
+    return 'unicode61'
+
+
+# trigram分词只能MATCH三个字符以上的词；更短的词（如两个字的中文词）改用LIKE在明文上过滤
+MIN_MATCH_CHARS = 3 if fts_tokenizer() == 'trigram' else 1
+
+
+def owner_key(creator_id: str) -> str:
+    """message_fts.owner列的值：creatorId的定长十六进制摘要，短于trigram长度或互为子串的creatorId也能精确匹配"""
+    return hashlib.blake2b((creator_id or '').encode('utf-8'), digest_size=8).hexdigest()
+
+
+def search_text(content, codec: Optional[str]) -> str:
+    """message行中（可能压缩的）content列的全文索引文本，与写入时传给index_message的文本一致"""
+    payload = decode_payload(content, codec)
+    return message_text(loads(payload)) if payload else ''
+
+
+def register_search_functions(conn: sqlite3.Connection):
+    """注册视图message_fts_source使用的SQL函数，每个连接（包括只读连接）都需要注册"""
+    conn.create_function('search_text', 2, search_text, deterministic=True)
+
+
+def create_search_tables(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS message_search (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            messageId TEXT UNIQUE,
+            sessionId TEXT,
+            creatorId TEXT,
+            role TEXT,
+            timestamp TEXT,
+            ownerKey TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_message_search_session ON message_search(sessionId)')
+    conn.execute('''
+        CREATE VIEW IF NOT EXISTS message_fts_source AS
+        SELECT s.id AS id, search_text(m.content, m.codec) AS content, s.ownerKey AS owner
+        FROM message_search s JOIN message m ON m.id = s.messageId
+    ''')
+    conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(content, owner, "
+                 f"content='message_fts_source', content_rowid='id', tokenize='{fts_tokenizer()}')")
+
+
+def index_message(conn: sqlite3.Connection, message_id: str, session_id: str, creator_id: str,
+                  role: str, timestamp: str, text: str) -> bool:
+    """在写事务内索引一条消息，已索引的消息跳过"""
+    key = owner_key(creator_id)
+    cursor = conn.execute('''
+        INSERT OR IGNORE INTO message_search (messageId, sessionId, creatorId, role, timestamp, ownerKey)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (message_id, session_id, creator_id, role, timestamp, key))
+    if cursor.rowcount == 0:
+        return False
+    conn.execute('INSERT INTO message_fts (rowid, content, owner) VALUES (?, ?, ?)', (cursor.lastrowid, text, key))
+    return True
+
+
+def index_messages(conn: sqlite3.Connection, docs: List[Tuple[str, str, str, str, str, str]]):
+    """在写事务内批量索引消息，docs为(messageId, sessionId, creatorId, role, timestamp, text)，已索引的跳过"""
+    # id自增且只有一个写连接，所以本次新插入的行就是id大于插入前最大值的行
+    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM message_search').fetchone()[0]
+    conn.executemany('''
+        INSERT OR IGNORE INTO message_search (messageId, sessionId, creatorId, role, timestamp, ownerKey)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [doc[:5] + (owner_key(doc[2]),) for doc in docs])
+    texts = {doc[0]: doc[5] for doc in docs}
+    rows = conn.execute('SELECT id, messageId, ownerKey FROM message_search WHERE id > ?', (last_id,)).fetchall()
+    conn.executemany('INSERT INTO message_fts (rowid, content, owner) VALUES (?, ?, ?)',
+                     [(row[0], texts[row[1]], row[2]) for row in rows])
+
+
+def _unindex(conn: sqlite3.Connection, condition: str, params: List[str]) -> int:
+    # 外部内容表的删除命令要带上建索引时的原文，从视图（message行）读取
+    conn.execute(f"INSERT INTO message_fts (message_fts, rowid, content, owner) "
+                 f"SELECT 'delete', id, content, owner FROM message_fts_source "
+                 f"WHERE id IN (SELECT id FROM message_search WHERE {condition})", params)
+    return conn.execute(f'DELETE FROM message_search WHERE {condition}', params).rowcount
+
+
+def unindex_session(conn: sqlite3.Connection, session_id: str) -> int:
+    """在写事务内删除会话所有消息的索引（在删除message行之前调用）"""
+    return _unindex(conn, 'sessionId = ?', [session_id])
+
+
+def unindex_messages(conn: sqlite3.Connection, message_ids: List[str]) -> int:
+    """在写事务内删除指定消息的索引（在删除message行之前调用）"""
+    return _unindex(conn, f"messageId IN ({', '.join('?' * len(message_ids))})", message_ids)
+
+
+def fts_query(query: str) -> str:
+    """把用户输入转换为FTS5查询：每个词作为短语（转义引号），词之间为AND，避免FTS语法错误"""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def owner_match(creator_id: str, match: str) -> str:
+    """限定用户的FTS5查询：owner列精确匹配creatorId的摘要，查询词只匹配content列"""
+    owner = f'owner : "{owner_key(creator_id)}"'
+    return f'{owner} AND content : ({match})' if match else owner
+
+
+def split_query(query: str) -> Tuple[str, List[str]]:
+    """拆分用户输入：能用索引匹配的词组成FTS5查询，过短的词返回给LIKE过滤"""
+    terms = query.split()
+    match = fts_query(' '.join(term for term in terms if len(term) >= MIN_MATCH_CHARS))
+    return match, [term for term in terms if len(term) < MIN_MATCH_CHARS]
+
+
+def like_pattern(term: str) -> str:
+    """子串匹配的LIKE模式，转义通配符（配合ESCAPE '\\'）"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def search_sql(match: bool, like_terms: int) -> str:
+    """搜索SQL：有FTS5查询时按相关度排序，只有短词时最新的消息在前；每个短词增加一个LIKE条件"""
+    likes = " AND message_fts.content LIKE ? ESCAPE '\\'" * like_terms
+    return (SEARCH_SQL if match else LIKE_SEARCH_SQL).format(likes=likes)
+
+
+def like_snippet(text: str, term: str) -> str:
+    """LIKE命中的片段，格式与snippet()相同：高亮第一处命中，前后各保留约半个片段长度"""
+    position = text.lower().find(term.lower())
+    if position < 0:
+        return text[:SNIPPET_TOKENS] + (SNIPPET_ELLIPSIS if len(text) > SNIPPET_TOKENS else '')
+    stop = position + len(term)
+    start = max(0, position - SNIPPET_TOKENS // 2)
+    end = min(len(text), stop + SNIPPET_TOKENS // 2)
+    return ((SNIPPET_ELLIPSIS if start > 0 else '') + text[start:position]
+            + SNIPPET_OPEN + text[position:stop] + SNIPPET_CLOSE
+            + text[stop:end] + (SNIPPET_ELLIPSIS if end < len(text) else ''))
+
+
+def encode_search_cursor(offset: int) -> str:
+    """搜索结果按相关度排序，游标为下一页的偏移量"""
+    return str(offset)
+
+
+def decode_search_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        offset = int(cursor)
+    except ValueError:
+        raise ValueError(f"Invalid search cursor: {cursor}")
+    if offset < 0:
+        raise ValueError(f"Invalid search cursor: {cursor}")
+    return offset
+
+
+# 按bm25相关度排序（rank越小越相关），MATCH查询由owner_match生成，只命中该用户的消息；{likes}为短词的LIKE条件
+SEARCH_SQL = f'''
+    SELECT s.messageId, s.sessionId, s.role, s.timestamp,
+           snippet(message_fts, 0, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '{SNIPPET_ELLIPSIS}', {SNIPPET_TOKENS})
+               AS snippet,
+           message_fts.rank AS score
+    FROM message_fts JOIN message_search s ON s.id = message_fts.rowid
+    WHERE message_fts MATCH ?{{likes}}
+    ORDER BY message_fts.rank, s.id
+    LIMIT ? OFFSET ?
+'''
+
+# 查询只有短词时MATCH只按owner过滤，相关度无意义：返回明文，片段由like_snippet生成
+LIKE_SEARCH_SQL = '''
+    SELECT s.messageId, s.sessionId, s.role, s.timestamp, message_fts.content AS snippet, 0.0 AS score
+    FROM message_fts JOIN message_search s ON s.id = message_fts.rowid
+    WHERE message_fts MATCH ?{likes}
+    ORDER BY s.id DESC
+    LIMIT ? OFFSET ?
+'''
@@ -1,39 +1,48 @@
-import sqlite3
-from typing import List, Optional
+from dataclasses import fields
+from typing import Iterable, Iterator, List, Optional, Tuple
+from mapper.engine import BaseEngine, get_engine, chunked, DEFAULT_DB_PATH, DEFAULT_CHUNK_SIZE
+from mapper.migrations import migrate
 from mapper.models import Session
 
+SESSION_COLUMNS = [f.name for f in fields(Session)]
+# 按Session字段顺序查询，配合Session.from_row直接构造对象
+SESSION_SELECT = f"SELECT {', '.join(SESSION_COLUMNS)} FROM session"
+SESSION_INTO = f"INTO session ({', '.join(SESSION_COLUMNS)}) VALUES ({', '.join('?' * len(SESSION_COLUMNS))})"
+
+SESSION_ORDERS = {
+    # order: (排序方向, 游标比较符)
+    'recent': ('DESC', '<'),
+    'oldest': ('ASC', '>'),
+}
+
+
+def encode_session_cursor(session: Session) -> str:
+    """生成会话列表分页游标：取该会话之后的下一页时使用"""
+    return f"{session.updatedAt}|{session.id}"
+
+
+def decode_session_cursor(cursor: str) -> Tuple[str, str]:
+    """解析会话列表游标，返回(updatedAt, id)"""
+    updated_at, sep, session_id = cursor.rpartition('|')
+    if not sep:
+        raise ValueError(f"Invalid session cursor: {cursor}")
+    return updated_at, session_id
+
+
 class SessionMapper:
-    def __init__(self, db_path: str = 'isek_database.db'):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, engine: Optional[BaseEngine] = None):
+        self.engine = engine or get_engine(db_path)
         self._init_db()
     
     def _init_db(self):
-        """初始化数据库，如果表不存在则创建"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS session (
-                id TEXT PRIMARY KEY,
-                title TEXT,
-                agentId INTEGER,
-                agentName TEXT,
-                agentDescription TEXT,
-                agentAddress TEXT,
-                createdAt TEXT,
-                updatedAt TEXT,
-                messageCount INTEGER DEFAULT 0,
-                creatorId TEXT,
-                updaterId TEXT
-            )
-        ''')
-        self.conn.commit()
+        """初始化数据库，执行未应用的schema迁移"""
+        migrate(self.engine)
     
     def create_session(self, session: Session) -> Session:
         """创建新会话"""
         if not session.creatorId:
             raise ValueError("creatorId is required")
-        cursor = self.conn.cursor()
-        cursor.execute('''
+        self.engine.execute('''
             INSERT INTO session (
                 id, title, agentId, agentName, agentDescription, 
                 agentAddress, createdAt, updatedAt, messageCount, creatorId
@@ -50,37 +59,77 @@ class SessionMapper:
             session.messageCount,
             session.creatorId
         ))
-        self.conn.commit()
         return session
     
+    def create_sessions(self, sessions: Iterable[Session], chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Session]:
+        """批量创建会话：每chunk_size条在一个事务中用executemany写入，某个分块失败时该分块整体回滚"""
+        created = []
+        for chunk in chunked(sessions, chunk_size):
+            if any(not session.creatorId for session in chunk):
+                raise ValueError("creatorId is required")
+            params = [tuple(session.to_dict().values()) for session in chunk]
+            self.engine.executemany('INSERT ' + SESSION_INTO, params)
+            created.extend(chunk)
+        return created
+    
     def get_sessions(self, creator_id: str) -> List[Session]:
         """获取指定creator_id的所有会话"""
         if creator_id is None:
             raise ValueError("creator_id is required")
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM session WHERE creatorId = ?', (creator_id,))
-        sessions = []
-        for row in cursor.fetchall():
-            session = Session.from_dict(row)
-            sessions.append(session)
-        return sessions
+        return self.engine.query(SESSION_SELECT + ' WHERE creatorId = ?', (creator_id,), Session.from_row)
+    
+    def list_sessions(self, creator_id: str, order: str = 'recent', limit: int = 20,
+                      cursor: Optional[str] = None) -> List[Session]:
+        """按更新时间分页列出用户会话，只读取session表（消息数和预览已在写入时维护）"""
+        if creator_id is None:
+            raise ValueError("creator_id is required")
+        if order not in SESSION_ORDERS:
+            raise ValueError(f"order must be one of {list(SESSION_ORDERS)}")
+        direction, comparison = SESSION_ORDERS[order]
+        sql = SESSION_SELECT + ' WHERE creatorId = ?'
+        params = [creator_id]
+        if cursor:
+            sql += f' AND (updatedAt, id) {comparison} (?, ?)'
+            params += list(decode_session_cursor(cursor))
+        sql += f' ORDER BY updatedAt {direction}, id {direction} LIMIT ?'
+        params.append(limit)
+        return self.engine.query(sql, params, Session.from_row)
     
     def delete_session(self, session_id: str, creator_id: str) -> bool:
         """删除会话，必须验证creator_id权限"""
         if creator_id is None:
             raise ValueError("creator_id is required")
-        cursor = self.conn.cursor()
-        cursor.execute('DELETE FROM session WHERE id = ? AND creatorId = ?', (session_id, creator_id))
-        self.conn.commit()
-        return cursor.rowcount > 0
+        rowcount = self.engine.execute('DELETE FROM session WHERE id = ? AND creatorId = ?',
+                                       (session_id, creator_id))
+        return rowcount > 0
 
     def get_by_id(self, session_id: str, creator_id: str) -> Optional[Session]:
         """根据ID获取session"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM session WHERE id = ? AND creatorId = ?',
-                      (session_id, creator_id))
-        row = cursor.fetchone()
-        return Session.from_dict(row) if row else None
+        return self.engine.query_one(SESSION_SELECT + ' WHERE id = ? AND creatorId = ?',
+                                     (session_id, creator_id), Session.from_row)
+
+    def get_creator_id(self, session_id: str) -> Optional[str]:
+        """根据主键获取会话的creatorId，会话不存在时返回None"""
+        row = self.engine.query_one('SELECT creatorId FROM session WHERE id = ?', (session_id,))
+        return row[0] if row else None
     
 
+    def iter_sessions(self, creator_id: Optional[str] = None, batch_size: int = 1000) -> Iterator[Session]:
+        """按主键分批遍历会话（creator_id为None时遍历全部），内存占用与总量无关"""
+        last_id = ''
+        while True:
+            if creator_id is None:
+                sessions = self.engine.query(SESSION_SELECT + ' WHERE id > ? ORDER BY id LIMIT ?',
+                                             (last_id, batch_size), Session.from_row)
+            else:
+                sessions = self.engine.query(SESSION_SELECT + ' WHERE id > ? AND creatorId = ? ORDER BY id LIMIT ?',
+                                             (last_id, creator_id, batch_size), Session.from_row)
+            if not sessions:
+                return
+            yield from sessions
+            last_id = sessions[-1].id
 
+    def import_sessions(self, sessions: Iterable[Session]) -> int:
+        """在一个事务中批量导入会话（含计数字段），已存在的id跳过，返回导入条数"""
+        params = [tuple(session.to_dict().values()) for session in sessions]
+        return self.engine.executemany('INSERT OR IGNORE ' + SESSION_INTO, params)
@@ -1,42 +1,31 @@
-import sqlite3
-from typing import Optional, List
-from mapper.models import Task
+from dataclasses import fields
+from typing import Iterable, Optional, List
+from mapper.engine import BaseEngine, get_engine, DEFAULT_DB_PATH
+from mapper.migrations import migrate
+from mapper.models import Task, TaskStatus
+
+TASK_COLUMNS = [f.name for f in fields(Task)]
+# 按Task字段顺序查询，配合Task.from_row直接构造对象
+TASK_SELECT = f"SELECT {', '.join(TASK_COLUMNS)} FROM task"
 
 class TaskMapper:
     """Task数据操作类"""
     
-    def __init__(self, db_path: str = 'isek_database.db'):
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, engine: Optional[BaseEngine] = None):
+        self.engine = engine or get_engine(db_path)
         self._init_db()
     
     def _init_db(self):
-        """初始化数据库，如果表不存在则创建"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS task (
-                id TEXT PRIMARY KEY,
-                sessionId TEXT,
-                title TEXT,
-                description TEXT,
-                status TEXT,
-                progress INTEGER,
-                createdAt TEXT,
-                updatedAt TEXT,
-                creatorId TEXT,
-                updaterId TEXT,
-                result TEXT
-            )
-        ''')
-        self.conn.commit()
+        """初始化数据库，执行未应用的schema迁移"""
+        migrate(self.engine)
     
     def create(self, task: Task, creator_id: str) -> Optional[Task]:
         """创建新任务"""
         if not creator_id:
             return None
-            
-        cursor = self.conn.cursor()
-        cursor.execute('''
+        
+        status = task.status.name.lower() if isinstance(task.status, TaskStatus) else task.status
+        self.engine.execute('''
             INSERT INTO task (
                 id, sessionId, title, description, status, progress,
                 createdAt, updatedAt, creatorId, updaterId, result
@@ -46,56 +35,58 @@ class TaskMapper:
             task.sessionId,
             task.title,
             task.description,
-            task.status,
+            status,
+            task.progress,
             task.createdAt,
             task.updatedAt,
             creator_id,
-            creator_id
+            creator_id,
+            task.result
         ))
-        self.conn.commit()
         return task
     
     def get_by_id(self, task_id: str, creator_id: str) -> Optional[Task]:
         """根据ID获取任务"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM task WHERE id = ? AND creatorId = ?',
-                      (task_id, creator_id))
-        row = cursor.fetchone()
-        return Task.from_dict(row) if row else None
+        return self.engine.query_one(TASK_SELECT + ' WHERE id = ? AND creatorId = ?',
+                                     (task_id, creator_id), Task.from_row)
     
     def get_by_session_id(self, session_id: str, creator_id: str) -> List[Task]:
         """根据会话ID获取任务列表"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM task WHERE sessionId = ? AND creatorId = ?',
-                      (session_id, creator_id))
-        return [Task.from_dict(row) for row in cursor.fetchall()]
+        return self.engine.query(TASK_SELECT + ' WHERE sessionId = ? AND creatorId = ?',
+                                 (session_id, creator_id), Task.from_row)
     
     def processing(self, task_id: str, updater_id: str) -> bool:
         """将任务状态设置为processing"""
         if not updater_id:
             return False
-            
-        cursor = self.conn.cursor()
-        cursor.execute('''
+        
+        rowcount = self.engine.execute('''
             UPDATE task 
             SET status = ?, updatedAt = datetime('now'), updaterId = ?
             WHERE id = ? AND creatorId = ?
         ''', ('processing', updater_id, task_id, updater_id))
-        self.conn.commit()
-        return cursor.rowcount > 0
+        return rowcount > 0
     
     def finish(self, task_id: str, updater_id: str, result: str) -> bool:
         """将任务状态设置为finished"""
         if not updater_id:
             return False
-            
-        cursor = self.conn.cursor()
-        cursor.execute('''
+        
+        rowcount = self.engine.execute('''
             UPDATE task 
             SET status = ?, updatedAt = datetime('now'), updaterId = ?, result = ?
             WHERE id = ? AND creatorId = ?
         ''', ('finished', updater_id, result, task_id, updater_id))
-        self.conn.commit()
-        return cursor.rowcount > 0
-    
-    
\ No newline at end of file
+        return rowcount > 0
+
+    def import_tasks(self, tasks: Iterable[Task]) -> int:
+        """在一个事务中批量导入任务，已存在的id跳过，返回导入条数"""
+        columns = ', '.join(TASK_COLUMNS)
+        placeholders = ', '.join('?' * len(TASK_COLUMNS))
+        params = []
+        for task in tasks:
+            row = task.to_dict()
+            if isinstance(task.status, TaskStatus):
+                row['status'] = task.status.name.lower()
+            params.append(tuple(row.values()))
+        return self.engine.executemany(f'INSERT OR IGNORE INTO task ({columns}) VALUES ({placeholders})', params)
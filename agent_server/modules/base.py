@@ -2,9 +2,21 @@
 Base classes for modular SessionAdapter components
 """
 
+import asyncio
+import inspect
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
-from mapper.models import Session, Message
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from mapper.models import Session, Message, SearchHit, PREVIEW_LENGTH, message_text
+from mapper.session_mapper import encode_session_cursor
+from shared.json_codec import dumps
+from shared.message_formats import create_agent_response
+
+
+async def run_async(fn: Callable, *args) -> Any:
+    """Await fn(*args) if fn is a coroutine function, otherwise run it in a worker thread"""
+    if inspect.iscoroutinefunction(fn):
+        return await fn(*args)
+    return await asyncio.to_thread(fn, *args)
 
 
 class BaseSessionManager(ABC):
@@ -15,6 +27,16 @@ class BaseSessionManager(ABC):
         """Get all sessions for a user"""
         pass
     
+    def list_sessions(self, creator_id: str, order: str = 'recent', limit: int = 20,
+                      cursor: Optional[str] = None) -> List[Session]:
+        """List a page of a user's sessions ordered by last update ('recent' or 'oldest')"""
+        sessions = sorted(self.get_user_sessions(creator_id), key=lambda s: (s.updatedAt, s.id),
+                          reverse=(order == 'recent'))
+        if cursor:
+            position = next((i for i, s in enumerate(sessions) if encode_session_cursor(s) == cursor), None)
+            sessions = sessions[position + 1:] if position is not None else []
+        return sessions[:limit]
+    
     @abstractmethod
     def get_session_by_id(self, session_id: str, creator_id: str) -> Optional[Session]:
         """Get a specific session by ID"""
@@ -25,20 +47,131 @@ class BaseSessionManager(ABC):
         """Create a new session"""
         pass
     
+    def create_sessions(self, sessions: List[Session]) -> List[Session]:
+        """Create several sessions; storage-backed managers should override this with a batched write"""
+        return [self.create_session(session) for session in sessions]
+    
     @abstractmethod
     def delete_session(self, session_id: str, creator_id: str) -> bool:
         """Delete a session"""
         pass
     
     @abstractmethod
-    def get_session_messages(self, session_id: str, creator_id: str) -> List[Message]:
-        """Get all messages in a session"""
+    def get_session_messages(self, session_id: str, creator_id: str, limit: Optional[int] = None,
+                             before_cursor: Optional[str] = None) -> List[Message]:
+        """Get messages in a session, optionally a page of `limit` messages before a cursor"""
+        pass
+    
+    def get_last_messages(self, session_id: str, creator_id: str, n: int) -> List[Message]:
+        """Get the last n messages in a session, oldest first"""
+        return self.get_session_messages(session_id, creator_id, limit=n)
+    
+    def get_messages_since(self, session_id: str, creator_id: str, after_seq: int,
+                           limit: Optional[int] = None) -> List[Message]:
+        """Get messages with a sequence number greater than after_seq, in sequence order"""
+        messages = [m for m in self.get_session_messages(session_id, creator_id) if (m.seq or 0) > after_seq]
+        return messages if limit is None else messages[:limit]
+    
+    def get_message(self, session_id: str, creator_id: str, message_id: str) -> Optional[Message]:
+        """Get one message of a session by id, or None when it is not stored"""
+        return next((m for m in self.get_session_messages(session_id, creator_id) if m.id == message_id), None)
+    
+    def search_messages(self, creator_id: str, query: str, limit: int = 20,
+                        cursor: Optional[str] = None) -> Tuple[List[SearchHit], Optional[str]]:
+        """Search a user's messages for all query terms; returns (hits, next page cursor).
+        
+        The default scans every session in Python; storage-backed managers should
+        override it with an indexed search.
+        """
+        terms = [term.lower() for term in query.split()]
+        if not terms:
+            return [], None
+        offset = int(cursor) if cursor else 0
+        hits = []
+        for session in self.get_user_sessions(creator_id):
+            for message in self.get_session_messages(session.id, creator_id):
+                text = message_text(message.content)
+                if all(term in text.lower() for term in terms):
+                    hits.append(SearchHit(message.id, message.sessionId, message.role, message.timestamp,
+                                          text[:PREVIEW_LENGTH]))
+        page = hits[offset:offset + limit]
+        next_cursor = str(offset + limit) if len(hits) > offset + limit else None
+        return page, next_cursor
+    
+    def add_purge_listener(self, listener: Callable[[str], None]) -> None:
+        """Call listener(session_id) when the retention policy purges a session or trims its messages.
+        
+        Managers without a retention policy never purge, so the default ignores it.
+        """
         pass
     
+    # Async counterparts. The defaults run the sync methods in a worker thread;
+    # implementations with a native async storage path should override them.
+    
+    async def aget_user_sessions(self, creator_id: str) -> List[Session]:
+        """Get all sessions for a user"""
+        return await asyncio.to_thread(self.get_user_sessions, creator_id)
+    
+    async def alist_sessions(self, creator_id: str, order: str = 'recent', limit: int = 20,
+                             cursor: Optional[str] = None) -> List[Session]:
+        """List a page of a user's sessions ordered by last update"""
+        return await asyncio.to_thread(self.list_sessions, creator_id, order, limit, cursor)
+    
+    async def aget_session_by_id(self, session_id: str, creator_id: str) -> Optional[Session]:
+        """Get a specific session by ID"""
+        return await asyncio.to_thread(self.get_session_by_id, session_id, creator_id)
+    
+    async def acreate_session(self, session: Session) -> Session:
+        """Create a new session"""
+        return await asyncio.to_thread(self.create_session, session)
+    
+    async def acreate_sessions(self, sessions: List[Session]) -> List[Session]:
+        """Create several sessions"""
+        return await asyncio.to_thread(self.create_sessions, sessions)
+    
+    async def adelete_session(self, session_id: str, creator_id: str) -> bool:
+        """Delete a session"""
+        return await asyncio.to_thread(self.delete_session, session_id, creator_id)
+    
+    async def aget_session_messages(self, session_id: str, creator_id: str, limit: Optional[int] = None,
+                                    before_cursor: Optional[str] = None) -> List[Message]:
+        """Get messages in a session, optionally a page of `limit` messages before a cursor"""
+        return await asyncio.to_thread(self.get_session_messages, session_id, creator_id, limit, before_cursor)
+    
+    async def aget_last_messages(self, session_id: str, creator_id: str, n: int) -> List[Message]:
+        """Get the last n messages in a session, oldest first"""
+        return await asyncio.to_thread(self.get_last_messages, session_id, creator_id, n)
+    
+    async def aget_messages_since(self, session_id: str, creator_id: str, after_seq: int,
+                                  limit: Optional[int] = None) -> List[Message]:
+        """Get messages with a sequence number greater than after_seq"""
+        return await asyncio.to_thread(self.get_messages_since, session_id, creator_id, after_seq, limit)
+    
+    async def aget_message(self, session_id: str, creator_id: str, message_id: str) -> Optional[Message]:
+        """Get one message of a session by id"""
+        return await asyncio.to_thread(self.get_message, session_id, creator_id, message_id)
+    
+    async def acreate_message(self, message: Message, creator_id: str) -> Message:
+        """Create a new message in a session"""
+        return await asyncio.to_thread(self.create_message, message, creator_id)
+    
+    async def acreate_messages(self, messages: List[Message], creator_id: str) -> List[Message]:
+        """Create several messages"""
+        return await asyncio.to_thread(self.create_messages, messages, creator_id)
+    
+    async def asearch_messages(self, creator_id: str, query: str, limit: int = 20,
+                               cursor: Optional[str] = None) -> Tuple[List[SearchHit], Optional[str]]:
+        """Search a user's messages for all query terms"""
+        return await asyncio.to_thread(self.search_messages, creator_id, query, limit, cursor)
+    
     @abstractmethod
     def create_message(self, message: Message, creator_id: str) -> Message:
         """Create a new message in a session"""
         pass
+    
+    def create_messages(self, messages: List[Message], creator_id: str) -> List[Message]:
+        """Create several messages; storage-backed managers should override this with a batched write"""
+        return [self.create_message(message, creator_id) for message in messages]
 
 
 class BaseTaskManager(ABC):
@@ -58,6 +191,10 @@ class BaseTaskManager(ABC):
     def validate_task_data(self, task_type: str, task_data: Dict[str, Any]) -> bool:
         """Validate task data for a given task type"""
         pass
+    
+    async def aexecute_task(self, task_type: str, task_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a task, awaiting it if execute_task is a coroutine and threading it otherwise"""
+        return await run_async(self.execute_task, task_type, task_data)
 
 
 class BaseMessageHandler(ABC):
@@ -83,6 +220,36 @@ class BaseMessageHandler(ABC):
         """Handle session lifecycle events"""
         pass
     
+    def handle_search_message(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Search the user's messages through the handler's session manager (set by SessionAdapter)"""
+        session_manager = getattr(self, "session_manager", None)
+        if session_manager is None:
+            raise Exception("Session manager not configured")
+        data = parsed_data["data"]
+        hits, next_cursor = session_manager.search_messages(
+            data.get("user_id", ""), data.get("query", ""), data.get("limit", 20), data.get("cursor") or None
+        )
+        return create_agent_response(
+            success=True,
+            content=dumps({"results": [hit.to_dict() for hit in hits], "next_cursor": next_cursor}),
+            request_id=data.get("request_id", "")
+        )
+    
+    # Async counterparts used by SessionAdapter.arun. The defaults await the
+    # handler if it is a coroutine and otherwise run it in a worker thread.
+    
+    async def ahandle_chat_message(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle chat message and generate response without blocking the event loop"""
+        return await run_async(self.handle_chat_message, parsed_data)
+    
+    async def ahandle_session_lifecycle(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle session lifecycle events without blocking the event loop"""
+        return await run_async(self.handle_session_lifecycle, parsed_data)
+    
+    async def ahandle_search_message(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle a full-text search without blocking the event loop"""
+        return await run_async(self.handle_search_message, parsed_data)
+    
     @abstractmethod
     def get_message_type(self, parsed_data: Dict[str, Any]) -> str:
         """Extract message type from parsed data"""
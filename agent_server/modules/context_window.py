@@ -0,0 +1,136 @@
+"""
+Token-budgeted context windows for chat sessions
+
+A ContextWindow holds the newest messages of one session whose estimated
+token count fits a budget. Each message is serialized to its
+{"role", "content"} JSON fragment once, when it enters the window, so building
+a prompt only joins cached fragments; older messages fall out of the front as
+new ones push the total over budget. The newest message is always kept, so a
+single oversized message still reaches the agent.
+
+Windows track the highest message seq they have seen. DefaultMessageHandler
+seeds a window from the session's latest messages on first use and afterwards
+fetches only the messages stored since (get_messages_since), which also picks
+up messages written by other processes.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Iterable, Optional, Tuple
+
+from shared.json_codec import dumps
+
+DEFAULT_TOKEN_BUDGET = 3000
+DEFAULT_MAX_SESSIONS = 1024
+# Messages loaded when a window is (re)built from storage; also the catch-up page size
+DEFAULT_SEED_MESSAGES = 50
+# Per-message framing the model adds on top of the text (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting: about four characters per token"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class ContextWindow:
+    """Newest messages of one session that fit the token budget, as cached JSON fragments"""
+
+    __slots__ = ('creator_id', 'token_budget', 'fragments', 'costs', 'total_tokens', 'last_seq', 'last_entry', '_lock')
+
+    def __init__(self, creator_id: str, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.creator_id = creator_id
+        self.token_budget = token_budget
+        self.fragments = deque()
+        self.costs = deque()
+        self.total_tokens = 0
+        self.last_seq = 0
+        self.last_entry: Optional[Tuple[str, Any]] = None  # (role, content) of the newest message
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.fragments)
+
+    def extend(self, messages: Iterable) -> int:
+        """Append stored messages newer than last_seq (in seq order) and trim to budget; returns how many were added"""
+        added = 0
+        with self._lock:
+            for message in messages:
+                seq = message.seq
+                if seq is not None and seq <= self.last_seq:
+                    continue
+                fragment = dumps({"role": message.role, "content": message.content})
+                cost = estimate_tokens(fragment) + MESSAGE_OVERHEAD_TOKENS
+                self.fragments.append(fragment)
+                self.costs.append(cost)
+                self.total_tokens += cost
+                self.last_entry = (message.role, message.content)
+                if seq is not None:
+                    self.last_seq = seq
+                added += 1
+            while self.total_tokens > self.token_budget and len(self.fragments) > 1:
+                self.fragments.popleft()
+                self.total_tokens -= self.costs.popleft()
+        return added
+
+    def messages_json(self, role: Optional[str] = None, content: Any = None) -> str:
+        """The window as a JSON array; (role, content) is appended when it is not already the newest message"""
+        with self._lock:
+            fragments = list(self.fragments)
+            newest = self.last_entry
+        if role is not None and newest != (role, content):
+            fragments.append(dumps({"role": role, "content": content}))
+        return '[' + ','.join(fragments) + ']'
+
+    def history_json(self, role: str, content: Any) -> str:
+        """The window as a JSON array without its newest message when that message is (role, content)"""
+        with self._lock:
+            fragments = list(self.fragments)
+            if fragments and self.last_entry == (role, content):
+                fragments.pop()
+        return '[' + ','.join(fragments) + ']'
+
+
+class ContextWindowCache:
+    """Context windows by session id, least recently used evicted beyond max_sessions"""
+
+    def __init__(self, token_budget: int = DEFAULT_TOKEN_BUDGET, max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 seed_messages: int = DEFAULT_SEED_MESSAGES):
+        self.token_budget = token_budget
+        self.max_sessions = max_sessions
+        self.seed_messages = seed_messages
+        self._windows: "OrderedDict[str, ContextWindow]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def get(self, session_id: str, creator_id: str) -> Optional[ContextWindow]:
+        """The session's window if it can be extended incrementally for this creator, else None"""
+        with self._lock:
+            window = self._windows.get(session_id)
+            if window is None or window.creator_id != creator_id or not window.last_seq:
+                return None
+            self._windows.move_to_end(session_id)
+            return window
+
+    def seed(self, session_id: str, creator_id: str, messages: Iterable) -> ContextWindow:
+        """Replace the session's window with one built from its latest stored messages (oldest first)"""
+        window = ContextWindow(creator_id, self.token_budget)
+        window.extend(messages)
+        with self._lock:
+            self._windows[session_id] = window
+            self._windows.move_to_end(session_id)
+            while len(self._windows) > self.max_sessions:
+                self._windows.popitem(last=False)
+        return window
+
+    def drop(self, session_id: str) -> None:
+        """Forget a session's window (its messages were deleted or cleared)"""
+        with self._lock:
+            self._windows.pop(session_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._windows.clear()
@@ -0,0 +1,91 @@
+"""
+Decoder for ISEK-wrapped message envelopes
+
+Depending on the node, the adapter receives either the bare JSON payload,
+the A2A message object, or the string form of that object:
+
+    contextId='...' messageId='...' parts=[Part(root=TextPart(kind='text', metadata=None, text='{"type": ...}'))] ...
+
+In the string form the text part is a Python string literal, so it may be
+single- or double-quoted and contain any escape that repr() produces.
+"""
+
+import codecs
+from typing import Any, Optional
+
+TEXT_PART_MARKER = "TextPart("
+TEXT_FIELD = "text="
+QUOTES = "'\""
+
+
+def _message_parts_text(message: Any) -> Optional[str]:
+    """First text part of an A2A message object (parts of Part(root=TextPart) or bare TextPart)"""
+    for part in getattr(message, "parts", None) or []:
+        root = getattr(part, "root", part)
+        text = getattr(root, "text", None)
+        if isinstance(text, str):
+            return text
+    return None
+
+
+def _find_text_field(envelope: str, start: int) -> int:
+    """Index of the opening quote of the first `text=` field at or after `start`, or -1"""
+    position = envelope.find(TEXT_FIELD, start)
+    while position >= 0:
+        quote = position + len(TEXT_FIELD)
+        if quote < len(envelope) and envelope[quote] in QUOTES and envelope[position - 1] in "( ,":
+            return quote
+        position = envelope.find(TEXT_FIELD, position + 1)
+    return -1
+
+
+def _find_closing_quote(envelope: str, opening: int) -> int:
+    """Index of the unescaped quote that closes the literal opened at `opening`"""
+    quote = envelope[opening]
+    end = envelope.find(quote, opening + 1)
+    if end < 0:
+        raise ValueError("Unterminated text literal in ISEK message wrapper")
+    if envelope[end - 1] != "\\":
+        return end
+    # Blank out escape pairs with same-length filler so offsets are kept; repr()
+    # writes NUL as an escape, so the filler cannot create a false match
+    masked = envelope.replace("\\\\", "\0\0").replace("\\" + quote, "\0\0")
+    end = masked.find(quote, opening + 1)
+    if end < 0:
+        raise ValueError("Unterminated text literal in ISEK message wrapper")
+    return end
+
+
+def unescape_literal(body: str) -> str:
+    """Undo the backslash escapes repr() writes, without compiling the literal.
+    Characters outside Latin-1 are first written back as escapes so unicode_escape only sees bytes."""
+    if "\\" not in body:
+        return body
+    return codecs.decode(body.encode("latin-1", "backslashreplace"), "unicode_escape")
+
+
+def decode_text_literal(envelope: str, start: int = 0) -> str:
+    """Decode the first TextPart text literal at or after `start` in an envelope string"""
+    opening = _find_text_field(envelope, start)
+    if opening < 0:
+        raise ValueError("Could not extract JSON from ISEK message wrapper")
+    closing = _find_closing_quote(envelope, opening)
+    try:
+        return unescape_literal(envelope[opening + 1:closing])
+    except UnicodeDecodeError as e:
+        raise ValueError(f"Invalid text literal in ISEK message wrapper: {e}")
+
+
+def extract_envelope_text(message: Any) -> Optional[str]:
+    """Return the text payload of an ISEK envelope, or None if `message` is not one.
+
+    Accepts the A2A message object itself (its parts are read directly) or
+    its string form (the text literal is located and decoded in one pass).
+    Raises ValueError for a string that has a TextPart but no readable text.
+    """
+    if not isinstance(message, str):
+        return _message_parts_text(message)
+    marker = message.find(TEXT_PART_MARKER)
+    if marker < 0:
+        return None
+    return decode_text_literal(message, marker + len(TEXT_PART_MARKER) - 1)
@@ -0,0 +1,125 @@
+"""
+Idempotent request handling keyed by request_id
+
+Clients retry: ISEK's send_message retries on its own, and the client retries
+again after rediscovering agents, always with the same serialized message and
+so the same request_id. Without deduplication every retry runs the agent
+again and saves another copy of the user and assistant messages.
+
+IdempotencyCache remembers requests by key (message type, user and
+request_id). A duplicate that arrives while the first copy is still running
+waits for that execution and gets its response; one that arrives after it
+finished gets the stored response replayed, until the entry expires or is
+evicted (least recently completed first, beyond max_entries completed
+entries). After that a chat retry is still answered once: the message
+handler finds the agent reply saved under the request's message id and
+returns it instead of running the agent again. In-flight executions are tracked apart and never evicted, so a
+burst of new requests cannot make a running request's duplicates run again.
+Error responses are replayed like any other; only a request whose execution
+raised is forgotten, so its retry runs again.
+
+Executions are tracked with concurrent.futures.Future rather than asyncio
+futures because arun may be awaited on the caller's own loop or on the
+adapter's background loop: duplicates may be waiting on different loops and
+threads.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 600
+
+
+def request_key(message_type: str, user_id: str, request_id: str) -> str:
+    """Idempotency key of a request; scoped by user so one user's request_id never replays another's response"""
+    return f"{message_type}\0{user_id}\0{request_id}"
+
+
+class IdempotencyCache:
+    """In-flight and recently completed requests by key; completed ones bounded by entry count and TTL"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._in_flight: Dict[str, Future] = {}
+        # key -> (expires_at, future), least recently completed first
+        self._completed: "OrderedDict[str, Tuple[float, Future]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+        self.replays = 0
+        self.failures = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]):
+        """Create from a config.json "idempotency" section, ignoring unknown keys"""
+        names = ("max_entries", "ttl_seconds")
+        return cls(**{key: value for key, value in (data or {}).items() if key in names})
+
+    def __len__(self) -> int:
+        return len(self._in_flight) + len(self._completed)
+
+    async def arun(self, key: str, execute: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of execute() for key, running it only if no copy of the request is in flight or remembered"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                entry = self._completed.get(key)
+                if entry is not None and entry[0] > self._clock():
+                    self.replays += 1
+                    return entry[1].result()
+                if entry is not None:
+                    del self._completed[key]
+                owner = Future()
+                self._in_flight[key] = owner
+                self.executions += 1
+        if future is not None:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await execute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+                self.failures += 1
+            # Duplicates waiting on this execution fail with it; their own retries start afresh
+            owner.set_exception(e if isinstance(e, Exception) else RuntimeError("Request was cancelled"))
+            raise
+        owner.set_result(result)
+        with self._lock:
+            del self._in_flight[key]
+            self._completed[key] = (self._clock() + self.ttl_seconds, owner)
+            while len(self._completed) > self.max_entries:
+                self._completed.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def clear(self) -> None:
+        """Forget completed requests; in-flight executions stay so their duplicates still coalesce"""
+        with self._lock:
+            self._completed.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Tracked, in-flight and deduplicated request counts"""
+        with self._lock:
+            return {
+                "size": len(self._in_flight) + len(self._completed),
+                "in_flight": len(self._in_flight),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "replays": self.replays,
+                "failures": self.failures,
+                "evictions": self.evictions,
+            }
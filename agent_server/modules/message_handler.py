@@ -2,135 +2,172 @@
 Default implementation of message handling module
 """
 
-from typing import Dict, Any, List
-import json
+from typing import Dict, Any, Optional
 import uuid
 from datetime import datetime
-from .base import BaseMessageHandler
+from .base import BaseMessageHandler, run_async
+from .context_window import ContextWindow, ContextWindowCache, DEFAULT_TOKEN_BUDGET
+from .envelope import extract_envelope_text
+from .response_cache import ResponseCache, response_key
 from isek.utils.log import log
+from mapper.models import Message
 
 # Import shared message formats
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from shared import create_agent_response
+from shared import ChatMessage, InboundMessage, create_agent_response
+from shared.json_codec import JSONDecodeError, dumps, loads
+from shared.message_decoder import decode_message
+
+# Namespace of the message ids derived from a request_id
+MESSAGE_ID_NAMESPACE = uuid.UUID("6f1d7c2e-4b0a-5c8e-9a3d-2e7b1f0c4d59")
 
 
 class DefaultMessageHandler(BaseMessageHandler):
     """Default implementation of message handling"""
     
-    def __init__(self):
+    def __init__(self, context_token_budget: int = DEFAULT_TOKEN_BUDGET):
         self.agent_runner = None  # Will be set by SessionAdapter
+        self.async_agent_runner = None  # Coroutine runner for the async handlers, also set by SessionAdapter
         self.session_manager = None  # Will be set by SessionAdapter
+        # Per-session history passed to the agent, bounded by estimated tokens
+        self.context_windows = ContextWindowCache(token_budget=context_token_budget)
+        # Optional cache of agent replies, set by SessionAdapter for agents that opt in
+        self.response_cache: Optional[ResponseCache] = None
+        self.response_agent_id = ""
         log.info("DefaultMessageHandler initialized")
     
     def set_agent_runner(self, runner_func):
         """Set the agent runner function"""
         self.agent_runner = runner_func
+    
+    def set_async_agent_runner(self, runner_func):
+        """Set the runner awaited by the async handlers; without one they run agent_runner in a worker thread"""
+        self.async_agent_runner = runner_func
         
+    def set_response_cache(self, cache: Optional[ResponseCache], agent_id: str = ""):
+        """Answer repeated chat turns of this agent from cache (None disables caching)"""
+        self.response_cache = cache
+        self.response_agent_id = agent_id
+    
     def set_session_manager(self, session_manager):
         """Set the session manager for saving messages"""
+        if session_manager is not self.session_manager:
+            self.context_windows.clear()
+            # Sessions purged or trimmed by the retention policy must not be served from a cached window
+            add_purge_listener = getattr(session_manager, "add_purge_listener", None)
+            if add_purge_listener is not None:
+                add_purge_listener(self.context_windows.drop)
         self.session_manager = session_manager
     
-    def parse_message(self, message: str) -> Dict[str, Any]:
-        """Parse incoming message with strict validation - throws exceptions for bad data"""
+    def parse_message(self, message: Any) -> Dict[str, Any]:
+        """Parse incoming message with strict validation - throws exceptions for bad data.
+        
+        Accepts direct JSON (str or bytes), an ISEK/A2A message object, or the string form of one.
+        The result carries the raw JSON object as "data" and its typed form as "message".
+        """
+        # Direct JSON first: a chat message may itself mention TextPart(
+        if isinstance(message, (bytes, bytearray, memoryview)):
+            data = loads(message)
+        elif isinstance(message, str) and message.lstrip().startswith('{'):
+            data = loads(message)
+        
         # Handle ISEK framework wrapped messages
-        if "contextId=" in message and "messageId=" in message and "parts=[Part(root=TextPart(" in message:
-            # Extract JSON from ISEK message wrapper
-            import re
-            json_match = re.search(r"text='([^']*)'", message)
-            if not json_match:
-                raise ValueError("Could not extract JSON from ISEK message wrapper")
-            
-            json_str = json_match.group(1)
-            # Unescape the JSON string
-            json_str = json_str.replace('\\"', '"').replace('\\\\', '\\')
+        else:
+            json_str = extract_envelope_text(message)
+            if json_str is None:
+                raise ValueError(f"Message must be JSON format, received: {str(message)[:100]}...")
             
             try:
-                data = json.loads(json_str)
-                log.info(f"Extracted JSON from ISEK wrapper: {data}")
-            except json.JSONDecodeError as e:
+                data = loads(json_str)
+                log.debug(f"Extracted {len(json_str)} chars of JSON from ISEK wrapper")
+            except JSONDecodeError as e:
                 log.error(f"Failed to parse extracted JSON: {e}")
-                log.error(f"Extracted string was: {json_str}")
+                log.error(f"Extracted string was: {json_str[:200]}")
                 raise ValueError(f"Invalid JSON in ISEK wrapper: {e}")
         
-        # Try to parse as direct JSON
-        elif message.strip().startswith('{'):
-            data = json.loads(message)
-            
-        else:
-            raise ValueError(f"Message must be JSON format, received: {message[:100]}...")
-        
-        # Strict validation of required fields
-        msg_type = data.get("type")
-        if not msg_type:
-            raise ValueError("Message must contain 'type' field")
-        
-        if msg_type == "chat":
-            required_fields = ["user_id", "session_id", "user_message"]
-            for field in required_fields:
-                if field not in data:
-                    raise ValueError(f"Chat message missing required field: {field}")
-            
-            if not data["user_message"].strip():
-                raise ValueError("Chat message cannot be empty")
-                
-        elif msg_type == "agent_config_request":
-            if "node_id" not in data:
-                raise ValueError("agent_config_request missing required field: node_id")
-                
-        elif msg_type == "session_lifecycle":
-            required_fields = ["action", "session_id", "user_id"]
-            for field in required_fields:
-                if field not in data:
-                    raise ValueError(f"session_lifecycle message missing required field: {field}")
-                    
-        elif msg_type == "task":
-            if "task_type" not in data:
-                raise ValueError("task message missing required field: task_type")
-        else:
-            raise ValueError(f"Unsupported message type: {msg_type}")
+        # Validate and decode into the typed message dataclass
+        typed = decode_message(data)
         
         return {
             "success": True,
-            "type": msg_type,
-            "data": data
+            "type": typed.type,
+            "data": data,
+            "message": typed
         }
     
     def format_response(self, response_data: Dict[str, Any]) -> str:
         """Format response for sending back to client"""
         try:
-            return json.dumps(response_data, ensure_ascii=False)
+            return dumps(response_data)
         except Exception as e:
             log.error(f"Error formatting response: {e}")
-            return json.dumps({
+            return dumps({
                 "success": False,
                 "error": "Failed to format response"
             })
     
+    @staticmethod
+    def _typed_message(parsed_data: Dict[str, Any]) -> InboundMessage:
+        """Typed message from parse_message, decoded from the raw data when parsed_data was built elsewhere"""
+        message = parsed_data.get("message")
+        return message if message is not None else decode_message(parsed_data["data"])
+    
+    def _chat_fields(self, message: ChatMessage):
+        """Extract (session_id, user, user_message, request_id) from a chat message and log its arrival"""
+        session_id = message.session_id
+        user_id = message.user_id
+        user_message = message.user_message
+        request_id = message.request_id
+        
+        actual_user = user_id if user_id and user_id != "default_user" else "unknown_user"
+        session_short = session_id[:12] if session_id else "no_session"
+        msg_preview = user_message[:60] + "..." if len(user_message) > 60 else user_message
+        
+        log.info(f"Chat received: user='{actual_user}' session='{session_short}' msg='{msg_preview}'")
+        return session_id, actual_user, user_message, request_id
+    
+    def _chat_response(self, agent_response: str, request_id: str) -> Dict[str, Any]:
+        """Wrap the agent's reply, unpacking it when the agent already answered in response format"""
+        try:
+            parsed_response = loads(agent_response)
+            if isinstance(parsed_response, dict) and "content" in parsed_response:
+                return create_agent_response(
+                    success=parsed_response.get("success", True),
+                    content=parsed_response.get("content", ""),
+                    tool_calls=parsed_response.get("tool_calls", []),
+                    request_id=request_id
+                )
+        except (JSONDecodeError, TypeError):
+            pass
+        
+        return create_agent_response(
+            success=True,
+            content=agent_response,
+            request_id=request_id
+        )
+    
     def handle_chat_message(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
         """Handle chat message with session management and agent processing"""
         try:
             data = parsed_data["data"]
-            session_id = data.get("session_id", "")
-            user_id = data.get("user_id", "")
-            user_message = data.get("user_message", "")
-            request_id = data.get("request_id", "")
-            
-            actual_user = user_id if user_id and user_id != "default_user" else "unknown_user"
+            session_id, actual_user, user_message, request_id = self._chat_fields(self._typed_message(parsed_data))
             session_short = session_id[:12] if session_id else "no_session"
-            msg_preview = user_message[:60] + "..." if len(user_message) > 60 else user_message
             
-            log.info(f"Chat received: user='{actual_user}' session='{session_short}' msg='{msg_preview}'")
+            # A retry of a turn that was already answered gets the stored reply, not a second agent run
+            stored = self._stored_reply(session_id, actual_user, request_id)
+            if stored is not None:
+                return self._chat_response(stored, request_id)
             
             # Save user message to session if session manager available
             if self.session_manager and session_id:
-                self._save_user_message(session_id, user_message, actual_user)
+                self._save_user_message(session_id, user_message, actual_user, request_id)
             
-            # Get session history for context if available
-            session_history = []
+            # Bring the session's context window up to date (only new messages are read)
+            window = None
             if self.session_manager and session_id:
-                session_history = self._get_session_history(session_id, actual_user)
+                window = self._context_window(session_id, actual_user)
             
             # Agent runner is required - no fallbacks
             if not self.agent_runner:
@@ -138,90 +175,147 @@ class DefaultMessageHandler(BaseMessageHandler):
             
             log.info(f"Starting agent processing for session {session_short}")
             # Create enriched prompt with session history
-            original_prompt = self._create_agent_prompt(data, session_history)
+            original_prompt = self._create_agent_prompt(data, window)
             log.info(f"Calling agent with prompt length: {len(original_prompt)}")
             
-            # Call agent directly
-            agent_response = self.agent_runner(original_prompt)
+            # Call agent directly unless the same turn was answered before
+            cache_key = self._response_key(data, window)
+            agent_response = self.response_cache.get(cache_key) if cache_key else None
+            if agent_response is None:
+                agent_response = self.agent_runner(original_prompt)
+                if cache_key:
+                    self.response_cache.put(cache_key, agent_response)
+            else:
+                log.info(f"Response cache hit for session {session_short}")
             log.info(f"Agent response: {agent_response[:100]}...")
             
             # Save response to session
             if self.session_manager and session_id:
-                self._save_agent_message(session_id, agent_response, actual_user)
-            
-            # Parse agent response if it's JSON
-            try:
-                import json
-                parsed_response = json.loads(agent_response)
-                if isinstance(parsed_response, dict) and "content" in parsed_response:
-                    return create_agent_response(
-                        success=parsed_response.get("success", True),
-                        content=parsed_response.get("content", ""),
-                        tool_calls=parsed_response.get("tool_calls", []),
-                        request_id=request_id
-                    )
-            except (json.JSONDecodeError, TypeError):
-                pass
+                self._save_agent_message(session_id, agent_response, actual_user, request_id)
             
-            return create_agent_response(
-                success=True,
-                content=agent_response,
-                request_id=request_id
-            )
+            return self._chat_response(agent_response, request_id)
             
         except Exception as e:
             log.error(f"Error handling chat message: {e}")
             raise
     
-    def _create_agent_prompt(self, data: Dict[str, Any], session_history: List[Dict]) -> str:
-        """Create enriched prompt for agent with session history"""
-        user_message = data.get("user_message", "")
-        
-        # If we have session history, create a more complete prompt
-        if session_history:
-            # Convert session history to client-compatible format
-            messages = []
-            for msg in session_history[-10:]:  # Last 10 messages for context
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+    async def ahandle_chat_message(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle chat message end to end on the event loop: storage goes through the
+        session manager's async API and the agent runner is awaited"""
+        try:
+            data = parsed_data["data"]
+            session_id, actual_user, user_message, request_id = self._chat_fields(self._typed_message(parsed_data))
+            session_short = session_id[:12] if session_id else "no_session"
             
-            # Add current user message
-            messages.append({
-                "role": "user", 
-                "content": user_message
-            })
+            stored = await self._astored_reply(session_id, actual_user, request_id)
+            if stored is not None:
+                return self._chat_response(stored, request_id)
             
-            # Create enriched data structure
-            enriched_data = data.copy()
-            enriched_data["messages"] = messages
+            window = None
+            if self.session_manager and session_id:
+                await self._asave_message(session_id, user_message, actual_user, "user", request_id)
+                window = await self._acontext_window(session_id, actual_user)
             
-            # For agents that can handle structured data, return JSON
-            try:
-                import json
-                return json.dumps(enriched_data, ensure_ascii=False)
-            except:
-                pass
+            runner = self.async_agent_runner or self.agent_runner
+            if not runner:
+                raise Exception("Agent runner not configured")
+            
+            log.info(f"Starting agent processing for session {session_short}")
+            original_prompt = self._create_agent_prompt(data, window)
+            log.info(f"Calling agent with prompt length: {len(original_prompt)}")
+            
+            # Async runners are awaited, blocking ones run in a worker thread
+            cache_key = self._response_key(data, window)
+            agent_response = self.response_cache.get(cache_key) if cache_key else None
+            if agent_response is None:
+                agent_response = await run_async(runner, original_prompt)
+                if cache_key:
+                    self.response_cache.put(cache_key, agent_response)
+            else:
+                log.info(f"Response cache hit for session {session_short}")
+            log.info(f"Agent response: {agent_response[:100]}...")
+            
+            if self.session_manager and session_id:
+                await self._asave_message(session_id, agent_response, actual_user, "assistant", request_id)
+            
+            return self._chat_response(agent_response, request_id)
+            
+        except Exception as e:
+            log.error(f"Error handling chat message: {e}")
+            raise
+    
+    def _create_agent_prompt(self, data: Dict[str, Any], window: Optional[ContextWindow]) -> str:
+        """Create enriched prompt for agent: the inbound message with its "messages" replaced by the
+        session's context window, spliced in from cached fragments rather than re-serialized"""
+        user_message = data.get("user_message", "")
+        
+        # Without session history the agent gets the plain user message
+        if not window:
+            return user_message
         
-        # Fallback to simple user message
-        return user_message
+        # The client's own copy of the history is dropped; the window is the history
+        head = dumps({key: value for key, value in data.items() if key != "messages"})
+        separator = "," if len(head) > 2 else ""
+        return f'{head[:-1]}{separator}"messages":{window.messages_json("user", user_message)}}}'
+    
+    def _response_key(self, data: Dict[str, Any], window: Optional[ContextWindow]) -> Optional[bytes]:
+        """Response cache key for a chat turn (None when caching is off): the agent, system prompt,
+        history before this message and the message itself"""
+        if self.response_cache is None:
+            return None
+        user_message = data.get("user_message", "")
+        history = window.history_json("user", user_message) if window else ""
+        return response_key(self.response_agent_id, user_message, history, str(data.get("system_prompt") or ""))
+    
+    def _stored_reply(self, session_id: str, user_id: str, request_id: str) -> Optional[str]:
+        """The agent reply saved for this request_id by an earlier copy of the request, if any. The
+        adapter's idempotency cache replays recent responses; this covers retries that arrive after
+        that entry expired, whose reply would otherwise be recomputed and then dropped on save"""
+        if not (self.session_manager and session_id and request_id):
+            return None
+        message = self.session_manager.get_message(session_id, user_id,
+                                                   self._message_id(session_id, request_id, "assistant"))
+        if message is None:
+            return None
+        log.info(f"Replaying stored reply for request {request_id} in session {session_id[:12]}")
+        return message.content
     
+    async def _astored_reply(self, session_id: str, user_id: str, request_id: str) -> Optional[str]:
+        """The agent reply saved for this request_id, read through the async storage API"""
+        if not (self.session_manager and session_id and request_id):
+            return None
+        message = await self.session_manager.aget_message(session_id, user_id,
+                                                          self._message_id(session_id, request_id, "assistant"))
+        if message is None:
+            return None
+        log.info(f"Replaying stored reply for request {request_id} in session {session_id[:12]}")
+        return message.content
     
-    def _save_user_message(self, session_id: str, content: str, user_id: str):
+    @staticmethod
+    def _message_id(session_id: str, request_id: str, role: str) -> str:
+        """Message id of a turn's user input or agent reply: derived from the request_id when there is one,
+        so a retried request saves nothing twice (storage skips ids it already has)"""
+        if not request_id:
+            return str(uuid.uuid4())
+        return str(uuid.uuid5(MESSAGE_ID_NAMESPACE, f"{session_id}\0{request_id}\0{role}"))
+    
+    @classmethod
+    def _new_message(cls, session_id: str, content: str, user_id: str, role: str, request_id: str = "") -> Message:
+        """Build a session message for the user's input or the agent's reply"""
+        return Message(
+            id=cls._message_id(session_id, request_id, role),
+            sessionId=session_id,
+            content=content,
+            tool="",  # Empty for regular messages
+            role=role,
+            timestamp=datetime.now().isoformat(),
+            creatorId=user_id
+        )
+    
+    def _save_user_message(self, session_id: str, content: str, user_id: str, request_id: str = ""):
         """Save user message to session"""
         try:
-            from mapper.models import Message
-            import uuid
-            message = Message(
-                id=str(uuid.uuid4()),
-                sessionId=session_id,
-                content=content,
-                tool="",  # Empty for regular messages
-                role="user",
-                timestamp=datetime.now().isoformat(),
-                creatorId=user_id
-            )
+            message = self._new_message(session_id, content, user_id, "user", request_id)
             result = self.session_manager.create_message(message, user_id)
             log.info(f"User message saved to session {session_id[:12]}: {content[:50]}...")
             return result
@@ -229,20 +323,10 @@ class DefaultMessageHandler(BaseMessageHandler):
             log.error(f"Error saving user message: {e}")
             raise
     
-    def _save_agent_message(self, session_id: str, content: str, user_id: str):
+    def _save_agent_message(self, session_id: str, content: str, user_id: str, request_id: str = ""):
         """Save agent message to session"""
         try:
-            from mapper.models import Message
-            import uuid
-            message = Message(
-                id=str(uuid.uuid4()),
-                sessionId=session_id,
-                content=content,
-                tool="",  # Empty for regular messages  
-                role="assistant",
-                timestamp=datetime.now().isoformat(),
-                creatorId=user_id
-            )
+            message = self._new_message(session_id, content, user_id, "assistant", request_id)
             result = self.session_manager.create_message(message, user_id)
             log.info(f"Agent message saved to session {session_id[:12]}: {content[:50]}...")
             return result
@@ -250,40 +334,103 @@ class DefaultMessageHandler(BaseMessageHandler):
             log.error(f"Error saving agent message: {e}")
             raise
     
-    def _get_session_history(self, session_id: str, user_id: str) -> List[Dict]:
-        """Get session chat history in client-compatible ChatMessage format"""
+    async def _asave_message(self, session_id: str, content: str, user_id: str, role: str, request_id: str = ""):
+        """Save a user or agent message to session through the async storage API"""
         try:
-            messages = self.session_manager.get_session_messages(session_id, user_id)
-            
-            # Convert to client ChatMessage format (matching types.ts)
-            history = []
-            for msg in messages:
-                # Ensure we match the exact ChatMessage interface
-                chat_message = {
-                    "id": getattr(msg, 'id', str(uuid.uuid4())),
-                    "sessionId": msg.sessionId,
-                    "content": msg.content,
-                    "role": msg.role,  # 'user' | 'assistant'
-                    "timestamp": msg.timestamp
-                }
-                history.append(chat_message)
-            
-            return history
+            message = self._new_message(session_id, content, user_id, role, request_id)
+            result = await self.session_manager.acreate_message(message, user_id)
+            log.info(f"{role.capitalize()} message saved to session {session_id[:12]}: {content[:50]}...")
+            return result
+        except Exception as e:
+            log.error(f"Error saving {role} message: {e}")
+            raise
+    
+    def _context_window(self, session_id: str, user_id: str) -> Optional[ContextWindow]:
+        """Session context window: built from the latest messages on first use, then extended
+        with just the messages stored since its last seq"""
+        windows = self.context_windows
+        try:
+            window = windows.get(session_id, user_id)
+            if window is not None:
+                messages = self.session_manager.get_messages_since(session_id, user_id, window.last_seq,
+                                                                   windows.seed_messages)
+                # A full page means the window fell far behind; rebuilding is cheaper than paging
+                if len(messages) < windows.seed_messages:
+                    window.extend(messages)
+                    return window
+            messages = self.session_manager.get_last_messages(session_id, user_id, windows.seed_messages)
+            return windows.seed(session_id, user_id, messages)
+        except Exception as e:
+            log.error(f"Error getting session history: {e}")
+            return None
+    
+    async def _acontext_window(self, session_id: str, user_id: str) -> Optional[ContextWindow]:
+        """Session context window, read through the async storage API"""
+        windows = self.context_windows
+        try:
+            window = windows.get(session_id, user_id)
+            if window is not None:
+                messages = await self.session_manager.aget_messages_since(session_id, user_id, window.last_seq,
+                                                                          windows.seed_messages)
+                if len(messages) < windows.seed_messages:
+                    window.extend(messages)
+                    return window
+            messages = await self.session_manager.aget_last_messages(session_id, user_id, windows.seed_messages)
+            return windows.seed(session_id, user_id, messages)
         except Exception as e:
             log.error(f"Error getting session history: {e}")
-            return []
+            return None
     
 
+    def handle_search_message(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Search the user's past messages and return ranked snippets as JSON content"""
+        message = self._typed_message(parsed_data)
+        user_id, query, request_id = message.user_id, message.query, message.request_id
+        
+        if not self.session_manager:
+            raise Exception("Session manager not configured")
+        
+        hits, next_cursor = self.session_manager.search_messages(
+            user_id, query, message.limit, message.cursor or None
+        )
+        return self._search_response(user_id, query, hits, next_cursor, request_id)
+    
+    async def ahandle_search_message(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Search the user's past messages through the async storage API"""
+        message = self._typed_message(parsed_data)
+        user_id, query, request_id = message.user_id, message.query, message.request_id
+        
+        if not self.session_manager:
+            raise Exception("Session manager not configured")
+        
+        hits, next_cursor = await self.session_manager.asearch_messages(
+            user_id, query, message.limit, message.cursor or None
+        )
+        return self._search_response(user_id, query, hits, next_cursor, request_id)
+    
+    def _search_response(self, user_id: str, query: str, hits, next_cursor, request_id: str) -> Dict[str, Any]:
+        """Serialize search hits and the next page cursor as JSON content"""
+        log.info(f"Search by user='{user_id}' query='{query[:60]}' returned {len(hits)} hits")
+        
+        return create_agent_response(
+            success=True,
+            content=dumps({
+                "results": [hit.to_dict() for hit in hits],
+                "next_cursor": next_cursor
+            }),
+            request_id=request_id
+        )
+    
     async def handle_session_lifecycle(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
         """Handle session lifecycle events"""
         try:
-            data = parsed_data["data"]
-            action = data.get("action", "")
-            session_id = data.get("session_id", "")
-            user_id = data.get("user_id", "")
-            request_id = data.get("request_id", "")
+            message = self._typed_message(parsed_data)
+            action, session_id, user_id = message.action, message.session_id, message.user_id
+            request_id = message.request_id
             
             log.info(f"Session lifecycle event: {action} for session {session_id} from user {user_id}")
+            if action in ("deleted", "cleared"):
+                self.context_windows.drop(session_id)
             
             # Use standardized response format
             return create_agent_response(
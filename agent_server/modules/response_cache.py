@@ -0,0 +1,135 @@
+"""
+Agent response cache
+
+Repeated requests (the same prompt against the same history, as prompt
+optimizers see all the time) are answered from memory instead of running the
+agent again. Entries are keyed by a digest of the agent's identity, the
+system prompt, the conversation history before the message and the message
+itself with whitespace normalized. Eviction is least recently used, bounded
+by entry count and total bytes, and entries expire after a TTL.
+
+Caching is opt-in per agent: pass a ResponseCache to SessionAdapter (or set
+"response_cache": {"enabled": true, ...} in the agent's config.json).
+Identical history means identical answers, so a cached reply may be served
+to any user who sends the same conversation.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 64 * 2**20
+DEFAULT_MAX_ENTRY_BYTES = 2**20
+DEFAULT_TTL_SECONDS = 3600
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse runs of whitespace and trim, so formatting-only variations share a key"""
+    return " ".join(prompt.split())
+
+
+def response_key(agent_id: str, prompt: str, history: str = "", system_prompt: str = "") -> bytes:
+    """Cache key for an agent reply: digest of agent, system prompt, prior history and normalized prompt"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (agent_id, system_prompt, history, normalize_prompt(prompt)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.digest()
+
+
+class ResponseCache:
+    """LRU cache of agent replies with a TTL and entry-count and byte limits"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_entry_bytes: int = DEFAULT_MAX_ENTRY_BYTES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        # key -> (expires_at, size in bytes, reply)
+        self._entries: "OrderedDict[bytes, Tuple[float, int, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]):
+        """Create from a config.json "response_cache" section, ignoring unknown keys"""
+        names = ("max_entries", "max_bytes", "max_entry_bytes", "ttl_seconds")
+        return cls(**{key: value for key, value in (data or {}).items() if key in names})
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: bytes) -> Optional[str]:
+        """Cached reply for key, or None on a miss (expired entries are dropped)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= self._clock():
+                del self._entries[key]
+                self._bytes -= entry[1]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: bytes, reply: str) -> bool:
+        """Cache a reply; non-text replies and ones larger than max_entry_bytes are not stored. Returns whether it was stored"""
+        size = len(key) + len(reply.encode("utf-8")) if isinstance(reply, str) else None
+        with self._lock:
+            if size is None or size > self.max_entry_bytes:
+                self.rejected += 1
+                return False
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (self._clock() + self.ttl_seconds, size, reply)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, byte usage, hit rate and eviction counters"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejected": self.rejected,
+            }
+
+
+def response_cache_from_config(data: Optional[dict]) -> Optional[ResponseCache]:
+    """ResponseCache for a config.json "response_cache" section, or None unless it is enabled"""
+    if not data or not data.get("enabled"):
+        return None
+    return ResponseCache.from_dict(data)
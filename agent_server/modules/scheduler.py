@@ -0,0 +1,196 @@
+"""
+Per-session FIFO scheduling of agent runs on a bounded worker pool
+
+Agent calls are slow and mostly waiting on the model, so requests for
+different sessions should run side by side, while requests for the same
+session must run one at a time in arrival order: each turn reads the history
+the previous turn wrote.
+
+SessionScheduler keeps one FIFO of waiting jobs per busy session. Only the
+head job of a session is handed to the thread pool; when it finishes, the
+session's next job is handed over and goes to the back of the pool's queue,
+so busy sessions take turns and no worker ever sits blocked behind another
+job of its own session. Jobs without a session key are not ordered.
+
+Coroutine functions run on an event loop owned by the worker thread, so
+async handlers keep working whichever loop the request was submitted from
+(the caller's, or the background loop behind SessionAdapter.run). That loop's default executor runs to_thread and
+run_in_executor(None, ...) calls inline: a blocking agent call awaited by an
+async handler occupies its worker, and the pool size stays the bound on
+threads running agents. shutdown() closes the worker loops and cancels jobs
+still waiting behind their session.
+"""
+
+import asyncio
+import inspect
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Set, Tuple
+
+DEFAULT_MAX_WORKERS = 8
+
+_worker = threading.local()
+
+
+class _InlineExecutor(ThreadPoolExecutor):
+    """Default executor of the worker loops: runs each call on the calling worker thread instead of
+    starting threads of its own (asyncio only accepts a ThreadPoolExecutor as the default executor)"""
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+# (future, fn, args, enqueued_at)
+Job = Tuple[Future, Callable[..., Any], tuple, float]
+
+
+class SessionScheduler:
+    """Runs jobs on a bounded thread pool, concurrently across sessions and in FIFO order within one"""
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='agent-run')
+        # Sessions with a job running or handed to the pool -> their jobs still waiting behind it
+        self._sessions: Dict[Hashable, Deque[Job]] = {}
+        self._lock = threading.Lock()
+        # Worker event loops, and those running a job right now (closed by their worker after shutdown)
+        self._loops: Set[asyncio.AbstractEventLoop] = set()
+        self._busy_loops: Set[asyncio.AbstractEventLoop] = set()
+        self._closed = False
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.queued = 0
+        self.running = 0
+        self.peak_queued = 0
+        self._wait_seconds = 0.0
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]):
+        """Create from a config.json "scheduler" section, ignoring unknown keys"""
+        names = ("max_workers",)
+        return cls(**{key: value for key, value in (data or {}).items() if key in names})
+
+    def submit(self, session_key: Optional[Hashable], fn: Callable[..., Any], *args) -> Future:
+        """Queue fn(*args) behind the session's earlier jobs; the future resolves with its result"""
+        future = Future()
+        job = (future, fn, args, time.monotonic())
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("cannot schedule new jobs after shutdown")
+            self.submitted += 1
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            if session_key is not None:
+                waiting = self._sessions.get(session_key)
+                if waiting is not None:
+                    waiting.append(job)
+                    return future
+                self._sessions[session_key] = deque()
+        self._executor.submit(self._run, session_key, job)
+        return future
+
+    def _run(self, session_key: Optional[Hashable], job: Job) -> None:
+        future, fn, args, enqueued_at = job
+        with self._lock:
+            self.queued -= 1
+            self._wait_seconds += time.monotonic() - enqueued_at
+        try:
+            if not future.set_running_or_notify_cancel():
+                with self._lock:
+                    self.cancelled += 1
+            else:
+                with self._lock:
+                    self.running += 1
+                    loop = self._acquire_loop() if inspect.iscoroutinefunction(fn) else None
+                try:
+                    result = loop.run_until_complete(fn(*args)) if loop is not None else fn(*args)
+                except BaseException as e:
+                    future.set_exception(e)
+                    with self._lock:
+                        self.running -= 1
+                        self.failed += 1
+                        self._release_loop(loop)
+                else:
+                    future.set_result(result)
+                    with self._lock:
+                        self.running -= 1
+                        self.completed += 1
+                        self._release_loop(loop)
+        finally:
+            self._release(session_key)
+
+    def _acquire_loop(self) -> asyncio.AbstractEventLoop:
+        """This worker thread's event loop, created on first use; called with the lock held"""
+        loop = getattr(_worker, "loop", None)
+        if loop is None or loop.is_closed():
+            loop = _worker.loop = asyncio.new_event_loop()
+            loop.set_default_executor(_InlineExecutor())
+            self._loops.add(loop)
+        self._busy_loops.add(loop)
+        return loop
+
+    def _release_loop(self, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Mark the worker loop idle, closing it if the scheduler was shut down meanwhile; called with the lock held"""
+        if loop is None:
+            return
+        self._busy_loops.discard(loop)
+        if self._closed:
+            self._loops.discard(loop)
+            loop.close()
+
+    def _release(self, session_key: Optional[Hashable]) -> None:
+        """Hand the session's next waiting job to the pool, or mark the session idle"""
+        if session_key is None:
+            return
+        with self._lock:
+            waiting = self._sessions[session_key]
+            if not waiting:
+                del self._sessions[session_key]
+                return
+            job = waiting.popleft()
+        self._executor.submit(self._run, session_key, job)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop taking jobs, cancel those waiting behind their session, stop the pool and close the worker loops"""
+        with self._lock:
+            self._closed = True
+            waiting = [job for jobs in self._sessions.values() for job in jobs]
+            for jobs in self._sessions.values():
+                jobs.clear()
+            self.queued -= len(waiting)
+            self.cancelled += len(waiting)
+        for future, _, _, _ in waiting:
+            future.cancel()
+        self._executor.shutdown(wait=wait)
+        with self._lock:
+            for loop in self._loops - self._busy_loops:
+                loop.close()
+            self._loops &= self._busy_loops
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, running and queued jobs, per-session queue depth and mean queue wait"""
+        with self._lock:
+            started = self.completed + self.failed + self.cancelled + self.running
+            return {
+                "max_workers": self.max_workers,
+                "running": self.running,
+                "queued": self.queued,
+                "peak_queued": self.peak_queued,
+                "active_sessions": len(self._sessions),
+                "max_session_depth": max((len(waiting) for waiting in self._sessions.values()), default=0),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "mean_wait_ms": self._wait_seconds / started * 1000 if started else 0.0,
+            }
@@ -2,9 +2,9 @@
 Default implementation of session management module
 """
 
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from .base import BaseSessionManager
-from mapper.models import Session, Message
+from mapper.models import Session, Message, SearchHit
 from service.session_service import SessionService
 from isek.utils.log import log
 
@@ -12,8 +12,8 @@ from isek.utils.log import log
 class DefaultSessionManager(BaseSessionManager):
     """Default implementation of session management"""
     
-    def __init__(self):
-        self.session_service = SessionService()
+    def __init__(self, session_service: Optional[SessionService] = None):
+        self.session_service = session_service or SessionService()
         log.info("DefaultSessionManager initialized")
     
     def get_user_sessions(self, creator_id: str) -> List[Session]:
@@ -24,6 +24,15 @@ class DefaultSessionManager(BaseSessionManager):
             log.error(f"Error getting user sessions: {e}")
             return []
     
+    def list_sessions(self, creator_id: str, order: str = 'recent', limit: int = 20,
+                      cursor: Optional[str] = None) -> List[Session]:
+        """List a page of a user's sessions ordered by last update, answered from the session table"""
+        try:
+            return self.session_service.list_sessions(creator_id, order, limit, cursor)
+        except Exception as e:
+            log.error(f"Error listing sessions: {e}")
+            return []
+    
     def get_session_by_id(self, session_id: str, creator_id: str) -> Optional[Session]:
         """Get a specific session by ID"""
         try:
@@ -40,6 +49,14 @@ class DefaultSessionManager(BaseSessionManager):
             log.error(f"Error creating session: {e}")
             raise
     
+    def create_sessions(self, sessions: List[Session]) -> List[Session]:
+        """Create several sessions in batched transactions"""
+        try:
+            return self.session_service.create_sessions(sessions)
+        except Exception as e:
+            log.error(f"Error creating sessions: {e}")
+            raise
+    
     def delete_session(self, session_id: str, creator_id: str) -> bool:
         """Delete a session"""
         try:
@@ -48,18 +65,177 @@ class DefaultSessionManager(BaseSessionManager):
             log.error(f"Error deleting session: {e}")
             return False
     
-    def get_session_messages(self, session_id: str, creator_id: str) -> List[Message]:
-        """Get all messages in a session"""
+    def get_session_messages(self, session_id: str, creator_id: str, limit: Optional[int] = None,
+                             before_cursor: Optional[str] = None) -> List[Message]:
+        """Get messages in a session, optionally a page of `limit` messages before a cursor"""
         try:
-            return self.session_service.get_session_messages(session_id, creator_id)
+            return self.session_service.get_session_messages(session_id, creator_id, limit, before_cursor)
         except Exception as e:
             log.error(f"Error getting session messages: {e}")
             return []
     
+    def get_last_messages(self, session_id: str, creator_id: str, n: int) -> List[Message]:
+        """Get the last n messages in a session, oldest first"""
+        try:
+            return self.session_service.get_last_messages(session_id, creator_id, n)
+        except Exception as e:
+            log.error(f"Error getting last session messages: {e}")
+            return []
+    
+    def get_messages_since(self, session_id: str, creator_id: str, after_seq: int,
+                           limit: Optional[int] = None) -> List[Message]:
+        """Get messages with a sequence number greater than after_seq, in sequence order"""
+        try:
+            return self.session_service.get_messages_since(session_id, creator_id, after_seq, limit)
+        except Exception as e:
+            log.error(f"Error getting session messages since seq {after_seq}: {e}")
+            return []
+    
+    def get_message(self, session_id: str, creator_id: str, message_id: str) -> Optional[Message]:
+        """Get one message of a session by id, or None when it is not stored"""
+        try:
+            return self.session_service.get_message(session_id, creator_id, message_id)
+        except Exception as e:
+            log.error(f"Error getting message {message_id}: {e}")
+            return None
+    
     def create_message(self, message: Message, creator_id: str) -> Message:
         """Create a new message in a session"""
         try:
             return self.session_service.create_message(message, creator_id)
         except Exception as e:
             log.error(f"Error creating message: {e}")
-            raise
\ No newline at end of file
+            raise
+    
+    def create_messages(self, messages: List[Message], creator_id: str) -> List[Message]:
+        """Create several messages in batched transactions, keeping session counters up to date"""
+        try:
+            return self.session_service.create_messages(messages, creator_id)
+        except Exception as e:
+            log.error(f"Error creating messages: {e}")
+            raise
+    
+    def search_messages(self, creator_id: str, query: str, limit: int = 20,
+                        cursor: Optional[str] = None) -> Tuple[List[SearchHit], Optional[str]]:
+        """Full-text search across a user's messages, best matches first"""
+        try:
+            return self.session_service.search_messages(creator_id, query, limit, cursor)
+        except Exception as e:
+            log.error(f"Error searching messages: {e}")
+            raise
+    
+    def add_purge_listener(self, listener) -> None:
+        """Call listener(session_id) whenever the retention policy purges a session or trims its messages"""
+        self.session_service.add_purge_listener(listener)
+    
+    def get_cache_stats(self) -> Dict[str, float]:
+        """Get session ownership cache statistics (size, hits, misses, hit_rate)"""
+        return self.session_service.get_cache_stats()
+    
+    async def aget_user_sessions(self, creator_id: str) -> List[Session]:
+        """Get all sessions for a user without blocking the event loop"""
+        try:
+            return await self.session_service.aget_user_sessions(creator_id)
+        except Exception as e:
+            log.error(f"Error getting user sessions: {e}")
+            return []
+    
+    async def alist_sessions(self, creator_id: str, order: str = 'recent', limit: int = 20,
+                             cursor: Optional[str] = None) -> List[Session]:
+        """List a page of a user's sessions without blocking the event loop"""
+        try:
+            return await self.session_service.alist_sessions(creator_id, order, limit, cursor)
+        except Exception as e:
+            log.error(f"Error listing sessions: {e}")
+            return []
+    
+    async def aget_session_by_id(self, session_id: str, creator_id: str) -> Optional[Session]:
+        """Get a specific session by ID without blocking the event loop"""
+        try:
+            return await self.session_service.aget_session_by_id(session_id, creator_id)
+        except Exception as e:
+            log.error(f"Error getting session by ID: {e}")
+            return None
+    
+    async def acreate_session(self, session: Session) -> Session:
+        """Create a new session without blocking the event loop"""
+        try:
+            return await self.session_service.acreate_session(session)
+        except Exception as e:
+            log.error(f"Error creating session: {e}")
+            raise
+    
+    async def acreate_sessions(self, sessions: List[Session]) -> List[Session]:
+        """Create several sessions without blocking the event loop"""
+        try:
+            return await self.session_service.acreate_sessions(sessions)
+        except Exception as e:
+            log.error(f"Error creating sessions: {e}")
+            raise
+    
+    async def adelete_session(self, session_id: str, creator_id: str) -> bool:
+        """Delete a session without blocking the event loop"""
+        try:
+            return await self.session_service.adelete_session(session_id, creator_id)
+        except Exception as e:
+            log.error(f"Error deleting session: {e}")
+            return False
+    
+    async def aget_session_messages(self, session_id: str, creator_id: str, limit: Optional[int] = None,
+                                    before_cursor: Optional[str] = None) -> List[Message]:
+        """Get messages in a session without blocking the event loop"""
+        try:
+            return await self.session_service.aget_session_messages(session_id, creator_id, limit, before_cursor)
+        except Exception as e:
+            log.error(f"Error getting session messages: {e}")
+            return []
+    
+    async def aget_last_messages(self, session_id: str, creator_id: str, n: int) -> List[Message]:
+        """Get the last n messages in a session without blocking the event loop"""
+        try:
+            return await self.session_service.aget_last_messages(session_id, creator_id, n)
+        except Exception as e:
+            log.error(f"Error getting last session messages: {e}")
+            return []
+    
+    async def aget_messages_since(self, session_id: str, creator_id: str, after_seq: int,
+                                  limit: Optional[int] = None) -> List[Message]:
+        """Get messages with a sequence number greater than after_seq without blocking the event loop"""
+        try:
+            return await self.session_service.aget_messages_since(session_id, creator_id, after_seq, limit)
+        except Exception as e:
+            log.error(f"Error getting session messages since seq {after_seq}: {e}")
+            return []
+    
+    async def aget_message(self, session_id: str, creator_id: str, message_id: str) -> Optional[Message]:
+        """Get one message of a session by id without blocking the event loop"""
+        try:
+            return await self.session_service.aget_message(session_id, creator_id, message_id)
+        except Exception as e:
+            log.error(f"Error getting message {message_id}: {e}")
+            return None
+    
+    async def acreate_message(self, message: Message, creator_id: str) -> Message:
+        """Create a new message in a session without blocking the event loop"""
+        try:
+            return await self.session_service.acreate_message(message, creator_id)
+        except Exception as e:
+            log.error(f"Error creating message: {e}")
+            raise
+    
+    async def acreate_messages(self, messages: List[Message], creator_id: str) -> List[Message]:
+        """Create several messages without blocking the event loop"""
+        try:
+            return await self.session_service.acreate_messages(messages, creator_id)
+        except Exception as e:
+            log.error(f"Error creating messages: {e}")
+            raise
+    
+    async def asearch_messages(self, creator_id: str, query: str, limit: int = 20,
+                               cursor: Optional[str] = None) -> Tuple[List[SearchHit], Optional[str]]:
+        """Full-text search across a user's messages without blocking the event loop"""
+        try:
+            return await self.session_service.asearch_messages(creator_id, query, limit, cursor)
+        except Exception as e:
+            log.error(f"Error searching messages: {e}")
+            raise
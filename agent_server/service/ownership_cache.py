@@ -0,0 +1,50 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class OwnershipCache:
+    """有界LRU缓存：session_id -> creatorId"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str) -> Optional[str]:
+        """查询会话所有者，命中时移到最近使用位置"""
+        with self._lock:
+            owner = self._entries.get(session_id)
+            if owner is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return owner
+
+    def put(self, session_id: str, creator_id: str):
+        """记录会话所有者，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._entries[session_id] = creator_id
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str):
+        """会话删除时移除缓存"""
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        """返回命中率等统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
@@ -1,37 +1,98 @@
 from datetime import datetime
-from typing import List
-from mapper.models import Session, Message
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from mapper.backend import StorageBackend, MapperSet
+from mapper.models import Session, Message, Task, SearchHit
+from service.ownership_cache import OwnershipCache
 
 class SessionService:
-    def __init__(self):
-        from mapper import sessionMapper, messageMapper
-        self.session_mapper = sessionMapper
-        self.message_mapper = messageMapper
+    def __init__(self, backend: Optional[StorageBackend] = None, ownership_cache_size: int = 10000):
+        if backend is None:
+            from mapper import storageBackend
+            backend = storageBackend
+        self.backend = backend
+        # 兼容旧代码：默认存储后端的mapper（分片后端请使用_mappers(creator_id)）
+        default_mappers = backend.default_mappers()
+        self.session_mapper = default_mappers.session_mapper
+        self.message_mapper = default_mappers.message_mapper
+        self.ownership_cache = OwnershipCache(ownership_cache_size)
+        # 保留策略删除的会话同样从缓存移除
+        backend.add_purge_listener(self.ownership_cache.invalidate)
+    
+    def _mappers(self, creator_id: str) -> MapperSet:
+        """获取该用户数据所在存储后端的mapper"""
+        return self.backend.mappers(creator_id)
+    
+    def _is_owner(self, session_id: str, creator_id: str) -> bool:
+        """验证会话是否属于该用户：先查LRU缓存，未命中时按主键查询"""
+        owner = self.ownership_cache.get(session_id)
+        if owner is None:
+            owner = self._mappers(creator_id).session_mapper.get_creator_id(session_id)
+            if owner is None:
+                return False
+            self.ownership_cache.put(session_id, owner)
+        return owner == creator_id
+    
+    def add_purge_listener(self, listener):
+        """注册回调：保留策略删除会话或裁剪会话的消息后以session_id调用"""
+        self.backend.add_purge_listener(listener)
+
+    def get_cache_stats(self) -> Dict[str, float]:
+        """获取会话所有权缓存的统计信息"""
+        return self.ownership_cache.stats()
     
     def get_user_sessions(self, creator_id: str) -> List[Session]:
         """获取用户所有会话"""
         if not creator_id:
             raise ValueError("creator_id is required")
-        return self.session_mapper.get_sessions(creator_id)
+        return self._mappers(creator_id).session_mapper.get_sessions(creator_id)
+
+    def list_sessions(self, creator_id: str, order: str = 'recent', limit: int = 20,
+                      cursor: Optional[str] = None) -> List[Session]:
+        """按更新时间分页列出用户会话（含消息数和最后一条消息预览）"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        return self._mappers(creator_id).session_mapper.list_sessions(creator_id, order, limit, cursor)
 
     def get_session_by_id(self, session_id: str, creator_id: str) -> Session:
         """获取用户所有会话"""
         if not creator_id:
             raise ValueError("creator_id is required")
-        return self.session_mapper.get_by_id(session_id, creator_id)
+        return self._mappers(creator_id).session_mapper.get_by_id(session_id, creator_id)
     
-    def create_session(self, session: Session) -> Session:
-        """创建新会话"""
+    @staticmethod
+    def _fill_session_defaults(session: Session):
+        """校验会话并设置默认时间戳"""
         if not session.creatorId:
             raise ValueError("creator_id is required")
-        
-        # 设置默认时间戳
         if not session.createdAt:
             session.createdAt = datetime.now().isoformat()
         if not session.updatedAt:
             session.updatedAt = session.createdAt
-            
-        return self.session_mapper.create_session(session)
+    
+    def create_session(self, session: Session) -> Session:
+        """创建新会话"""
+        self._fill_session_defaults(session)
+        session = self._mappers(session.creatorId).session_mapper.create_session(session)
+        self.ownership_cache.put(session.id, session.creatorId)
+        return session
+    
+    def _group_sessions(self, sessions: Iterable[Session]) -> List[Tuple[MapperSet, List[Session]]]:
+        """校验会话并按所在的存储后端分组"""
+        groups: Dict[int, Tuple[MapperSet, List[Session]]] = {}
+        for session in sessions:
+            self._fill_session_defaults(session)
+            mappers = self._mappers(session.creatorId)
+            groups.setdefault(id(mappers), (mappers, []))[1].append(session)
+        return list(groups.values())
+    
+    def create_sessions(self, sessions: Iterable[Session]) -> List[Session]:
+        """批量创建会话（可属于不同用户），按存储后端分组后分块写入"""
+        created = []
+        for mappers, group in self._group_sessions(sessions):
+            created.extend(mappers.session_mapper.create_sessions(group))
+        for session in created:
+            self.ownership_cache.put(session.id, session.creatorId)
+        return created
     
     def delete_session(self, session_id: str, creator_id: str) -> bool:
         """删除会话，同时删除关联的消息"""
@@ -39,26 +100,50 @@ class SessionService:
             raise ValueError("creator_id is required")
             
         # 先验证会话是否属于该用户
-        sessions = self.session_mapper.get_sessions(creator_id)
-        if not any(s.id == session_id for s in sessions):
+        if not self._is_owner(session_id, creator_id):
             raise PermissionError("Unauthorized access to session")
             
+        mappers = self._mappers(creator_id)
         # 先删除会话中的消息
-        self.message_mapper.delete_messages_by_session(session_id)
+        mappers.message_mapper.delete_messages_by_session(session_id)
         # 再删除会话
-        return self.session_mapper.delete_session(session_id, creator_id)
+        deleted = mappers.session_mapper.delete_session(session_id, creator_id)
+        self.ownership_cache.invalidate(session_id)
+        return deleted
     
-    def get_session_messages(self, session_id: str, creator_id: str) -> List[Message]:
-        """根据会话ID获取消息，需验证用户权限"""
+    def get_session_messages(self, session_id: str, creator_id: str, limit: Optional[int] = None,
+                             before_cursor: Optional[str] = None) -> List[Message]:
+        """根据会话ID获取消息，需验证用户权限；limit/before_cursor用于按游标分页"""
         if not creator_id:
             raise ValueError("creator_id is required")
             
         # 验证会话是否属于该用户
-        sessions = self.session_mapper.get_sessions(creator_id)
-        if not any(s.id == session_id for s in sessions):
+        if not self._is_owner(session_id, creator_id):
             raise PermissionError("Unauthorized access to session messages")
             
-        return self.message_mapper.get_messages_by_session(session_id)
+        message_mapper = self._mappers(creator_id).message_mapper
+        return message_mapper.get_messages_by_session(session_id, limit, before_cursor)
+
+    def get_last_messages(self, session_id: str, creator_id: str, n: int) -> List[Message]:
+        """获取会话最近的n条消息，需验证用户权限"""
+        return self.get_session_messages(session_id, creator_id, limit=n)
+
+    def get_messages_since(self, session_id: str, creator_id: str, after_seq: int,
+                           limit: Optional[int] = None) -> List[Message]:
+        """获取会话中seq大于after_seq的消息（增量同步），需验证用户权限"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        if not self._is_owner(session_id, creator_id):
+            raise PermissionError("Unauthorized access to session messages")
+        return self._mappers(creator_id).message_mapper.get_messages_since(session_id, after_seq, limit)
+
+    def get_message(self, session_id: str, creator_id: str, message_id: str) -> Optional[Message]:
+        """按id获取会话中的一条消息，需验证用户权限"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        if not self._is_owner(session_id, creator_id):
+            raise PermissionError("Unauthorized access to session messages")
+        return self._mappers(creator_id).message_mapper.get_message(session_id, message_id)
     
     def create_message(self, message: Message, creator_id: str) -> Message:
         """创建消息，需验证会话属于该用户"""
@@ -76,7 +161,193 @@ class SessionService:
         if not message.timestamp:
             message.timestamp = datetime.now().isoformat()
             
-        return self.message_mapper.create_message(message)
+        return self._mappers(creator_id).message_mapper.create_message(message)
+
+    @staticmethod
+    def _prepare_messages(messages: Iterable[Message], creator_id: str) -> List[Message]:
+        """校验批量消息并设置默认时间戳"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        messages = list(messages)
+        for message in messages:
+            if not message.sessionId:
+                raise ValueError("session_id is required")
+            if not message.timestamp:
+                message.timestamp = datetime.now().isoformat()
+        return messages
+
+    def create_messages(self, messages: Iterable[Message], creator_id: str) -> List[Message]:
+        """批量创建同一用户的消息（可跨多个会话），分块在事务中写入并维护会话计数"""
+        messages = self._prepare_messages(messages, creator_id)
+        return self._mappers(creator_id).message_mapper.create_messages(messages)
+
+    def search_messages(self, creator_id: str, query: str, limit: int = 20,
+                        cursor: Optional[str] = None) -> Tuple[List[SearchHit], Optional[str]]:
+        """全文搜索用户所有会话的消息，返回(按相关度排序的命中片段, 下一页游标)，不加载完整历史"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        return self._mappers(creator_id).message_mapper.search_messages(creator_id, query, limit, cursor)
+
+    def export_records(self, creator_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """流式导出会话及其消息和任务，每条记录为{"type": ..., "data": ...}；creator_id为None时导出全部"""
+        mapper_sets = [self._mappers(creator_id)] if creator_id else self.backend.all_mappers()
+        for mappers in mapper_sets:
+            for session in mappers.session_mapper.iter_sessions(creator_id):
+                yield {"type": "session", "data": session.to_dict()}
+                for message in mappers.message_mapper.iter_messages(session.id):
+                    yield {"type": "message", "data": message.to_dict()}
+                for task in mappers.task_mapper.get_by_session_id(session.id, session.creatorId):
+                    yield {"type": "task", "data": task.to_dict()}
+
+    def import_records(self, records: Iterable[Dict[str, Any]], batch_size: int = 5000) -> Dict[str, int]:
+        """批量导入export_records格式的记录，每batch_size条在存储后端按事务批量写入，返回各类型导入条数"""
+        stats = {"session": 0, "message": 0, "task": 0, "skipped": 0}
+        pending: Dict[int, Dict[str, Any]] = {}
+        buffered = 0
+
+        def flush():
+            for batch in pending.values():
+                mappers = batch["mappers"]
+                stats["session"] += mappers.session_mapper.import_sessions(batch["session"])
+                stats["message"] += mappers.message_mapper.import_messages(batch["message"])
+                stats["task"] += mappers.task_mapper.import_tasks(batch["task"])
+            pending.clear()
+
+        models = {"session": Session, "message": Message, "task": Task}
+        for record in records:
+            record_type = record.get("type")
+            if record_type not in models:
+                stats["skipped"] += 1
+                continue
+            item = models[record_type].from_dict(record["data"])
+            mappers = self._mappers(item.creatorId)
+            batch = pending.setdefault(id(mappers), {"mappers": mappers, "session": [], "message": [], "task": []})
+            batch[record_type].append(item)
+            buffered += 1
+            if buffered >= batch_size:
+                flush()
+                buffered = 0
+        flush()
+        return stats
+
+    # ---- 异步版本：阻塞的SQLite调用在有界线程池中执行，不阻塞事件循环 ----
+
+    async def _ais_owner(self, session_id: str, creator_id: str) -> bool:
+        """_is_owner的异步版本"""
+        owner = self.ownership_cache.get(session_id)
+        if owner is None:
+            owner = await self._mappers(creator_id).async_session_mapper.get_creator_id(session_id)
+            if owner is None:
+                return False
+            self.ownership_cache.put(session_id, owner)
+        return owner == creator_id
+
+    async def aget_user_sessions(self, creator_id: str) -> List[Session]:
+        """获取用户所有会话"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        return await self._mappers(creator_id).async_session_mapper.get_sessions(creator_id)
+
+    async def alist_sessions(self, creator_id: str, order: str = 'recent', limit: int = 20,
+                             cursor: Optional[str] = None) -> List[Session]:
+        """按更新时间分页列出用户会话"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        session_mapper = self._mappers(creator_id).async_session_mapper
+        return await session_mapper.list_sessions(creator_id, order, limit, cursor)
+
+    async def aget_session_by_id(self, session_id: str, creator_id: str) -> Session:
+        """根据ID获取会话"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        return await self._mappers(creator_id).async_session_mapper.get_by_id(session_id, creator_id)
+
+    async def acreate_session(self, session: Session) -> Session:
+        """创建新会话"""
+        self._fill_session_defaults(session)
+        session = await self._mappers(session.creatorId).async_session_mapper.create_session(session)
+        self.ownership_cache.put(session.id, session.creatorId)
+        return session
+
+    async def acreate_sessions(self, sessions: Iterable[Session]) -> List[Session]:
+        """批量创建会话"""
+        created = []
+        for mappers, group in self._group_sessions(sessions):
+            created.extend(await mappers.async_session_mapper.create_sessions(group))
+        for session in created:
+            self.ownership_cache.put(session.id, session.creatorId)
+        return created
+
+    async def adelete_session(self, session_id: str, creator_id: str) -> bool:
+        """删除会话，同时删除关联的消息"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        if not await self._ais_owner(session_id, creator_id):
+            raise PermissionError("Unauthorized access to session")
+        mappers = self._mappers(creator_id)
+        await mappers.async_message_mapper.delete_messages_by_session(session_id)
+        deleted = await mappers.async_session_mapper.delete_session(session_id, creator_id)
+        self.ownership_cache.invalidate(session_id)
+        return deleted
+
+    async def aget_session_messages(self, session_id: str, creator_id: str, limit: Optional[int] = None,
+                                    before_cursor: Optional[str] = None) -> List[Message]:
+        """根据会话ID获取消息，需验证用户权限"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        if not await self._ais_owner(session_id, creator_id):
+            raise PermissionError("Unauthorized access to session messages")
+        message_mapper = self._mappers(creator_id).async_message_mapper
+        return await message_mapper.get_messages_by_session(session_id, limit, before_cursor)
+
+    async def aget_last_messages(self, session_id: str, creator_id: str, n: int) -> List[Message]:
+        """获取会话最近的n条消息，需验证用户权限"""
+        return await self.aget_session_messages(session_id, creator_id, limit=n)
+
+    async def aget_messages_since(self, session_id: str, creator_id: str, after_seq: int,
+                                  limit: Optional[int] = None) -> List[Message]:
+        """获取会话中seq大于after_seq的消息，需验证用户权限"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        if not await self._ais_owner(session_id, creator_id):
+            raise PermissionError("Unauthorized access to session messages")
+        message_mapper = self._mappers(creator_id).async_message_mapper
+        return await message_mapper.get_messages_since(session_id, after_seq, limit)
+
+    async def aget_message(self, session_id: str, creator_id: str, message_id: str) -> Optional[Message]:
+        """按id获取会话中的一条消息，需验证用户权限"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        if not await self._ais_owner(session_id, creator_id):
+            raise PermissionError("Unauthorized access to session messages")
+        return await self._mappers(creator_id).async_message_mapper.get_message(session_id, message_id)
+
+    async def acreate_message(self, message: Message, creator_id: str) -> Message:
+        """创建消息"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        if not message.sessionId:
+            raise ValueError("session_id is required")
+        if not message.timestamp:
+            message.timestamp = datetime.now().isoformat()
+        return await self._mappers(creator_id).async_message_mapper.create_message(message)
+
+    async def acreate_messages(self, messages: Iterable[Message], creator_id: str) -> List[Message]:
+        """批量创建同一用户的消息"""
+        messages = self._prepare_messages(messages, creator_id)
+        return await self._mappers(creator_id).async_message_mapper.create_messages(messages)
+
+    async def asearch_messages(self, creator_id: str, query: str, limit: int = 20,
+                               cursor: Optional[str] = None) -> Tuple[List[SearchHit], Optional[str]]:
+        """全文搜索用户所有会话的消息"""
+        if not creator_id:
+            raise ValueError("creator_id is required")
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        message_mapper = self._mappers(creator_id).async_message_mapper
+        return await message_mapper.search_messages(creator_id, query, limit, cursor)
 
 #
 # from datetime import datetime
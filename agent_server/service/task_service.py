@@ -1,15 +1,23 @@
 from typing import Optional
-from mapper.task_mapper import TaskMapper
-from mapper.session_mapper import SessionMapper
+from mapper.backend import StorageBackend, MapperSet
 from mapper.models import Task
 
 class TaskService:
     """任务管理服务"""
     
-    def __init__(self, db_path: str = 'isek_database.db'):
-        from mapper import sessionMapper, taskMapper
-        self.session_mapper = sessionMapper
-        self.task_mapper = taskMapper
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        if backend is None:
+            from mapper import storageBackend
+            backend = storageBackend
+        self.backend = backend
+        # 兼容旧代码：默认存储后端的mapper（分片后端请使用_mappers(creator_id)）
+        default_mappers = backend.default_mappers()
+        self.session_mapper = default_mappers.session_mapper
+        self.task_mapper = default_mappers.task_mapper
+    
+    def _mappers(self, creator_id: str) -> MapperSet:
+        """获取该用户数据所在存储后端的mapper"""
+        return self.backend.mappers(creator_id)
     
     def create_task(self, task: Task, creator_id: str) -> Optional[Task]:
         """创建新任务，需要验证creator_id"""
@@ -17,11 +25,12 @@ class TaskService:
             return None
         
         # 验证session是否属于该用户
-        session = self.session_mapper.get_by_id(task.sessionId, creator_id)
+        mappers = self._mappers(creator_id)
+        session = mappers.session_mapper.get_by_id(task.sessionId, creator_id)
         if not session:
             raise PermissionError("Unauthorized access to session")
             
-        return self.task_mapper.create(task, creator_id)
+        return mappers.task_mapper.create(task, creator_id)
     
     def start_processing(self, task_id: str, session_id: str, updater_id: str) -> bool:
         """将任务状态设置为processing，需要验证updater_id"""
@@ -29,11 +38,12 @@ class TaskService:
             return False
             
         # 验证session是否属于该用户
-        session = self.session_mapper.get_by_id(session_id, updater_id)
+        mappers = self._mappers(updater_id)
+        session = mappers.session_mapper.get_by_id(session_id, updater_id)
         if not session:
             raise PermissionError("Unauthorized access to session")
             
-        return self.task_mapper.processing(task_id, updater_id)
+        return mappers.task_mapper.processing(task_id, updater_id)
     
     def finish_task(self, task_id: str, session_id: str, updater_id: str, result: str) -> bool:
         """完成任务，需要验证updater_id"""
@@ -41,11 +51,12 @@ class TaskService:
             return False
             
         # 验证session是否属于该用户
-        session = self.session_mapper.get_by_id(session_id, updater_id)
+        mappers = self._mappers(updater_id)
+        session = mappers.session_mapper.get_by_id(session_id, updater_id)
         if not session:
             raise PermissionError("Unauthorized access to session")
             
-        return self.task_mapper.finish(task_id, updater_id, result)
+        return mappers.task_mapper.finish(task_id, updater_id, result)
     
     def get_task_by_id(self, task_id: str, session_id: str, creator_id: str) -> Optional[Task]:
         """根据ID获取任务，需要验证creator_id"""
@@ -53,8 +64,9 @@ class TaskService:
             return None
             
         # 验证session是否属于该用户
-        session = self.session_mapper.get_by_id(session_id, creator_id)
+        mappers = self._mappers(creator_id)
+        session = mappers.session_mapper.get_by_id(session_id, creator_id)
         if not session:
             raise PermissionError("Unauthorized access to session")
             
-        return self.task_mapper.get_by_id(task_id, creator_id)
\ No newline at end of file
+        return mappers.task_mapper.get_by_id(task_id, creator_id)
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+会话数据的JSONL流式导出/导入（常量内存，可选gzip压缩）
+
+    python -m service.transfer export sessions.jsonl.gz [--creator-id USER]
+    python -m service.transfer import sessions.jsonl.gz [--batch-size 5000]
+"""
+
+import argparse
+import gzip
+import time
+from typing import IO, Any, Dict, Iterator, Optional
+from service.session_service import SessionService
+from shared.json_codec import dumps, loads
+
+FORMAT_VERSION = 1
+
+
+def open_stream(path: str, mode: str, compress: Optional[bool] = None) -> IO[str]:
+    """打开JSONL文件；文件名以.gz结尾或compress为True时使用gzip"""
+    if compress is None:
+        compress = path.endswith('.gz')
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    return open(path, mode, encoding='utf-8')
+
+
+def export_jsonl(service: SessionService, fp: IO[str], creator_id: Optional[str] = None) -> Dict[str, int]:
+    """把会话、消息和任务逐行写入JSONL，返回各类型导出条数"""
+    counts = {"session": 0, "message": 0, "task": 0}
+    fp.write(dumps({"type": "header", "version": FORMAT_VERSION}) + '\n')
+    for record in service.export_records(creator_id):
+        fp.write(dumps(record) + '\n')
+        counts[record["type"]] += 1
+    return counts
+
+
+def read_jsonl(fp: IO[str]) -> Iterator[Dict[str, Any]]:
+    """逐行读取JSONL记录"""
+    for line in fp:
+        line = line.strip()
+        if not line:
+            continue
+        record = loads(line)
+        if record.get("type") == "header":
+            if record.get("version", FORMAT_VERSION) > FORMAT_VERSION:
+                raise ValueError(f"Unsupported export format version: {record['version']}")
+            continue
+        yield record
+
+
+def import_jsonl(service: SessionService, fp: IO[str], batch_size: int = 5000) -> Dict[str, int]:
+    """从JSONL批量导入，返回各类型导入条数"""
+    return service.import_records(read_jsonl(fp), batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import sessions, messages and tasks as JSONL")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--creator-id", default=None, help="only export this user's sessions")
+    export_parser.add_argument("--gzip", action="store_true", default=None, help="force gzip compression")
+    import_parser = subparsers.add_parser("import")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--batch-size", type=int, default=5000)
+    import_parser.add_argument("--gzip", action="store_true", default=None, help="force gzip decompression")
+    args = parser.parse_args()
+
+    from mapper import storageBackend
+    service = SessionService(storageBackend)
+    start = time.perf_counter()
+    if args.command == "export":
+        with open_stream(args.path, 'w', args.gzip) as fp:
+            counts = export_jsonl(service, fp, args.creator_id)
+    else:
+        with open_stream(args.path, 'r', args.gzip) as fp:
+            counts = import_jsonl(service, fp, args.batch_size)
+    storageBackend.close()
+    elapsed = time.perf_counter() - start
+    rows = counts["session"] + counts["message"] + counts["task"]
+    print(f"{args.command}: {counts} in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 from isek.adapter.base import Adapter, AdapterCard
-from typing import Dict, Any, Optional
-import json
+from typing import Coroutine, Dict, Any, Optional, TypeVar
+import asyncio
+import inspect
+import threading
 import dotenv
 from isek.utils.log import LoggerManager, log
 
@@ -11,13 +13,83 @@ from modules import (
     BaseSessionManager, BaseTaskManager, BaseMessageHandler,
     DefaultSessionManager, DefaultTaskManager, DefaultMessageHandler
 )
+from modules.idempotency import IdempotencyCache, request_key
+from modules.response_cache import ResponseCache, response_key
+from modules.scheduler import SessionScheduler
 
 # Import shared message formats
 from shared import create_agent_config, create_agent_response
+from shared.json_codec import dumps
 
 LoggerManager.plain_mode()
 dotenv.load_dotenv()
 
+T = TypeVar("T")
+
+# Message types that read or change a session's history, and so run one at a time per session
+SESSION_ORDERED_TYPES = frozenset(("chat", "session_lifecycle"))
+
+
+class BackgroundLoop:
+    """An event loop running on a daemon thread, started on first use, that synchronous code hands coroutines to.
+
+    One long-lived loop replaces a fresh loop (and, from inside a running loop,
+    a helper thread) per call, and lets concurrent synchronous callers share
+    loop-bound state such as in-flight idempotency entries. stop() cancels
+    coroutines still running so their callers do not wait forever.
+    """
+
+    def __init__(self, name: str = "session-adapter-loop"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def run(self, coroutine: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on the loop and block until it finishes"""
+        loop = self._start()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coroutine.close()
+            raise RuntimeError("Cannot block on the background loop from its own thread; await the coroutine instead")
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    def _start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=self._serve, args=(loop,), name=self.name, daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    @staticmethod
+    def _serve(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_forever()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+    def stop(self) -> None:
+        """Stop and close the loop, cancelling running coroutines; the next run() starts a new one"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not threading.current_thread():
+            thread.join()
+
 
 class SessionAdapter(Adapter):
     """
@@ -29,63 +101,107 @@ class SessionAdapter(Adapter):
                  agent=None,
                  session_manager: Optional[BaseSessionManager] = None,
                  task_manager: Optional[BaseTaskManager] = None,
-                 message_handler: Optional[BaseMessageHandler] = None):
+                 message_handler: Optional[BaseMessageHandler] = None,
+                 response_cache: Optional[ResponseCache] = None,
+                 idempotency: Optional[IdempotencyCache] = None,
+                 scheduler: Optional[SessionScheduler] = None):
         self.agent = agent
         self.session_manager = session_manager
         self.task_manager = task_manager 
         self.message_handler = message_handler or DefaultMessageHandler()
+        # Opt-in cache of agent replies; handlers that support it key chat turns by their history too
+        self.response_cache = response_cache
+        if hasattr(self.message_handler, "set_response_cache"):
+            self.message_handler.set_response_cache(response_cache, self.agent_id)
+        # Retried requests (same request_id) join the running execution or replay its response
+        self.idempotency = idempotency if idempotency is not None else IdempotencyCache()
+        # Agent runs execute on a bounded pool: concurrently across sessions, in arrival order within one
+        self.scheduler = scheduler if scheduler is not None else SessionScheduler()
+        # Synchronous run() calls all drive arun on this one loop
+        self._background_loop = BackgroundLoop()
         
         log.info(f"SessionAdapter initialized: agent={type(agent).__name__ if agent else None}, "
-                f"plugins=[{', '.join([p for p in ['session', 'task'] if getattr(self, f'{p}_manager')])}]")
+                f"plugins=[{', '.join([p for p in ['session', 'task'] if getattr(self, f'{p}_manager')])}]"
+                f"{', response cache' if response_cache is not None else ''}")
+
+    @property
+    def agent_id(self) -> str:
+        """Identity of the wrapped agent in response cache keys"""
+        return getattr(self.agent, "name", None) or type(self.agent).__name__
 
     def run(self, prompt: str, **kwargs) -> str:
+        """Synchronous entry point; a thin wrapper that runs arun on the adapter's background loop"""
+        return self._background_loop.run(self.arun(prompt, **kwargs))
+
+    async def arun(self, prompt: str, **kwargs) -> str:
+        """Handle one request on the event loop so a single process can interleave many in-flight requests"""
         try:
             parsed_data = self.message_handler.parse_message(prompt)
             if not parsed_data.get("success"):
                 return self._error_response("Failed to parse message")
             
-            if self.session_manager or self.task_manager:
-                return self._process_with_plugins(parsed_data)
-            else:
-                return self._process_simple(parsed_data)
+            data = parsed_data["data"]
+            request_id = data.get("request_id")
+            if not request_id:
+                return await self._schedule(parsed_data)
+            key = request_key(parsed_data.get("type"), str(data.get("user_id") or ""), str(request_id))
+            return await self.idempotency.arun(key, lambda: self._schedule(parsed_data))
                 
         except Exception as e:
             log.error(f"Adapter error: {e}")
             return self._error_response(str(e))
 
-    def _process_simple(self, parsed_data: Dict[str, Any]) -> str:
+    async def _schedule(self, parsed_data: Dict[str, Any]) -> str:
+        """Queue chat and session lifecycle messages on the scheduler by session; handle the rest inline"""
+        if parsed_data.get("type") not in SESSION_ORDERED_TYPES:
+            return await self._dispatch(parsed_data)
+        session_id = parsed_data["data"].get("session_id") or None
+        return await asyncio.wrap_future(self.scheduler.submit(session_id, self._dispatch, parsed_data))
+
+    async def _dispatch(self, parsed_data: Dict[str, Any]) -> str:
+        if self.session_manager or self.task_manager:
+            return await self._process_with_plugins(parsed_data)
+        else:
+            return await self._process_simple(parsed_data)
+
+    async def _process_simple(self, parsed_data: Dict[str, Any]) -> str:
         message_type = parsed_data.get("type")
         if message_type == "chat":
             prompt = parsed_data["data"].get("user_message", "")
-            return self._team_run(prompt)
+            return await self._acached_run(prompt)
         elif message_type == "agent_config_request":
             return self._agent_config(parsed_data)
         else:
             return self._error_response(f"Type '{message_type}' requires plugins")
 
-    def _process_with_plugins(self, parsed_data: Dict[str, Any]) -> str:
-        return self._plugin_chain(parsed_data)
+    async def _process_with_plugins(self, parsed_data: Dict[str, Any]) -> str:
+        return await self._plugin_chain(parsed_data)
 
-    def _plugin_chain(self, parsed_data: Dict[str, Any]) -> str:
+    async def _plugin_chain(self, parsed_data: Dict[str, Any]) -> str:
         message_type = parsed_data.get("type")
         
         if self.session_manager:
-            if message_type in ["chat", "session_lifecycle"]:
+            if message_type in ["chat", "session_lifecycle", "search"]:
                 if message_type == "chat":
                     self.message_handler.set_agent_runner(self._team_run)
+                    if hasattr(self.message_handler, "set_async_agent_runner"):
+                        self.message_handler.set_async_agent_runner(self._ateam_run)
+                    self.message_handler.set_session_manager(self.session_manager)
+                    response_data = await self.message_handler.ahandle_chat_message(parsed_data)
+                elif message_type == "search":
                     self.message_handler.set_session_manager(self.session_manager)
-                    response_data = self.message_handler.handle_chat_message(parsed_data)
+                    response_data = await self.message_handler.ahandle_search_message(parsed_data)
                 else:
-                    response_data = self._handle_session_lifecycle(parsed_data)
+                    response_data = await self._handle_session_lifecycle(parsed_data)
                 return self.message_handler.format_response(response_data)
         
         if message_type == "task" and self.task_manager:
-            response_data = self._handle_task_message(parsed_data)
+            response_data = await self._handle_task_message(parsed_data)
             return self.message_handler.format_response(response_data)
         
         if message_type == "chat":
             prompt = parsed_data["data"].get("user_message", "")
-            return self._team_run(prompt)
+            return await self._acached_run(prompt)
         elif message_type == "agent_config_request":
             response_data = self._handle_agent_config_request(parsed_data)
             return self.message_handler.format_response(response_data)
@@ -95,6 +211,43 @@ class SessionAdapter(Adapter):
     def _team_run(self, prompt: str) -> str:
         return self.agent.run(prompt)
 
+    async def _ateam_run(self, prompt: str) -> str:
+        """Await the agent's own arun when it has one, otherwise run the blocking agent in a worker thread
+        (inline when already on a scheduler worker, whose loop runs to_thread calls in place)"""
+        arun = getattr(self.agent, "arun", None)
+        if inspect.iscoroutinefunction(arun):
+            return await arun(prompt)
+        return await asyncio.to_thread(self._team_run, prompt)
+
+    async def _acached_run(self, prompt: str) -> str:
+        """Run the agent on a bare prompt, answering repeats from the response cache when one is configured"""
+        if self.response_cache is None:
+            return await self._ateam_run(prompt)
+        key = response_key(self.agent_id, prompt)
+        reply = self.response_cache.get(key)
+        if reply is None:
+            reply = await self._ateam_run(prompt)
+            self.response_cache.put(key, reply)
+        return reply
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the scheduler's worker pool, its event loops and the background loop; requests still queued are
+        cancelled"""
+        self.scheduler.shutdown(wait)
+        self._background_loop.stop()
+
+    def get_response_cache_stats(self) -> Dict[str, Any]:
+        """Response cache hit/miss and size metrics (empty when caching is off)"""
+        return self.response_cache.stats() if self.response_cache is not None else {}
+
+    def get_idempotency_stats(self) -> Dict[str, Any]:
+        """In-flight, coalesced and replayed request counts"""
+        return self.idempotency.stats()
+
+    def get_scheduler_stats(self) -> Dict[str, Any]:
+        """Worker pool and per-session queue depth metrics"""
+        return self.scheduler.stats()
+
     def _agent_config(self, parsed_data: Dict[str, Any]) -> str:
         data = parsed_data["data"]
         node_id = data.get("node_id")
@@ -102,7 +255,7 @@ class SessionAdapter(Adapter):
             return self._error_response("node_id required")
         
         config = self.get_agent_config(node_id)
-        response = create_agent_response(success=True, content=json.dumps(config), **config)
+        response = create_agent_response(success=True, content=dumps(config), **config)
         return self.message_handler.format_response(response)
 
     def _error_response(self, error: str) -> str:
@@ -110,27 +263,14 @@ class SessionAdapter(Adapter):
         return self.message_handler.format_response(response)
 
 
-    def _handle_session_lifecycle(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _handle_session_lifecycle(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            data = parsed_data["data"]
-            action = data.get("action", "")
-            session_id = data.get("session_id", "")
-            user_id = data.get("user_id", "")
-            request_id = data.get("request_id", "")
-            
-            log.info(f"Session lifecycle event: {action} for session {session_id} from user {user_id}")
-            
-            return create_agent_response(
-                success=True,
-                content=f"Session {action} processed",
-                request_id=request_id
-            )
-            
+            return await self.message_handler.ahandle_session_lifecycle(parsed_data)
         except Exception as e:
             log.error(f"Error handling session lifecycle: {e}")
             return create_agent_response(success=False, error=str(e))
 
-    def _handle_task_message(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _handle_task_message(self, parsed_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             data = parsed_data["data"]
             task_type = data.get("task_type")
@@ -142,7 +282,7 @@ class SessionAdapter(Adapter):
             if not self.task_manager.validate_task_data(task_type, task_data):
                 return {"success": False, "error": "Invalid task data"}
             
-            result = self.task_manager.execute_task(task_type, task_data)
+            result = await self.task_manager.aexecute_task(task_type, task_data)
             return result
             
         except Exception as e:
@@ -161,7 +301,7 @@ class SessionAdapter(Adapter):
             
             return {
                 "success": True,
-                "content": json.dumps(agent_config),
+                "content": dumps(agent_config),
                 **agent_config
             }
             
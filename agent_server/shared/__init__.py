@@ -3,13 +3,19 @@ Shared utilities and formats between client and server
 """
 
 from .message_formats import (
-    ChatMessage, SessionLifecycleMessage, TaskMessage, AgentResponse, AgentConfigFormat,
-    create_chat_message, create_session_lifecycle_message, create_task_message,
+    ChatMessage, SessionLifecycleMessage, TaskMessage, SearchMessage, AgentConfigRequest, AgentResponse,
+    AgentConfigFormat,
+    create_chat_message, create_session_lifecycle_message, create_task_message, create_search_message,
     create_agent_response, create_agent_config
 )
+from .json_codec import JSONDecodeError, dumps, dumps_bytes, loads
+from .message_decoder import InboundMessage, MessageDecodeError, decode_message
 
 __all__ = [
-    'ChatMessage', 'SessionLifecycleMessage', 'TaskMessage', 'AgentResponse', 'AgentConfigFormat',
-    'create_chat_message', 'create_session_lifecycle_message', 'create_task_message',
-    'create_agent_response', 'create_agent_config'
+    'ChatMessage', 'SessionLifecycleMessage', 'TaskMessage', 'SearchMessage', 'AgentConfigRequest', 'AgentResponse',
+    'AgentConfigFormat',
+    'create_chat_message', 'create_session_lifecycle_message', 'create_task_message', 'create_search_message',
+    'create_agent_response', 'create_agent_config',
+    'JSONDecodeError', 'dumps', 'dumps_bytes', 'loads',
+    'InboundMessage', 'MessageDecodeError', 'decode_message'
 ]
\ No newline at end of file
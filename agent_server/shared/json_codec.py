@@ -0,0 +1,107 @@
+"""
+JSON codec shared by message formats, handlers, storage and transports
+
+    dumps(obj) -> str          compact JSON text
+    dumps_bytes(obj) -> bytes  UTF-8 JSON, without a str round trip on orjson/msgspec
+    loads(data) -> Any         parse str, bytes, bytearray or memoryview
+
+Uses orjson when installed, then msgspec, then the stdlib json module. All
+backends produce the same compact, non-ASCII-escaping output, including for
+dataclasses, datetimes (RFC 3339, "Z" for UTC), dates, times, UUIDs and
+enums, which orjson and msgspec encode natively and the stdlib fallback
+through its default hook. They accept any of the input types above and
+raise JSONDecodeError (a ValueError) for malformed documents.
+
+The client backend loads this same file (agent_client/client_backend/json_codec.py),
+so both sides of the wire always run one codec.
+
+Set ISEK_JSON_BACKEND=orjson|msgspec|json to force a backend.
+"""
+
+import dataclasses
+import datetime
+import enum
+import json
+import os
+import uuid
+from typing import Any, Union
+
+JSONDecodeError = json.JSONDecodeError
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+Buffer = Union[str, bytes, bytearray, memoryview]
+
+
+def _stdlib_default(obj: Any) -> Any:
+    """Encode the types orjson and msgspec support natively the way they do"""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+    if isinstance(obj, datetime.datetime):
+        text = obj.isoformat()
+        return text[:-6] + "Z" if obj.utcoffset() == datetime.timedelta(0) else text
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+_stdlib_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=_stdlib_default)
+
+
+def _stdlib_dumps_bytes(obj: Any) -> bytes:
+    return _stdlib_encoder.encode(obj).encode("utf-8")
+
+
+def _stdlib_loads(data: Buffer, _loads=json.loads) -> Any:
+    return _loads(bytes(data) if isinstance(data, memoryview) else data)
+
+
+def _select_backend(preferred: str):
+    """Return (name, dumps, dumps_bytes, loads) for the first importable backend"""
+    candidates = BACKENDS[BACKENDS.index(preferred):] if preferred in BACKENDS else BACKENDS
+    for name in candidates:
+        if name == "orjson":
+            try:
+                import orjson
+            except ImportError:
+                continue
+            options = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+            def dumps_bytes(obj: Any, _dumps=orjson.dumps, _options=options) -> bytes:
+                return _dumps(obj, option=_options)
+
+            def dumps(obj: Any, _dumps=orjson.dumps, _options=options) -> str:
+                return _dumps(obj, option=_options).decode("utf-8")
+
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError
+            return name, dumps, dumps_bytes, orjson.loads
+        if name == "msgspec":
+            try:
+                import msgspec
+            except ImportError:
+                continue
+            encoder = msgspec.json.Encoder()
+            decoder = msgspec.json.Decoder()
+
+            def dumps_bytes(obj: Any, _encode=encoder.encode) -> bytes:
+                return _encode(obj)
+
+            def dumps(obj: Any, _encode=encoder.encode) -> str:
+                return _encode(obj).decode("utf-8")
+
+            def loads(data: Buffer, _decode=decoder.decode) -> Any:
+                try:
+                    return _decode(data)
+                except msgspec.DecodeError as e:
+                    document = data if isinstance(data, str) else bytes(data).decode("utf-8", "replace")
+                    raise JSONDecodeError(str(e), document, 0) from None
+
+            return name, dumps, dumps_bytes, loads
+    return "json", _stdlib_encoder.encode, _stdlib_dumps_bytes, _stdlib_loads
+
+
+BACKEND, dumps, dumps_bytes, loads = _select_backend(os.environ.get("ISEK_JSON_BACKEND", "orjson"))
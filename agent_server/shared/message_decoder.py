@@ -0,0 +1,253 @@
+"""
+Typed decoding of inbound client messages
+
+decode_message checks a client message and returns the slotted dataclass
+from shared.message_formats for its "type" tag. Two decoders are available:
+
+    msgspec  one tagged msgspec.Struct per message type, decoded in a single
+             pass: msgspec.json.Decoder(Union[...]) straight from JSON text,
+             msgspec.convert for an already parsed object; the Struct is then
+             copied into the dataclass
+    legacy   the per-type presence checks parse_message has always run, plus
+             isinstance checks from the field annotations, then the dataclass
+
+msgspec is used when installed, the legacy decoder otherwise (set
+ISEK_MESSAGE_DECODER=msgspec|legacy to force one). Both raise
+MessageDecodeError for a message that fails validation; a parsed object that
+is not a JSON object, has no "type" or an unknown one gets the same error on
+both, while field errors carry each decoder's own wording and name the field.
+
+Unknown keys are ignored. Missing or null optional fields take the dataclass
+default; timestamp and request_id default to "" rather than a fresh value,
+since an inbound message that lacks them has none.
+"""
+
+import os
+import typing
+from dataclasses import MISSING, dataclass, fields
+from operator import attrgetter
+from typing import Any, Callable, Dict, NamedTuple, Tuple, Union
+
+from .json_codec import JSONDecodeError, loads
+
+from .message_formats import AgentConfigRequest, ChatMessage, SearchMessage, SessionLifecycleMessage, TaskMessage
+
+MAX_SEARCH_LIMIT = 100
+
+DECODER_BACKENDS = ("msgspec", "legacy")
+
+InboundMessage = Union[ChatMessage, AgentConfigRequest, SessionLifecycleMessage, TaskMessage, SearchMessage]
+
+_CHECKED_TYPES = (str, int, float, bool, list, dict)
+
+
+class MessageDecodeError(ValueError):
+    """Inbound message is malformed or fails validation"""
+
+
+@dataclass(frozen=True)
+class MessageSpec:
+    """How to check one message type"""
+    cls: type
+    label: str  # how error messages name the message type
+    required: Tuple[str, ...] = ()
+    checks: Tuple[Tuple[Callable[[Dict[str, Any]], Any], str], ...] = ()  # (predicate on the message, error)
+
+
+def _valid_search_limit(data: Dict[str, Any]) -> bool:
+    limit = data.get("limit", 20)
+    return limit is None or isinstance(limit, int) and 1 <= limit <= MAX_SEARCH_LIMIT
+
+
+MESSAGE_SPECS: Dict[str, MessageSpec] = {
+    "chat": MessageSpec(ChatMessage, "Chat message", ("user_id", "session_id", "user_message"),
+                        ((lambda data: str(data["user_message"]).strip(), "Chat message cannot be empty"),)),
+    "agent_config_request": MessageSpec(AgentConfigRequest, "agent_config_request", ("node_id",)),
+    "session_lifecycle": MessageSpec(SessionLifecycleMessage, "session_lifecycle message",
+                                     ("action", "session_id", "user_id")),
+    "task": MessageSpec(TaskMessage, "task message", ("task_type",)),
+    "search": MessageSpec(SearchMessage, "search message", ("user_id", "query"), (
+        (lambda data: str(data["query"]).strip(), "Search query cannot be empty"),
+        (_valid_search_limit, f"search limit must be an integer between 1 and {MAX_SEARCH_LIMIT}"),
+    )),
+}
+
+
+def _runtime_type(annotation) -> Any:
+    """The class an isinstance check should use for a field annotation, or None to accept anything"""
+    origin = typing.get_origin(annotation) or annotation
+    return origin if origin in _CHECKED_TYPES else None
+
+
+def _message_spec(data: Any) -> Tuple[str, MessageSpec]:
+    """(tag, spec) of a parsed message, raising MessageDecodeError when it has no supported "type" tag"""
+    if not isinstance(data, dict):
+        raise MessageDecodeError("Message must be a JSON object")
+    tag = data.get("type")
+    if not tag:
+        raise MessageDecodeError("Message must contain 'type' field")
+    spec = MESSAGE_SPECS.get(tag) if isinstance(tag, str) else None
+    if spec is None:
+        raise MessageDecodeError(f"Unsupported message type: {tag}")
+    return tag, spec
+
+
+def _build(spec: MessageSpec, values: Dict[str, Any]):
+    """spec.cls from the decoded non-null fields; timestamp and request_id default to """""
+    values.setdefault("timestamp", "")
+    values.setdefault("request_id", "")
+    return spec.cls(**values)
+
+
+def _legacy_decoder(spec: MessageSpec) -> Callable[[Dict[str, Any]], Any]:
+    """dict -> spec.cls instance, raising MessageDecodeError; null optional fields count as missing"""
+    typed_fields = tuple((f.name, _runtime_type(f.type)) for f in fields(spec.cls))
+
+    def decode(data: Dict[str, Any]):
+        for name in spec.required:
+            if name not in data:
+                raise MessageDecodeError(f"{spec.label} missing required field: {name}")
+        for predicate, message in spec.checks:
+            if not predicate(data):
+                raise MessageDecodeError(message)
+        values = {}
+        for name, expected in typed_fields:
+            value = data.get(name)
+            if value is None and name not in spec.required:
+                continue
+            if expected is not None and not isinstance(value, expected):
+                raise MessageDecodeError(f"{spec.label} field {name!r} must be {expected.__name__}")
+            values[name] = value
+        return _build(spec, values)
+
+    decode.__name__ = decode.__qualname__ = f"decode_{spec.cls.__name__}"
+    return decode
+
+
+LEGACY_DECODERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    tag: _legacy_decoder(spec) for tag, spec in MESSAGE_SPECS.items()
+}
+
+
+class Decoder(NamedTuple):
+    """A decoder backend: one function for parsed objects, one for JSON text or bytes"""
+    name: str
+    decode_object: Callable[[Any], InboundMessage]
+    decode_json: Callable[[Any], InboundMessage]
+
+
+def _legacy_decode_object(data: Any) -> InboundMessage:
+    return LEGACY_DECODERS[_message_spec(data)[0]](data)
+
+
+def _legacy_decode_json(data: Any) -> InboundMessage:
+    return _legacy_decode_object(loads(data))
+
+
+def _msgspec_decoder(msgspec) -> Decoder:
+    """Tagged Structs decoded as one Union, each copied into its dataclass"""
+    from typing import Annotated, List, Optional
+
+    NotBlank = Annotated[str, msgspec.Meta(pattern=r"\S")]
+    SearchLimit = Annotated[int, msgspec.Meta(ge=1, le=MAX_SEARCH_LIMIT)]
+
+    class Inbound(msgspec.Struct, tag_field="type", kw_only=True):
+        timestamp: Optional[str] = None
+        request_id: Optional[str] = None
+
+    class ChatStruct(Inbound, tag="chat"):
+        user_id: str
+        session_id: str
+        user_message: NotBlank
+        messages: Optional[List[Dict[str, Any]]] = None
+        system_prompt: Optional[str] = None
+
+    class AgentConfigRequestStruct(Inbound, tag="agent_config_request"):
+        node_id: str
+
+    class SessionLifecycleStruct(Inbound, tag="session_lifecycle"):
+        action: str
+        session_id: str
+        user_id: str
+
+    class TaskStruct(Inbound, tag="task"):
+        task_type: str
+        session_id: Optional[str] = None
+        user_id: Optional[str] = None
+        task_data: Optional[Dict[str, Any]] = None
+
+    class SearchStruct(Inbound, tag="search"):
+        user_id: str
+        query: NotBlank
+        limit: Optional[SearchLimit] = None
+        cursor: Optional[str] = None
+
+    structs = (ChatStruct, AgentConfigRequestStruct, SessionLifecycleStruct, TaskStruct, SearchStruct)
+    union = Union[structs]
+
+    def target(struct):
+        """(dataclass, tag, getter of its other fields in order, their defaults for null values)"""
+        tag = struct.__struct_config__.tag
+        cls = MESSAGE_SPECS[tag].cls
+        names, defaults = [], []
+        for f in fields(cls)[1:]:
+            names.append(f.name)
+            if f.name in ("timestamp", "request_id"):
+                defaults.append(str)
+            elif f.default_factory is not MISSING:
+                defaults.append(f.default_factory)
+            else:
+                defaults.append(lambda value=f.default: value)
+        return cls, tag, attrgetter(*names), tuple(defaults)
+
+    targets = {struct: target(struct) for struct in structs}
+
+    def to_dataclass(struct) -> InboundMessage:
+        # Positional construction: keyword arguments dominate the cost of building a slotted dataclass
+        cls, tag, get, defaults = targets[type(struct)]
+        values = get(struct)
+        if None in values:
+            values = [default() if value is None else value for value, default in zip(values, defaults)]
+        return cls(tag, *values)
+
+    def decode_object(data: Any, _convert=msgspec.convert, _error=msgspec.ValidationError) -> InboundMessage:
+        _, spec = _message_spec(data)
+        try:
+            return to_dataclass(_convert(data, union))
+        except _error as e:
+            raise MessageDecodeError(f"{spec.label}: {e}") from None
+
+    def decode_json(data: Any, _decode=msgspec.json.Decoder(union).decode,
+                    _error=msgspec.ValidationError, _malformed=msgspec.DecodeError) -> InboundMessage:
+        try:
+            return to_dataclass(_decode(data))
+        except _error as e:
+            raise MessageDecodeError(str(e)) from None
+        except _malformed as e:
+            document = data if isinstance(data, str) else bytes(data).decode("utf-8", "replace")
+            raise JSONDecodeError(str(e), document, 0) from None
+
+    return Decoder("msgspec", decode_object, decode_json)
+
+
+def _select_decoder(preferred: str) -> Decoder:
+    """The first usable backend, starting from preferred"""
+    if preferred != "legacy":
+        try:
+            import msgspec
+        except ImportError:
+            pass
+        else:
+            return _msgspec_decoder(msgspec)
+    return Decoder("legacy", _legacy_decode_object, _legacy_decode_json)
+
+
+DECODER = _select_decoder(os.environ.get("ISEK_MESSAGE_DECODER", "msgspec"))
+BACKEND = DECODER.name
+
+
+def decode_message(data: Any) -> InboundMessage:
+    """Decode an inbound message (parsed JSON object, or JSON str/bytes) into its typed form by its "type" tag"""
+    if isinstance(data, (str, bytes, bytearray, memoryview)):
+        return DECODER.decode_json(data)
+    return DECODER.decode_object(data)
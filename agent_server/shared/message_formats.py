@@ -8,7 +8,7 @@ from datetime import datetime
 import uuid
 
 
-@dataclass
+@dataclass(slots=True)
 class ChatMessage:
     """Standard chat message format"""
     type: str = "chat"
@@ -21,7 +21,7 @@ class ChatMessage:
     request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
 
-@dataclass
+@dataclass(slots=True)
 class SessionLifecycleMessage:
     """Session lifecycle message format"""
     type: str = "session_lifecycle"
@@ -32,7 +32,7 @@ class SessionLifecycleMessage:
     request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
 
-@dataclass
+@dataclass(slots=True)
 class TaskMessage:
     """Task execution message format"""
     type: str = "task"
@@ -44,6 +44,27 @@ class TaskMessage:
     request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
 
 
+@dataclass(slots=True)
+class SearchMessage:
+    """Full-text search over a user's session messages"""
+    type: str = "search"
+    user_id: str = ""  # client's node_id
+    query: str = ""
+    limit: int = 20
+    cursor: str = ""  # next_cursor from the previous page, empty for the first page
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+
+@dataclass(slots=True)
+class AgentConfigRequest:
+    """Request for an agent's configuration card"""
+    type: str = "agent_config_request"
+    node_id: str = ""
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    request_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+
+
 @dataclass
 class AgentResponse:
     """Standard agent response format"""
@@ -126,6 +147,25 @@ def create_task_message(session_id: str, user_id: str, task_type: str, task_data
     }
 
 
+def create_search_message(user_id: str, query: str, limit: int = 20, cursor: str = "") -> Dict[str, Any]:
+    """Create a standardized search message"""
+    msg = SearchMessage(
+        user_id=user_id,
+        query=query,
+        limit=limit,
+        cursor=cursor
+    )
+    return {
+        "type": msg.type,
+        "user_id": msg.user_id,
+        "query": msg.query,
+        "limit": msg.limit,
+        "cursor": msg.cursor,
+        "timestamp": msg.timestamp,
+        "request_id": msg.request_id
+    }
+
+
 def create_agent_response(success: bool = True, content: str = "", tool_calls: List[Dict] = None, 
                          error: str = "", request_id: str = "") -> Dict[str, Any]:
     """Create a standardized agent response"""
@@ -0,0 +1,54 @@
+"""
+Shared fixtures. The server modules are imported from agent_server/ directly, the way the
+benchmarks do: agent_server/__init__.py is a script that calls an external API when imported.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'agent_server'))
+# Importing mapper opens the configured database in the working directory; keep it out of the checkout
+os.chdir(tempfile.mkdtemp(prefix='agent-server-tests-'))
+
+from mapper.backend import SqliteBackend
+from mapper.models import Message, Session
+
+CREATOR_ID = "test-user"
+
+
+@pytest.fixture
+def creator_id():
+    return CREATOR_ID
+
+
+@pytest.fixture
+def backend(tmp_path):
+    """SQLite backend with archiving on, in a fresh database file"""
+    backend = SqliteBackend(str(tmp_path / "test.db"), archive=True)
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def mappers(backend):
+    return backend.mappers(CREATOR_ID)
+
+
+@pytest.fixture
+def fill(mappers):
+    """fill(session_id, count, updated_at=now): a session last active at updated_at with `count` messages"""
+    def fill(session_id: str, count: int, updated_at: str = ""):
+        updated_at = updated_at or datetime.now().isoformat()
+        session = Session(id=session_id, title=session_id, creatorId=CREATOR_ID,
+                          createdAt=updated_at, updatedAt=updated_at)
+        mappers.session_mapper.create_session(session)
+        mappers.message_mapper.create_messages([
+            Message(id=f"{session_id}-m{n}", sessionId=session_id, content=f"message {n}", role="user",
+                    timestamp=updated_at, creatorId=CREATOR_ID)
+            for n in range(count)
+        ])
+    return fill
@@ -0,0 +1,156 @@
+import os
+
+import pytest
+
+from mapper.archive import ArchiveStore, archive_idle_sessions
+from mapper.backend import SqliteBackend
+from mapper.codec import ContentCodec
+from mapper.models import Message, Session
+
+OLD = "2000-01-15T10:00:00"
+
+
+def make_mappers(tmp_path, **options):
+    backend = SqliteBackend(str(tmp_path / "archive-test.db"), archive=True, **options)
+    return backend, backend.mappers("alice")
+
+
+def fill(mappers, session_id, count, timestamp=OLD):
+    mappers.session_mapper.create_session(Session(id=session_id, title=session_id, creatorId="alice",
+                                                  createdAt=timestamp, updatedAt=timestamp))
+    for n in range(count):
+        mappers.message_mapper.create_message(Message(
+            id=f"{session_id}-{n}", sessionId=session_id, content=f"message {n} " * (n + 1), role="user",
+            timestamp=f"{timestamp[:-2]}{n:02d}", creatorId="alice"))
+
+
+def hot_count(mappers, session_id):
+    return mappers.engine.query_one('SELECT COUNT(*) FROM message WHERE sessionId = ?', (session_id,))[0]
+
+
+def segment_files(root):
+    return sorted(os.path.relpath(os.path.join(d, n), root).replace(os.sep, "/")
+                  for d, _, names in os.walk(root) for n in names if n.endswith(".seg"))
+
+
+def archived_flag(mappers, session_id):
+    return mappers.engine.query_one('SELECT archived FROM session WHERE id = ?', (session_id,))[0]
+
+
+def test_store_writes_one_segment_per_session_in_time_buckets(tmp_path):
+    store = ArchiveStore(str(tmp_path / "segments"))
+    first = store.append([{"id": "a"}], "2024-03-05T00:00:00", "s1")
+    second = store.append([{"id": "b"}, {"id": "c"}], "2024-03-20T00:00:00", "s2")
+
+    assert first[0] != second[0]
+    assert first[0].startswith("2024-03/") and second[0].startswith("2024-03/")
+    assert store.read(*first) == [{"id": "a"}]
+    assert store.read(*second) == [{"id": "b"}, {"id": "c"}]
+    assert store.size_bytes() == first[2] + second[2]
+
+    assert store.remove(first[0]) == first[2]
+    assert store.remove(first[0]) == 0
+    assert segment_files(store.directory) == [second[0]]
+
+
+@pytest.mark.parametrize("codec", [None, ContentCodec(threshold=16)])
+def test_archived_session_moves_out_of_the_hot_table_and_reads_back(tmp_path, codec):
+    backend, mappers = make_mappers(tmp_path, codec=codec)
+    fill(mappers, "s", 4)
+    expected = [(m.id, m.content) for m in mappers.message_mapper.get_messages_by_session("s")]
+
+    assert mappers.message_mapper.archive_session("s", OLD) == 4
+    assert hot_count(mappers, "s") == 0
+    assert mappers.engine.query_one('SELECT messageCount FROM message_archive WHERE sessionId = ?', ("s",))[0] == 4
+    assert archived_flag(mappers, "s") == 1
+
+    assert [(m.id, m.content) for m in mappers.message_mapper.get_messages_by_session("s")] == expected
+    assert hot_count(mappers, "s") == 4
+    assert mappers.engine.query_one('SELECT COUNT(*) FROM message_archive')[0] == 0
+    assert archived_flag(mappers, "s") == 0
+    assert segment_files(mappers.message_mapper.archive.directory) == []
+    backend.close()
+
+
+def test_rearchiving_keeps_a_single_index_entry(tmp_path):
+    backend, mappers = make_mappers(tmp_path)
+    fill(mappers, "s", 2)
+    mappers.message_mapper.archive_session("s", OLD)
+
+    assert mappers.message_mapper.archive_session("s", OLD) == 2
+    assert mappers.engine.query_one('SELECT COUNT(*) FROM message_archive')[0] == 1
+    assert len(mappers.message_mapper.get_messages_by_session("s")) == 2
+    backend.close()
+
+
+def test_archive_idle_sessions_skips_active_ones(tmp_path):
+    backend, mappers = make_mappers(tmp_path)
+    fill(mappers, "idle", 3)
+    fill(mappers, "active", 2, "2999-01-01T00:00:00")
+
+    assert archive_idle_sessions(mappers.message_mapper, max_idle_days=30) == {"sessions": 1, "messages": 3}
+    assert (hot_count(mappers, "idle"), hot_count(mappers, "active")) == (0, 2)
+    backend.close()
+
+
+def test_messages_written_after_archiving_are_read_with_the_archived_ones(tmp_path):
+    backend, mappers = make_mappers(tmp_path)
+    fill(mappers, "s", 3)
+    mappers.message_mapper.archive_session("s", OLD)
+    mappers.message_mapper.create_message(Message(id="s-new", sessionId="s", content="new", role="user",
+                                                  timestamp="2000-01-15T11:00:00", creatorId="alice"))
+    backend.flush()
+
+    assert [m.id for m in mappers.message_mapper.get_messages_since("s", 0)] == ["s-0", "s-1", "s-2", "s-new"]
+    assert archived_flag(mappers, "s") == 0
+    backend.close()
+
+
+def test_deleting_an_archived_session_removes_its_segment_file(tmp_path):
+    backend, mappers = make_mappers(tmp_path)
+    fill(mappers, "s", 2)
+    fill(mappers, "other", 2)
+    mappers.message_mapper.archive_session("s", OLD)
+    mappers.message_mapper.archive_session("other", OLD)
+    directory = mappers.message_mapper.archive.directory
+    assert len(segment_files(directory)) == 2
+
+    assert mappers.message_mapper.delete_messages_by_session("s")
+    assert mappers.engine.query_one('SELECT COUNT(*) FROM message_archive')[0] == 1
+    assert mappers.message_mapper.get_messages_by_session("s") == []
+    remaining = mappers.engine.query_one('SELECT segment FROM message_archive WHERE sessionId = ?', ("other",))[0]
+    assert segment_files(directory) == [remaining]
+    assert [m.id for m in mappers.message_mapper.get_messages_by_session("other")] == ["other-0", "other-1"]
+    backend.close()
+
+
+def test_a_shared_legacy_segment_is_removed_with_its_last_session(tmp_path):
+    backend, mappers = make_mappers(tmp_path)
+    fill(mappers, "a", 1)
+    fill(mappers, "b", 1)
+    mappers.message_mapper.archive_session("a", OLD)
+    mappers.message_mapper.archive_session("b", OLD)
+    directory = mappers.message_mapper.archive.directory
+    # 旧版本的段文件按月共享：把两个会话的记录合并到一个文件
+    (a_segment, a_length), (b_segment, b_length) = mappers.engine.query(
+        'SELECT segment, length FROM message_archive ORDER BY sessionId')
+    with open(os.path.join(directory, "2000-01.seg"), "wb") as f:
+        for segment in (a_segment, b_segment):
+            f.write(open(os.path.join(directory, segment), "rb").read())
+    mappers.engine.executemany('UPDATE message_archive SET segment = ?, offset = ? WHERE sessionId = ?',
+                               [("2000-01.seg", 0, "a"), ("2000-01.seg", a_length, "b")])
+    for segment in (a_segment, b_segment):
+        os.remove(os.path.join(directory, segment))
+
+    mappers.message_mapper.delete_messages_by_session("a")
+    assert segment_files(directory) == ["2000-01.seg"]
+    assert [m.id for m in mappers.message_mapper.get_messages_by_session("b")] == ["b-0"]
+    assert segment_files(directory) == []
+    backend.close()
+
+
+def test_archiving_requires_an_archive_store(tmp_path):
+    backend = SqliteBackend(str(tmp_path / "plain.db"))
+    with pytest.raises(RuntimeError):
+        backend.mappers("alice").message_mapper.archive_session("s")
+    backend.close()
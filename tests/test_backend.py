@@ -0,0 +1,70 @@
+import warnings
+
+import pytest
+
+import mapper
+from mapper.backend import MemoryBackend, ShardedSqliteBackend
+from mapper.engine import BaseEngine, MemoryEngine, SqliteEngine
+from mapper.models import Message, Session
+from service.session_service import SessionService
+from service.task_service import TaskService
+
+
+@pytest.mark.parametrize("name", ["sessionMapper", "messageMapper", "taskMapper"])
+def test_deprecated_module_mappers_point_at_the_default_backend(name):
+    with pytest.warns(DeprecationWarning, match=name):
+        legacy = getattr(mapper, name)
+
+    attribute = {"sessionMapper": "session_mapper", "messageMapper": "message_mapper",
+                 "taskMapper": "task_mapper"}[name]
+    assert legacy is getattr(mapper.storageBackend.default_mappers(), attribute)
+    with pytest.raises(AttributeError):
+        mapper.noSuchMapper
+
+
+def test_legacy_import_style_still_works():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        from mapper import sessionMapper, messageMapper, taskMapper
+    assert sessionMapper.engine is messageMapper.engine is taskMapper.engine
+
+
+def test_services_keep_their_mapper_attributes():
+    backend = MemoryBackend()
+    sessions, tasks = SessionService(backend), TaskService(backend)
+    default = backend.default_mappers()
+
+    assert (sessions.session_mapper, sessions.message_mapper) == (default.session_mapper, default.message_mapper)
+    assert (tasks.session_mapper, tasks.task_mapper) == (default.session_mapper, default.task_mapper)
+    backend.close()
+
+
+def test_sharded_backend_defaults_to_its_first_shard(tmp_path):
+    backend = ShardedSqliteBackend(str(tmp_path / "sharded.db"), shards=3)
+    assert backend.default_mappers() is backend.all_mappers()[0]
+    backend.close()
+
+
+def test_memory_engine_implements_the_engine_interface():
+    engine = MemoryEngine()
+
+    assert isinstance(engine, BaseEngine) and not isinstance(engine, SqliteEngine)
+    assert (engine.db_path, engine.durability, engine.schema_version) == (":memory:", "sync", 0)
+    engine.execute('CREATE TABLE item (name TEXT)')
+    engine.executemany('INSERT INTO item VALUES (?)', [("a",), ("b",)])
+    assert engine.query_one('SELECT COUNT(*) FROM item')[0] == 2
+    engine.close()
+    with pytest.raises(RuntimeError):
+        engine.write(lambda conn: None)
+
+
+def test_memory_backend_round_trips_messages():
+    backend = MemoryBackend()
+    mappers = backend.mappers("u")
+    mappers.session_mapper.create_session(Session(id="s", title="s", creatorId="u",
+                                                  createdAt="2024-01-01", updatedAt="2024-01-01"))
+    mappers.message_mapper.create_message(Message(id="m", sessionId="s", content="hi", role="user",
+                                                  timestamp="2024-01-01", creatorId="u"))
+
+    assert [m.content for m in mappers.message_mapper.get_messages_by_session("s")] == ["hi"]
+    backend.close()
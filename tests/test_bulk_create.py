@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+from mapper.engine import chunked
+from mapper.models import Message, Session
+
+NOW = "2024-05-01T12:00:00"
+
+
+def messages_for(session_id, count, start=0):
+    return [Message(id=f"{session_id}-{n}", sessionId=session_id, content=f"note number {n}", role="user",
+                    timestamp=f"{NOW[:-2]}{n:02d}", creatorId="test-user")
+            for n in range(start, start + count)]
+
+
+def test_chunked_splits_into_lists():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 3)) == []
+    with pytest.raises(ValueError):
+        list(chunked([1], 0))
+
+
+def test_create_sessions_writes_every_chunk(mappers, creator_id):
+    sessions = [Session(id=f"s{n}", title=f"s{n}", creatorId=creator_id, createdAt=NOW, updatedAt=NOW)
+                for n in range(5)]
+
+    assert mappers.session_mapper.create_sessions(sessions, chunk_size=2) == sessions
+    assert sorted(s.id for s in mappers.session_mapper.get_sessions(creator_id)) == [f"s{n}" for n in range(5)]
+    with pytest.raises(ValueError):
+        mappers.session_mapper.create_sessions([Session(id="x", creatorId="")])
+
+
+def test_create_messages_leaves_sessions_as_a_create_message_loop_would(backend, creator_id):
+    bulk, loop = backend.mappers(creator_id), backend.mappers(creator_id)
+    for session_id in ("bulk-a", "bulk-b", "loop-a", "loop-b"):
+        bulk.session_mapper.create_session(Session(id=session_id, title=session_id, creatorId=creator_id,
+                                                   createdAt=NOW, updatedAt=NOW))
+
+    bulk.message_mapper.create_messages(messages_for("bulk-a", 5) + messages_for("bulk-b", 3), chunk_size=3)
+    for message in messages_for("loop-a", 5) + messages_for("loop-b", 3):
+        loop.message_mapper.create_message(message)
+
+    def summary(session_id):
+        session = bulk.session_mapper.get_by_id(session_id, creator_id)
+        return session.messageCount, session.updatedAt, session.lastMessagePreview
+
+    assert summary("bulk-a") == summary("loop-a") == (5, f"{NOW[:-2]}04", "note number 4")
+    assert summary("bulk-b") == summary("loop-b")
+    assert [m.content for m in bulk.message_mapper.get_messages_by_session("bulk-a")] == \
+        [f"note number {n}" for n in range(5)]
+    assert len(bulk.message_mapper.search_messages(creator_id, "number")[0]) == 16
+
+
+def test_a_failing_chunk_rolls_back_as_a_whole(mappers, fill, creator_id):
+    fill("s", 0)
+    mappers.message_mapper.create_messages(messages_for("s", 2))
+
+    with pytest.raises(sqlite3.IntegrityError):
+        mappers.message_mapper.create_messages(messages_for("s", 2, start=2) + messages_for("s", 1), chunk_size=2)
+
+    assert [m.id for m in mappers.message_mapper.get_messages_by_session("s")] == ["s-0", "s-1", "s-2", "s-3"]
+    assert mappers.session_mapper.get_by_id("s", creator_id).messageCount == 4
@@ -0,0 +1,116 @@
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mapper.backend import SqliteBackend
+from mapper.codec import CODEC_ZLIB, CODEC_ZSTD, ContentCodec, available_codecs, create_codec, decode_payload
+from mapper.models import Message, Session
+from mapper.recompress import recompress
+
+LONG_TEXT = "the quarterly report is due on friday. " * 100
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_large_payload_round_trips_compressed(name):
+    codec = ContentCodec(name, threshold=64)
+    content, tool, marker = codec.encode(LONG_TEXT, "[]")
+
+    assert marker == name
+    assert isinstance(content, bytes) and len(content) < len(LONG_TEXT)
+    assert decode_payload(content, marker) == LONG_TEXT
+    assert decode_payload(tool, marker) == "[]"
+
+
+def test_small_or_incompressible_payload_is_stored_as_text():
+    codec = ContentCodec(CODEC_ZLIB, threshold=64)
+    assert codec.encode("short", "") == ("short", "", None)
+    # Over the threshold, but zlib's header makes it longer
+    assert ContentCodec(CODEC_ZLIB, threshold=1).encode("abc", "") == ("abc", "", None)
+    assert decode_payload("plain", None) == "plain"
+
+
+def test_unknown_marker_is_rejected():
+    with pytest.raises(ValueError):
+        decode_payload(b"x", "lz4")
+
+
+def test_create_codec_reads_the_compression_section():
+    assert create_codec(None) is None
+    assert create_codec({"enabled": False}) is None
+    assert create_codec({"codec": CODEC_ZLIB}) is None
+    codec = create_codec({"enabled": True, "codec": CODEC_ZLIB, "threshold": 10, "level": 9})
+    assert (codec.name, codec.threshold, codec.level) == (CODEC_ZLIB, 10, 9)
+    if CODEC_ZSTD not in available_codecs():
+        with pytest.raises(ValueError):
+            ContentCodec(CODEC_ZSTD)
+
+
+def make_backend(tmp_path, codec):
+    return SqliteBackend(str(tmp_path / f"{uuid.uuid4()}.db"), codec=codec)
+
+
+def test_messages_read_back_through_a_compressing_mapper(tmp_path):
+    backend = make_backend(tmp_path, ContentCodec(CODEC_ZLIB, threshold=64))
+    mappers = backend.mappers("alice")
+    mappers.session_mapper.create_session(Session(id="s", title="s", creatorId="alice"))
+    mappers.message_mapper.create_message(Message(id="big", sessionId="s", content=LONG_TEXT, role="user",
+                                                  creatorId="alice"))
+    mappers.message_mapper.create_message(Message(id="small", sessionId="s", content="hi", role="user",
+                                                  creatorId="alice"))
+
+    markers = dict(mappers.engine.query('SELECT id, codec FROM message'))
+    assert markers == {"big": CODEC_ZLIB, "small": None}
+    assert sorted(m.content for m in mappers.message_mapper.get_messages_by_session("s")) == sorted(
+        [LONG_TEXT, "hi"])
+    backend.close()
+
+
+def test_recompress_converts_existing_rows_both_ways(tmp_path):
+    backend = make_backend(tmp_path, None)
+    mappers = backend.mappers("alice")
+    mappers.session_mapper.create_session(Session(id="s", title="s", creatorId="alice"))
+    mappers.message_mapper.create_message(Message(id="big", sessionId="s", content=LONG_TEXT, role="user",
+                                                  creatorId="alice"))
+
+    compressed = recompress(mappers.engine, ContentCodec(CODEC_ZLIB, threshold=64))
+    assert compressed["rows_rewritten"] == 1
+    assert compressed["payload_bytes_after"] < compressed["payload_bytes_before"]
+    assert mappers.engine.query_one('SELECT codec FROM message')[0] == CODEC_ZLIB
+
+    plain = recompress(mappers.engine, None)
+    assert plain["rows_rewritten"] == 1
+    assert mappers.engine.query_one('SELECT codec FROM message')[0] is None
+    assert mappers.message_mapper.get_messages_by_session("s")[0].content == LONG_TEXT
+    backend.close()
+
+
+def test_recompress_only_rewrites_rows_whose_encoding_changes(tmp_path):
+    codec = ContentCodec(CODEC_ZLIB, threshold=64)
+    backend = make_backend(tmp_path, codec)
+    mappers = backend.mappers("alice")
+    mappers.session_mapper.create_session(Session(id="s", title="s", creatorId="alice"))
+    for message_id, content in (("packed", LONG_TEXT), ("small", "hi")):
+        mappers.message_mapper.create_message(Message(id=message_id, sessionId="s", content=content, role="user",
+                                                      creatorId="alice"))
+    stored = mappers.engine.query_one("SELECT content FROM message WHERE id = 'packed'")[0]
+
+    again = recompress(mappers.engine, ContentCodec(CODEC_ZLIB, threshold=64, level=9))
+    assert (again["rows_scanned"], again["rows_rewritten"]) == (1, 0)
+    assert mappers.engine.query_one("SELECT content FROM message WHERE id = 'packed'")[0] == stored
+
+    plain = recompress(mappers.engine, None)
+    assert (plain["rows_scanned"], plain["rows_rewritten"]) == (1, 1)
+    assert recompress(mappers.engine, None)["rows_scanned"] == 0
+    backend.close()
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_concurrent_encoders_do_not_share_compressor_state(name):
+    codec = ContentCodec(name, threshold=1)
+    payloads = [f"payload {n} " * 200 for n in range(8)] * 4
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        encoded = list(pool.map(lambda text: codec.encode(text, "[]"), payloads))
+
+    assert [decode_payload(content, marker) for content, _, marker in encoded] == payloads
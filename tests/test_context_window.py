@@ -0,0 +1,71 @@
+import json
+from types import SimpleNamespace
+
+from modules.context_window import (ContextWindow, ContextWindowCache, MESSAGE_OVERHEAD_TOKENS, dumps,
+                                    estimate_tokens)
+
+
+def stored(seq, content, role="user"):
+    return SimpleNamespace(seq=seq, role=role, content=content)
+
+
+def cost(content, role="user"):
+    return estimate_tokens(dumps({"role": role, "content": content})) + MESSAGE_OVERHEAD_TOKENS
+
+
+def test_window_keeps_the_newest_messages_that_fit_the_budget():
+    contents = [f"message number {n}" for n in range(10)]
+    budget = sum(cost(c) for c in contents[-3:])
+    window = ContextWindow("u", token_budget=budget)
+
+    assert window.extend(stored(n + 1, c) for n, c in enumerate(contents)) == 10
+
+    assert [m["content"] for m in json.loads(window.messages_json())] == contents[-3:]
+    assert window.total_tokens == budget and window.last_seq == 10
+
+
+def test_an_oversized_message_is_kept_on_its_own():
+    window = ContextWindow("u", token_budget=10)
+    window.extend([stored(1, "short"), stored(2, "x" * 1000)])
+
+    assert [m["content"] for m in json.loads(window.messages_json())] == ["x" * 1000]
+
+
+def test_extend_skips_messages_already_seen():
+    window = ContextWindow("u")
+    window.extend([stored(1, "a"), stored(2, "b")])
+
+    assert window.extend([stored(2, "b"), stored(3, "c")]) == 1
+    assert [m["content"] for m in json.loads(window.messages_json())] == ["a", "b", "c"]
+
+
+def test_messages_json_appends_the_current_turn_unless_it_is_already_stored():
+    window = ContextWindow("u")
+    window.extend([stored(1, "hi", "user"), stored(2, "hello", "assistant")])
+
+    assert json.loads(window.messages_json("user", "next"))[-1] == {"role": "user", "content": "next"}
+    window.extend([stored(3, "next")])
+    assert len(json.loads(window.messages_json("user", "next"))) == 3
+
+
+def test_cache_serves_a_window_only_to_its_creator_and_evicts_the_least_recent():
+    cache = ContextWindowCache(max_sessions=2)
+    cache.seed("a", "alice", [stored(1, "a")])
+    cache.seed("b", "bob", [stored(1, "b")])
+
+    assert cache.get("a", "bob") is None
+    assert cache.get("a", "alice") is not None
+    cache.seed("c", "carol", [stored(1, "c")])
+
+    assert cache.get("b", "bob") is None and len(cache) == 2
+    assert cache.get("a", "alice") is not None
+
+
+def test_an_empty_window_is_rebuilt_and_dropped_windows_are_forgotten():
+    cache = ContextWindowCache()
+    cache.seed("empty", "u", [])
+    cache.seed("s", "u", [stored(1, "a")])
+
+    assert cache.get("empty", "u") is None
+    cache.drop("s")
+    assert cache.get("s", "u") is None
@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from mapper.engine import SqliteEngine, get_engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = SqliteEngine(str(tmp_path / "engine.db"))
+    engine.execute('CREATE TABLE item (name TEXT)')
+    yield engine
+    engine.close()
+
+
+def kill_writer(engine, error=MemoryError("out of memory")):
+    """Make the writer thread die on its next batch, once `release` is set; returns the event"""
+    release = threading.Event()
+
+    def commit_batch(conn, batch):
+        release.wait()
+        raise error
+
+    engine._commit_batch = commit_batch
+    return release
+
+
+def test_writes_commit_and_read_back(engine):
+    engine.executemany('INSERT INTO item VALUES (?)', [("a",), ("b",)])
+    assert [row[0] for row in engine.query('SELECT name FROM item ORDER BY name')] == ["a", "b"]
+
+
+def test_dead_writer_fails_running_and_queued_writes(engine):
+    release = kill_writer(engine)
+    running = engine.submit(lambda conn: conn.execute("INSERT INTO item VALUES ('a')"))
+    queued = [engine.submit(lambda conn: None) for _ in range(3)]
+    release.set()
+
+    for future in [running] + queued:
+        with pytest.raises(RuntimeError, match="writer thread died"):
+            future.result(timeout=5)
+
+
+def test_writes_after_the_writer_died_raise_immediately(engine):
+    kill_writer(engine).set()
+    with pytest.raises(RuntimeError, match="writer thread died"):
+        engine.write(lambda conn: None)
+    engine._writer.join(timeout=5)
+
+    with pytest.raises(RuntimeError, match="writer thread died"):
+        engine.write(lambda conn: None)
+    with pytest.raises(RuntimeError, match="writer thread died"):
+        engine.maintenance(lambda conn: None)
+    assert engine.query_one('SELECT COUNT(*) FROM item')[0] == 0
+
+
+def test_get_engine_replaces_an_engine_whose_writer_died(tmp_path):
+    path = str(tmp_path / "shared.db")
+    first = get_engine(path)
+    kill_writer(first).set()
+    with pytest.raises(RuntimeError, match="writer thread died"):
+        first.write(lambda conn: None)
+    first._writer.join(timeout=5)
+
+    second = get_engine(path)
+    assert second is not first
+    assert second.write(lambda conn: 1) == 1
+    first.close()
+    second.close()
+
+
+def test_closed_engine_rejects_writes(engine):
+    engine.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        engine.write(lambda conn: None)
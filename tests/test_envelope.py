@@ -0,0 +1,56 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from modules.envelope import extract_envelope_text, unescape_literal
+
+
+def envelope(payload: str) -> str:
+    """The string form the node hands the adapter for an A2A message carrying `payload`"""
+    return (f"contextId='ctx' messageId='msg' parts=[Part(root=TextPart(kind='text', metadata=None, "
+            f"text={payload!r}))] role=<Role.user: 'user'>")
+
+
+@pytest.mark.parametrize("payload", [
+    json.dumps({"type": "chat", "user_message": "plain text"}),
+    json.dumps({"type": "chat", "user_message": "it's \"quoted\"\n\ttabbed"}),
+    json.dumps({"type": "chat", "user_message": "back\\slash and 'single' quotes"}),
+    json.dumps({"type": "chat", "user_message": "你好，世界 🌍"}, ensure_ascii=False),
+    "text='not the field' \\' \\\\",
+])
+def test_string_envelope_round_trips_the_payload(payload):
+    assert extract_envelope_text(envelope(payload)) == payload
+
+
+def test_message_object_is_read_from_its_parts():
+    message = SimpleNamespace(parts=[SimpleNamespace(root=SimpleNamespace(kind="text", text='{"type": "task"}'))])
+    assert extract_envelope_text(message) == '{"type": "task"}'
+    assert extract_envelope_text(SimpleNamespace(parts=[SimpleNamespace(text="bare")])) == "bare"
+    assert extract_envelope_text(SimpleNamespace(parts=[])) is None
+
+
+def test_text_without_an_envelope_is_not_one():
+    assert extract_envelope_text('{"type": "chat"}') is None
+
+
+def test_broken_envelopes_raise_value_error():
+    with pytest.raises(ValueError):
+        extract_envelope_text("parts=[Part(root=TextPart(kind='text', text='unterminated))]")
+    with pytest.raises(ValueError):
+        extract_envelope_text("parts=[Part(root=TextPart(kind='text', context_text='x'))]")
+
+
+def test_unescape_literal_leaves_plain_text_alone():
+    assert unescape_literal("no escapes: 'é'") == "no escapes: 'é'"
+    assert unescape_literal("a\\nb\\x00\\u00e9é") == "a\nb\x00éé"
+
+
+def test_parse_message_prefers_direct_json_over_envelope_detection():
+    from modules.message_handler import DefaultMessageHandler
+
+    handler = DefaultMessageHandler()
+    direct = {"type": "task", "task_type": "explain TextPart(text='x') to me"}
+    assert handler.parse_message(json.dumps(direct))["data"]["task_type"] == direct["task_type"]
+    wrapped = {"type": "task", "task_type": "don't break"}
+    assert handler.parse_message(envelope(json.dumps(wrapped)))["data"]["task_type"] == "don't break"
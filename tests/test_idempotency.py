@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+
+from modules.idempotency import IdempotencyCache, request_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Counter:
+    """execute() factory: counts runs and returns the run number"""
+
+    def __init__(self):
+        self.runs = 0
+
+    async def __call__(self):
+        self.runs += 1
+        return self.runs
+
+
+def test_concurrent_duplicates_share_one_execution():
+    cache = IdempotencyCache()
+    runs = []
+
+    async def execute():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "reply"
+
+    async def main():
+        return await asyncio.gather(*(cache.arun("key", execute) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["reply"] * 5
+    assert len(runs) == 1
+    stats = cache.stats()
+    assert (stats["executions"], stats["coalesced"], stats["in_flight"]) == (1, 4, 0)
+
+
+def test_completed_request_is_replayed_until_it_expires():
+    clock = Clock()
+    cache = IdempotencyCache(ttl_seconds=10, clock=clock)
+    execute = Counter()
+
+    async def main():
+        first = await cache.arun("key", execute)
+        clock.now = 9
+        replayed = await cache.arun("key", execute)
+        clock.now = 10
+        expired = await cache.arun("key", execute)
+        return first, replayed, expired
+
+    assert asyncio.run(main()) == (1, 1, 2)
+    assert cache.stats()["replays"] == 1
+
+
+def test_failed_execution_fails_its_duplicates_and_is_forgotten():
+    cache = IdempotencyCache()
+    attempts = []
+
+    async def execute():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        if len(attempts) == 1:
+            raise RuntimeError("agent failed")
+        return "reply"
+
+    async def main():
+        first = await asyncio.gather(cache.arun("key", execute), cache.arun("key", execute), return_exceptions=True)
+        retry = await cache.arun("key", execute)
+        return first, retry
+
+    first, retry = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in first)
+    assert retry == "reply"
+    assert len(attempts) == 2
+    assert cache.stats()["failures"] == 1
+
+
+def test_least_recently_completed_entries_are_evicted_first():
+    cache = IdempotencyCache(max_entries=2)
+    execute = Counter()
+
+    async def main():
+        for key in ("a", "b", "c"):
+            await cache.arun(key, execute)
+        return await cache.arun("b", execute), await cache.arun("c", execute), await cache.arun("a", execute)
+
+    assert asyncio.run(main()) == (2, 3, 4)
+    assert cache.stats()["evictions"] == 2
+
+
+def test_in_flight_requests_are_never_evicted():
+    cache = IdempotencyCache(max_entries=1)
+    execute = Counter()
+    runs = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def slow():
+            runs.append(1)
+            await release.wait()
+            return "slow"
+
+        running = asyncio.create_task(cache.arun("slow", slow))
+        await asyncio.sleep(0)
+        for key in ("a", "b", "c"):
+            await cache.arun(key, execute)
+        duplicate = asyncio.create_task(cache.arun("slow", slow))
+        await asyncio.sleep(0)
+        release.set()
+        return await running, await duplicate
+
+    assert asyncio.run(main()) == ("slow", "slow")
+    assert len(runs) == 1
+    assert len(cache) == 1
+
+
+def test_clear_keeps_in_flight_requests():
+    cache = IdempotencyCache()
+    execute = Counter()
+
+    async def main():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "slow"
+
+        running = asyncio.create_task(cache.arun("slow", slow))
+        await cache.arun("done", execute)
+        await asyncio.sleep(0)
+        cache.clear()
+        assert cache.stats()["in_flight"] == 1
+        assert await cache.arun("done", execute) == 2
+        release.set()
+        return await running
+
+    assert asyncio.run(main()) == "slow"
+
+
+def test_request_key_is_scoped_by_type_and_user():
+    assert request_key("chat", "alice", "r1") != request_key("chat", "bob", "r1")
+    assert request_key("chat", "alice", "r1") != request_key("search", "alice", "r1")
+
+
+def test_from_dict_ignores_unknown_keys():
+    cache = IdempotencyCache.from_dict({"max_entries": 5, "ttl_seconds": 1, "unknown": True})
+    assert (cache.max_entries, cache.ttl_seconds) == (5, 1)
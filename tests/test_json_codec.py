@@ -0,0 +1,106 @@
+import datetime
+import enum
+import importlib.util
+import json
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import List
+
+import pytest
+
+from shared import json_codec
+
+CLIENT_CODEC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "agent_client", "client_backend", "json_codec.py")
+
+
+def available_backends():
+    names = []
+    for name in json_codec.BACKENDS:
+        selected = json_codec._select_backend(name)
+        if selected[0] == name:
+            names.append(name)
+    return names
+
+
+@pytest.fixture(params=available_backends())
+def codec(request):
+    name, dumps, dumps_bytes, loads = json_codec._select_backend(request.param)
+    return dumps, dumps_bytes, loads
+
+
+SAMPLE = {"type": "chat", "user_message": "你好 \"quoted\"\n", "limit": 20, "ratio": 0.5,
+          "flags": [True, False, None], "nested": {"empty": [], "text": "🌍"}}
+
+
+def test_output_is_compact_and_does_not_escape_non_ascii(codec):
+    dumps, dumps_bytes, loads = codec
+
+    assert dumps(SAMPLE) == json.dumps(SAMPLE, ensure_ascii=False, separators=(",", ":"))
+    assert dumps_bytes(SAMPLE) == dumps(SAMPLE).encode("utf-8")
+
+
+def test_loads_accepts_str_bytes_and_buffers(codec):
+    dumps, dumps_bytes, loads = codec
+
+    assert loads(dumps(SAMPLE)) == SAMPLE
+    assert loads(dumps_bytes(SAMPLE)) == SAMPLE
+    assert loads(bytearray(dumps_bytes(SAMPLE))) == SAMPLE
+    assert loads(memoryview(dumps_bytes(SAMPLE))) == SAMPLE
+
+
+class Color(enum.Enum):
+    RED = "red"
+
+
+@dataclass(slots=True)
+class Event:
+    name: str
+    at: datetime.datetime
+    children: List["Event"] = field(default_factory=list)
+
+
+RICH = {
+    "event": Event("parent", datetime.datetime(2024, 5, 1, 12, 0, 0, 123),
+                   [Event("child", datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone.utc))]),
+    "offset": datetime.datetime(2024, 5, 1, 8, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=5, minutes=30))),
+    "day": datetime.date(2024, 5, 1),
+    "time": datetime.time(12, 30, 5),
+    "id": uuid.UUID(int=42),
+    "color": Color.RED,
+    1: "integer key",
+}
+
+
+def test_every_backend_produces_identical_output():
+    outputs = {name: json_codec._select_backend(name)[2](RICH) for name in available_backends()}
+
+    assert len(set(outputs.values())) == 1, outputs
+    assert json.loads(outputs["json"])["event"]["children"][0]["at"] == "2024-05-01T00:00:00Z"
+
+
+def test_unsupported_types_raise_type_error(codec):
+    with pytest.raises(TypeError):
+        codec[0]({"value": object()})
+
+
+def test_client_backend_loads_the_same_codec():
+    spec = importlib.util.spec_from_file_location("client_json_codec", CLIENT_CODEC)
+    client = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(client)
+
+    assert client.BACKEND == json_codec.BACKEND
+    assert client.dumps_bytes(RICH) == json_codec.dumps_bytes(RICH)
+    assert client.loads(memoryview(b'{"a":[1]}')) == {"a": [1]}
+
+
+@pytest.mark.parametrize("document", ['{"type": ', "not json", b"{]"])
+def test_malformed_documents_raise_json_decode_error(codec, document):
+    with pytest.raises(json_codec.JSONDecodeError):
+        codec[2](document)
+
+
+def test_unknown_preference_falls_back_to_the_first_importable_backend():
+    assert json_codec._select_backend("nope")[0] == available_backends()[0]
+    assert json_codec._select_backend("json")[0] == "json"
@@ -0,0 +1,97 @@
+import pytest
+
+from shared import message_decoder
+from shared.json_codec import JSONDecodeError
+from shared.message_decoder import MAX_SEARCH_LIMIT, MessageDecodeError, decode_message
+from shared.message_formats import ChatMessage, SearchMessage
+
+
+def decoder_backends():
+    return sorted({"legacy", message_decoder._select_decoder("msgspec").name})
+
+
+@pytest.fixture(params=decoder_backends(), autouse=True)
+def backend(request, monkeypatch):
+    monkeypatch.setattr(message_decoder, "DECODER", message_decoder._select_decoder(request.param))
+    return request.param
+
+
+CHAT = {"type": "chat", "user_id": "u", "session_id": "s", "user_message": "hello"}
+
+
+def test_chat_decodes_with_defaults_for_missing_optional_fields():
+    message = decode_message(dict(CHAT, extra="ignored"))
+
+    assert type(message) is ChatMessage
+    assert (message.user_id, message.session_id, message.user_message) == ("u", "s", "hello")
+    assert (message.messages, message.system_prompt, message.timestamp, message.request_id) == ([], "", "", "")
+
+
+@pytest.mark.parametrize("data, fields", [
+    ({"type": "agent_config_request", "node_id": "n"}, {"node_id": "n"}),
+    ({"type": "session_lifecycle", "action": "created", "session_id": "s", "user_id": "u"}, {"action": "created"}),
+    ({"type": "task", "task_type": "summarize", "task_data": {"k": 1}}, {"task_data": {"k": 1}}),
+    ({"type": "search", "user_id": "u", "query": "notes"}, {"limit": 20, "cursor": ""}),
+    ({"type": "search", "user_id": "u", "query": "notes", "limit": None}, {"limit": 20}),
+])
+def test_every_message_type_decodes(data, fields):
+    message = decode_message(data)
+
+    assert message.type == data["type"]
+    assert {name: getattr(message, name) for name in fields} == fields
+
+
+def test_null_optional_fields_take_their_defaults():
+    message = decode_message(dict(CHAT, system_prompt=None, messages=None, request_id=None))
+
+    assert (message.system_prompt, message.messages, message.request_id) == ("", [], "")
+
+
+def test_json_text_and_bytes_decode_in_one_step():
+    text = '{"type": "search", "user_id": "u", "query": "notes", "limit": 5, "extra": [1]}'
+
+    for data in (text, text.encode(), memoryview(text.encode())):
+        message = decode_message(data)
+        assert type(message) is SearchMessage
+        assert (message.query, message.limit, message.cursor) == ("notes", 5, "")
+
+
+def test_malformed_json_text_raises_json_decode_error():
+    with pytest.raises(JSONDecodeError):
+        decode_message('{"type": ')
+
+
+@pytest.mark.parametrize("data, error", [
+    ([1, 2], "Message must be a JSON object"),
+    ({"user_id": "u"}, "Message must contain 'type' field"),
+    ({"type": "poll"}, "Unsupported message type: poll"),
+])
+def test_untyped_messages_raise_the_same_errors_on_every_backend(data, error):
+    with pytest.raises(MessageDecodeError, match=f"^{error}$"):
+        decode_message(data)
+
+
+@pytest.mark.parametrize("data, field", [
+    ({"type": "chat", "user_id": "u", "session_id": "s"}, "user_message"),
+    (dict(CHAT, user_message="  \n"), "Chat message"),
+    ({"type": "task"}, "task_type"),
+    ({"type": "search", "user_id": "u", "query": " "}, "query"),
+    ({"type": "search", "user_id": "u", "query": "q", "limit": MAX_SEARCH_LIMIT + 1}, "limit"),
+    ({"type": "search", "user_id": "u", "query": "q", "limit": "5"}, "limit"),
+])
+def test_invalid_fields_are_reported_by_the_selected_backend(data, field):
+    with pytest.raises(MessageDecodeError, match=field):
+        decode_message(data)
+
+
+@pytest.mark.parametrize("text", ['{"type": "chat", "user_id": "u", "session_id": "s"}', '{"type": "poll"}', "[1]"])
+def test_invalid_json_text_raises_message_decode_error(text):
+    with pytest.raises(MessageDecodeError):
+        decode_message(text)
+
+
+def test_wrong_field_types_are_rejected():
+    with pytest.raises(MessageDecodeError):
+        decode_message(dict(CHAT, session_id=42))
+    with pytest.raises(MessageDecodeError):
+        decode_message({"type": "task", "task_type": "t", "task_data": []})
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("isek")
+
+from modules.message_handler import DefaultMessageHandler
+from modules.session_manager import DefaultSessionManager
+from service.session_service import SessionService
+
+
+def chat(request_id, text="what is the weather", creator="test-user"):
+    return {"type": "chat", "data": {"type": "chat", "user_id": creator, "session_id": "s",
+                                     "user_message": text, "request_id": request_id}}
+
+
+@pytest.fixture
+def handler(backend, fill):
+    fill("s", 0)
+    handler = DefaultMessageHandler()
+    handler.set_session_manager(DefaultSessionManager(SessionService(backend)))
+    calls = []
+
+    def agent(prompt):
+        calls.append(prompt)
+        return f"reply {len(calls)}"
+
+    handler.set_agent_runner(agent)
+    handler.calls = calls
+    return handler
+
+
+def test_a_retry_after_replay_expiry_returns_the_stored_reply(handler, backend, mappers):
+    first = handler.handle_chat_message(chat("req-1"))
+    backend.flush()
+    retried = handler.handle_chat_message(chat("req-1"))
+
+    assert first["content"] == retried["content"] == "reply 1"
+    assert len(handler.calls) == 1
+    assert [m.role for m in mappers.message_mapper.get_messages_by_session("s")] == ["user", "assistant"]
+
+
+def test_async_retry_returns_the_stored_reply(handler, backend):
+    first = asyncio.run(handler.ahandle_chat_message(chat("req-2")))
+    backend.flush()
+    retried = asyncio.run(handler.ahandle_chat_message(chat("req-2")))
+
+    assert first["content"] == retried["content"] == "reply 1"
+    assert len(handler.calls) == 1
+
+
+def test_requests_without_an_id_or_with_a_new_id_run_the_agent(handler, backend):
+    handler.handle_chat_message(chat(""))
+    handler.handle_chat_message(chat(""))
+    handler.handle_chat_message(chat("req-3"))
+
+    assert len(handler.calls) == 3
@@ -0,0 +1,68 @@
+from mapper.models import Message
+
+
+def stored_seqs(mappers, session_id):
+    return [message.seq for message in mappers.message_mapper.get_messages_by_session(session_id)]
+
+
+def hot_count(mappers, session_id):
+    return mappers.engine.query_one('SELECT COUNT(*) FROM message WHERE sessionId = ?', (session_id,))[0]
+
+
+def message(session_id, n, creator_id):
+    return Message(id=f"{session_id}-x{n}", sessionId=session_id, content=f"extra {n}", role="user",
+                   creatorId=creator_id)
+
+
+def test_seq_is_assigned_per_session_in_write_order(mappers, fill, creator_id):
+    fill("a", 3)
+    fill("b", 1)
+    mappers.message_mapper.create_message(message("a", 0, creator_id))
+    mappers.message_mapper.create_messages([message("a", 1, creator_id), message("b", 0, creator_id),
+                                            message("a", 2, creator_id)])
+
+    assert stored_seqs(mappers, "a") == [1, 2, 3, 4, 5, 6]
+    assert stored_seqs(mappers, "b") == [1, 2]
+    assert [m.seq for m in mappers.message_mapper.get_messages_since("a", 4)] == [5, 6]
+    assert mappers.session_mapper.get_by_id("a", creator_id).messageCount == 6
+
+
+def test_rewriting_a_message_id_keeps_the_first_copy(mappers, fill, creator_id):
+    fill("a", 0)
+    first = mappers.message_mapper.create_message(message("a", 0, creator_id))
+    retried = mappers.message_mapper.create_message(message("a", 0, creator_id))
+
+    assert retried.seq == first.seq == 1
+    assert stored_seqs(mappers, "a") == [1]
+    assert mappers.session_mapper.get_by_id("a", creator_id).messageCount == 1
+
+
+def test_archived_session_is_rehydrated_on_read(mappers, fill, creator_id):
+    fill("a", 5)
+
+    assert mappers.message_mapper.archive_session("a") == 5
+    assert hot_count(mappers, "a") == 0
+    assert mappers.message_mapper.search_messages(creator_id, "message", 20, None)[0] == []
+
+    messages = mappers.message_mapper.get_messages_by_session("a")
+    assert [(m.seq, m.content) for m in messages] == [(n + 1, f"message {n}") for n in range(5)]
+    assert hot_count(mappers, "a") == 5
+    hits, _ = mappers.message_mapper.search_messages(creator_id, "message", 20, None)
+    assert len(hits) == 5
+
+
+def test_seq_continues_after_rehydration(mappers, fill, creator_id):
+    fill("a", 3)
+    mappers.message_mapper.archive_session("a")
+
+    mappers.message_mapper.create_message(message("a", 0, creator_id))
+    assert stored_seqs(mappers, "a") == [1, 2, 3, 4]
+
+
+def test_get_message_by_id_reads_archived_sessions_back(mappers, fill):
+    fill("s", 3)
+    mappers.message_mapper.archive_session("s")
+
+    assert mappers.message_mapper.get_message("s", "s-m1").content == "message 1"
+    assert mappers.message_mapper.get_message("s", "missing") is None
+    assert mappers.message_mapper.get_message("other", "s-m1") is None
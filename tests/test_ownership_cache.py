@@ -0,0 +1,64 @@
+import uuid
+
+import pytest
+
+from mapper.models import Message, Session
+from service.ownership_cache import OwnershipCache
+from service.session_service import SessionService
+
+
+def test_cache_evicts_least_recently_used_owner():
+    cache = OwnershipCache(maxsize=2)
+    cache.put("a", "alice")
+    cache.put("b", "bob")
+    assert cache.get("a") == "alice"
+    cache.put("c", "carol")
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("alice", "carol")
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"]) == (2, 3, 1)
+
+
+def test_invalidate_forgets_the_owner():
+    cache = OwnershipCache()
+    cache.put("a", "alice")
+    cache.invalidate("a")
+    cache.invalidate("missing")
+    assert cache.get("a") is None
+
+
+def test_service_checks_ownership_by_point_lookup():
+    service = SessionService()
+    session_id = str(uuid.uuid4())
+    service.create_session(Session(id=session_id, title="t", creatorId="alice"))
+    service.create_message(Message(id=str(uuid.uuid4()), sessionId=session_id, content="hi", role="user",
+                                   creatorId="alice"), "alice")
+    # A fresh cache forces the primary-key lookup, which then fills the cache
+    service.ownership_cache = OwnershipCache()
+
+    assert [m.content for m in service.get_session_messages(session_id, "alice")] == ["hi"]
+    assert service.ownership_cache.get(session_id) == "alice"
+    with pytest.raises(PermissionError):
+        service.get_session_messages(session_id, "mallory")
+    with pytest.raises(PermissionError):
+        service.delete_session(session_id, "mallory")
+
+
+def test_deleted_session_is_not_served_from_the_cache():
+    service = SessionService()
+    session_id = str(uuid.uuid4())
+    service.create_session(Session(id=session_id, title="t", creatorId="alice"))
+
+    assert service.delete_session(session_id, "alice")
+    with pytest.raises(PermissionError):
+        service.get_session_messages(session_id, "alice")
+
+
+def test_unknown_session_is_not_cached():
+    service = SessionService()
+    session_id = str(uuid.uuid4())
+    with pytest.raises(PermissionError):
+        service.get_session_messages(session_id, "alice")
+    service.create_session(Session(id=session_id, title="t", creatorId="alice"))
+    assert service.get_session_messages(session_id, "alice") == []
@@ -0,0 +1,101 @@
+import json
+import os
+
+from modules.response_cache import ResponseCache, response_cache_from_config, response_key
+
+LYRA_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "agent_server", "app", "lyra", "config.json")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def key(n):
+    return response_key("agent", f"prompt {n}")
+
+
+def test_key_ignores_whitespace_but_not_history_agent_or_system_prompt():
+    assert response_key("a", "hello  world\n") == response_key("a", " hello world")
+    assert len({response_key("a", "hi"), response_key("b", "hi"), response_key("a", "hi", history="[]"),
+                response_key("a", "hi", system_prompt="be terse")}) == 4
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(ttl_seconds=10, clock=clock)
+    cache.put(key(1), "reply")
+
+    clock.now = 9.9
+    assert cache.get(key(1)) == "reply"
+    clock.now = 10
+    assert cache.get(key(1)) is None
+    assert len(cache) == 0
+    assert cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_beyond_max_entries():
+    cache = ResponseCache(max_entries=2)
+    cache.put(key(1), "one")
+    cache.put(key(2), "two")
+    cache.get(key(1))
+    cache.put(key(3), "three")
+
+    assert (cache.get(key(1)), cache.get(key(2)), cache.get(key(3))) == ("one", None, "three")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_total_bytes_stay_under_max_bytes():
+    entry_size = len(key(0)) + 100
+    cache = ResponseCache(max_bytes=entry_size * 3)
+    for n in range(5):
+        cache.put(key(n), "x" * 100)
+
+    assert len(cache) == 3 and cache.stats()["bytes"] == entry_size * 3
+    assert cache.get(key(1)) is None and cache.get(key(4)) == "x" * 100
+
+
+def test_oversized_and_non_text_replies_are_not_stored():
+    cache = ResponseCache(max_entry_bytes=64)
+
+    assert not cache.put(key(1), "x" * 100)
+    assert not cache.put(key(2), {"not": "text"})
+    assert cache.put(key(3), "é" * 10)
+    assert len(cache) == 1 and cache.stats()["rejected"] == 2
+
+
+def test_replacing_an_entry_keeps_the_byte_count_right():
+    cache = ResponseCache()
+    cache.put(key(1), "short")
+    cache.put(key(1), "longer reply")
+
+    assert cache.stats()["bytes"] == len(key(1)) + len("longer reply")
+    cache.clear()
+    assert cache.stats()["bytes"] == 0 and cache.get(key(1)) is None
+
+
+def test_stats_report_the_hit_rate():
+    cache = ResponseCache()
+    cache.put(key(1), "reply")
+    cache.get(key(1))
+    cache.get(key(2))
+
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_config_section_enables_the_cache():
+    assert response_cache_from_config(None) is None
+    assert response_cache_from_config({"enabled": False, "max_entries": 5}) is None
+    cache = response_cache_from_config({"enabled": True, "max_entries": 5, "ttl_seconds": 60, "other": 1})
+    assert (cache.max_entries, cache.ttl_seconds) == (5, 60)
+
+
+def test_shipped_agent_config_leaves_the_response_cache_off():
+    with open(LYRA_CONFIG) as f:
+        section = json.load(f)["response_cache"]
+    assert section["enabled"] is False
+    assert response_cache_from_config(section) is None
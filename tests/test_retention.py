@@ -0,0 +1,106 @@
+from mapper.retention import Compactor, RetentionPolicy, apply_retention, delete_oldest_messages, purge_session
+
+OLD = "2000-01-01T00:00:00"
+
+
+def test_delete_oldest_messages_deletes_at_most_one_batch_down_to_keep(mappers, fill, creator_id):
+    fill("a", 25)
+
+    assert delete_oldest_messages(mappers.engine, "a", batch_size=10, keep=5) == 10
+    assert delete_oldest_messages(mappers.engine, "a", batch_size=10, keep=5) == 10
+    assert delete_oldest_messages(mappers.engine, "a", batch_size=10, keep=5) == 0
+
+    remaining = mappers.message_mapper.get_messages_by_session("a")
+    assert [m.seq for m in remaining] == [21, 22, 23, 24, 25]
+    assert mappers.session_mapper.get_by_id("a", creator_id).messageCount == 5
+
+
+def test_purge_session_deletes_in_batches_then_the_session(mappers, fill, creator_id):
+    fill("a", 12)
+    fill("b", 2)
+    purged = []
+
+    assert purge_session(mappers.engine, "a", batch_size=5, on_purged=purged.append) == 12
+    assert purged == ["a"]
+    assert mappers.session_mapper.get_by_id("a", creator_id) is None
+    assert mappers.engine.query_one('SELECT COUNT(*) FROM message WHERE sessionId = ?', ("a",))[0] == 0
+    assert len(mappers.message_mapper.get_messages_by_session("b")) == 2
+
+
+def test_purge_session_counts_archived_messages(mappers, fill, creator_id):
+    fill("a", 4)
+    mappers.message_mapper.archive_session("a")
+
+    assert purge_session(mappers.engine, "a", batch_size=2) == 4
+    assert mappers.engine.query_one('SELECT COUNT(*) FROM message_archive')[0] == 0
+
+
+def test_purge_session_removes_the_archived_segment_file(mappers, fill, creator_id):
+    fill("a", 3)
+    mappers.message_mapper.archive_session("a")
+    archive = mappers.message_mapper.archive
+    assert archive.size_bytes() > 0
+
+    assert purge_session(mappers.engine, "a", batch_size=2, archive=archive) == 3
+    assert archive.size_bytes() == 0
+
+
+def test_apply_retention_trims_long_sessions_one_batch_per_report(mappers, fill, creator_id):
+    fill("a", 23)
+    fill("b", 3)
+    reports = []
+
+    stats = apply_retention(mappers.engine, RetentionPolicy(max_messages_per_session=3, batch_size=5),
+                            report=lambda key, count: reports.append((key, count)))
+
+    assert stats == {"sessions_deleted": 0, "messages_deleted": 20}
+    assert reports == [("messages_deleted", 5)] * 4
+    assert len(mappers.message_mapper.get_messages_by_session("a")) == 3
+    assert len(mappers.message_mapper.get_messages_by_session("b")) == 3
+
+
+def test_apply_retention_purges_expired_sessions(mappers, fill, creator_id):
+    fill("old", 7, OLD)
+    fill("new", 2)
+    purged = []
+
+    stats = apply_retention(mappers.engine, RetentionPolicy(max_age_days=30, batch_size=3), on_purged=purged.append)
+
+    assert stats == {"sessions_deleted": 1, "messages_deleted": 7}
+    assert purged == ["old"]
+    assert mappers.session_mapper.get_by_id("new", creator_id) is not None
+
+
+def test_apply_retention_keeps_the_newest_sessions_per_user(mappers, fill, creator_id):
+    fill("oldest", 1, OLD)
+    fill("older", 1, "2001-01-01T00:00:00")
+    fill("newest", 1)
+
+    stats = apply_retention(mappers.engine, RetentionPolicy(max_sessions_per_user=1))
+
+    assert stats["sessions_deleted"] == 2
+    assert [s.id for s in mappers.session_mapper.get_sessions(creator_id)] == ["newest"]
+
+
+def test_compactor_notifies_purge_listeners(backend, fill, creator_id):
+    fill("old", 2, OLD)
+    fill("new", 1)
+    purged = []
+    backend.add_purge_listener(purged.append)
+    backend.add_purge_listener(lambda session_id: 1 / 0)
+
+    Compactor(backend, RetentionPolicy(max_age_days=30)).run_once()
+
+    assert purged == ["old"]
+
+
+def test_trimming_a_session_notifies_purge_listeners(backend, fill, creator_id):
+    fill("long", 6)
+    fill("short", 2)
+    purged = []
+    backend.add_purge_listener(purged.append)
+
+    Compactor(backend, RetentionPolicy(max_messages_per_session=3, batch_size=2)).run_once()
+
+    assert purged == ["long"]
+    assert len(backend.mappers(creator_id).message_mapper.get_messages_by_session("long")) == 3
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from modules.scheduler import SessionScheduler
+
+
+class Tracker:
+    """Records per-session run order, per-session overlap and peak concurrency of sleeping jobs"""
+
+    def __init__(self):
+        self.order = {}
+        self.active = {}
+        self.overlaps = 0
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def job(self, session_id, n, seconds=0.01):
+        with self._lock:
+            self.active[session_id] = self.active.get(session_id, 0) + 1
+            self.overlaps += self.active[session_id] > 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(seconds)
+        with self._lock:
+            self.order.setdefault(session_id, []).append(n)
+            self.active[session_id] -= 1
+            self.running -= 1
+        return n
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = SessionScheduler(max_workers=4)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_jobs_of_a_session_run_one_at_a_time_in_submission_order(scheduler):
+    tracker = Tracker()
+    futures = [scheduler.submit(session, tracker.job, session, n) for n in range(10) for session in ("a", "b", "c")]
+    assert [future.result(timeout=10) for future in futures] == [n for n in range(10) for _ in range(3)]
+    assert tracker.order == {session: list(range(10)) for session in ("a", "b", "c")}
+    assert tracker.overlaps == 0
+
+
+def test_concurrency_is_bounded_by_the_pool(scheduler):
+    tracker = Tracker()
+    futures = [scheduler.submit(f"session-{n}", tracker.job, f"session-{n}", n, 0.05) for n in range(12)]
+    for future in futures:
+        future.result(timeout=10)
+    assert tracker.peak == scheduler.max_workers
+    stats = scheduler.stats()
+    assert stats["completed"] == 12
+    assert stats["peak_queued"] >= 12 - scheduler.max_workers
+
+
+def test_busy_session_does_not_hold_up_other_sessions(scheduler):
+    tracker = Tracker()
+    slow = [scheduler.submit("slow", tracker.job, "slow", n, 0.05) for n in range(4)]
+    fast = scheduler.submit("fast", tracker.job, "fast", 0, 0)
+    fast.result(timeout=10)
+    assert not slow[-1].done()
+    for future in slow:
+        future.result(timeout=10)
+
+
+def test_failed_job_does_not_block_its_session(scheduler):
+    failing = scheduler.submit("a", lambda: 1 / 0)
+    following = scheduler.submit("a", lambda: "ok")
+    with pytest.raises(ZeroDivisionError):
+        failing.result(timeout=10)
+    assert following.result(timeout=10) == "ok"
+    assert scheduler.stats()["failed"] == 1
+    assert scheduler.stats()["active_sessions"] == 0
+
+
+def test_coroutine_jobs_run_blocking_calls_on_the_worker_thread(scheduler):
+    async def job():
+        return threading.current_thread().name, await asyncio.to_thread(lambda: threading.current_thread().name)
+
+    outer, inner = scheduler.submit("a", job).result(timeout=10)
+    assert outer.startswith("agent-run")
+    assert inner == outer
+
+
+def test_cancelled_job_is_skipped(scheduler):
+    first = scheduler.submit("a", time.sleep, 0.05)
+    second = scheduler.submit("a", lambda: "never")
+    third = scheduler.submit("a", lambda: "ran")
+    assert second.cancel()
+    first.result(timeout=10)
+    assert third.result(timeout=10) == "ran"
+    assert scheduler.stats()["cancelled"] == 1
+
+
+def test_shutdown_cancels_waiting_jobs_and_closes_worker_loops():
+    scheduler = SessionScheduler(max_workers=1)
+
+    async def job():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    running = scheduler.submit("a", job)
+    waiting = scheduler.submit("a", job)
+    time.sleep(0.01)
+    scheduler.shutdown()
+    assert running.result() == "done"
+    assert waiting.cancelled()
+    assert scheduler._loops == set()
+    with pytest.raises(RuntimeError):
+        scheduler.submit("a", job)
+
+
+def test_from_dict_ignores_unknown_keys():
+    scheduler = SessionScheduler.from_dict({"max_workers": 2, "unknown": True})
+    assert scheduler.max_workers == 2
+    scheduler.shutdown()
@@ -0,0 +1,146 @@
+import pytest
+
+from mapper.backend import SqliteBackend
+from mapper.codec import ContentCodec
+from mapper.engine import SqliteEngine
+from mapper.message_mapper import MessageMapper
+from mapper.migrations import migrate
+from mapper.models import Message, Session
+
+NOW = "2024-05-01T12:00:00"
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SqliteBackend(str(tmp_path / "search-test.db"), archive=True)
+    yield backend
+    backend.close()
+
+
+def add_session(backend, creator_id, session_id, *contents):
+    mappers = backend.mappers(creator_id)
+    mappers.session_mapper.create_session(Session(id=session_id, title=session_id, creatorId=creator_id,
+                                                  createdAt=NOW, updatedAt=NOW))
+    for n, content in enumerate(contents):
+        mappers.message_mapper.create_message(Message(
+            id=f"{session_id}-{n}", sessionId=session_id, content=content, role="user",
+            timestamp=f"{NOW[:-2]}{n:02d}", creatorId=creator_id))
+    return mappers.message_mapper
+
+
+def test_search_finds_messages_with_highlighted_snippets(backend):
+    messages = add_session(backend, "alice", "s1", "the weather in Paris is mild", "train tickets to Berlin")
+
+    hits, cursor = messages.search_messages("alice", "paris")
+
+    assert [(hit.messageId, hit.sessionId) for hit in hits] == [("s1-0", "s1")]
+    assert "[Paris]" in hits[0].snippet
+    assert cursor is None
+
+
+def test_search_only_returns_the_callers_messages(backend):
+    add_session(backend, "alice", "a", "quarterly budget review")
+    messages = add_session(backend, "bob", "b", "budget for the offsite")
+
+    assert [hit.messageId for hit in messages.search_messages("bob", "budget")[0]] == ["b-0"]
+    assert messages.search_messages("carol", "budget") == ([], None)
+
+
+def test_search_terms_are_literal_and_all_required(backend):
+    messages = add_session(backend, "alice", "s", 'say "hello world" OR NOT', "hello there")
+
+    assert [hit.messageId for hit in messages.search_messages("alice", "hello world")[0]] == ["s-0"]
+    assert [hit.messageId for hit in messages.search_messages("alice", 'OR NOT "hello')[0]] == ["s-0"]
+    assert messages.search_messages("alice", "   ") == ([], None)
+
+
+def test_search_pages_with_a_cursor(backend):
+    messages = add_session(backend, "alice", "s", *[f"meeting notes {n}" for n in range(5)])
+
+    first, cursor = messages.search_messages("alice", "meeting", limit=3)
+    second, last_cursor = messages.search_messages("alice", "meeting", limit=3, cursor=cursor)
+
+    assert len(first) == 3 and len(second) == 2 and last_cursor is None
+    assert {hit.messageId for hit in first + second} == {f"s-{n}" for n in range(5)}
+    with pytest.raises(ValueError):
+        messages.search_messages("alice", "meeting", cursor="-1")
+
+
+def test_short_terms_are_matched_as_substrings(backend):
+    messages = add_session(backend, "alice", "s", "明天开会讨论预算", "100% done_now", "会议记录")
+
+    assert [hit.messageId for hit in messages.search_messages("alice", "开会")[0]] == ["s-0"]
+    assert "[开会]" in messages.search_messages("alice", "开会")[0][0].snippet
+    assert [hit.messageId for hit in messages.search_messages("alice", "讨论预算 开会")[0]] == ["s-0"]
+    assert [hit.messageId for hit in messages.search_messages("alice", "0%")[0]] == ["s-1"]
+    assert messages.search_messages("alice", "o_") == ([], None)
+
+
+def test_archived_sessions_are_searchable_again_once_read_and_not_after_delete(backend):
+    messages = add_session(backend, "alice", "s", "invoice for the renovation")
+    messages.archive_session("s", NOW)
+
+    assert messages.search_messages("alice", "renovation") == ([], None)
+    messages.get_messages_by_session("s")
+    assert [hit.messageId for hit in messages.search_messages("alice", "renovation")[0]] == ["s-0"]
+
+    messages.delete_messages_by_session("s")
+    assert messages.search_messages("alice", "renovation") == ([], None)
+
+
+def test_the_index_keeps_no_plaintext_copy_and_reads_compressed_rows(tmp_path):
+    backend = SqliteBackend(str(tmp_path / "compressed.db"), codec=ContentCodec(threshold=16))
+    messages = add_session(backend, "alice", "s", "the renovation invoice is attached " * 4)
+
+    engine = backend.mappers("alice").engine
+    assert engine.query_one("SELECT COUNT(*) FROM sqlite_master WHERE name = 'message_fts_content'")[0] == 0
+    assert engine.query_one("SELECT codec FROM message WHERE id = 's-0'")[0] is not None
+    hits = messages.search_messages("alice", "invoice")[0]
+    assert [hit.messageId for hit in hits] == ["s-0"]
+    assert "[invoice]" in hits[0].snippet
+    backend.close()
+
+
+def test_owner_filter_is_exact_for_short_and_overlapping_creator_ids(backend):
+    add_session(backend, "alice", "a", "project kickoff agenda")
+    add_session(backend, "ali", "b", "project retro agenda")
+    messages = add_session(backend, "x", "c", "project budget agenda")
+
+    assert [hit.messageId for hit in messages.search_messages("ali", "agenda")[0]] == ["b-0"]
+    assert [hit.messageId for hit in messages.search_messages("x", "agenda")[0]] == ["c-0"]
+    assert [hit.messageId for hit in messages.search_messages("x", "do")[0]] == []
+
+
+def test_deleted_messages_leave_the_index(backend):
+    messages = add_session(backend, "alice", "s", "quarterly roadmap", "roadmap draft")
+    engine = backend.mappers("alice").engine
+
+    messages.delete_messages_by_session("s")
+    assert messages.search_messages("alice", "roadmap") == ([], None)
+    engine.write(lambda conn: conn.execute("INSERT INTO message_fts (message_fts) VALUES ('integrity-check')"))
+
+
+def test_upgrade_replaces_a_plaintext_index_with_the_external_content_table(tmp_path):
+    engine = SqliteEngine(str(tmp_path / "legacy.db"))
+    migrate(engine, target=9)
+
+    def legacy_index(conn):
+        conn.execute('DROP TABLE message_fts')
+        conn.execute('DROP VIEW message_fts_source')
+        conn.execute("CREATE VIRTUAL TABLE message_fts USING fts5(content)")
+        conn.execute('''INSERT INTO message (id, sessionId, content, tool, role, timestamp, creatorId, seq)
+                        VALUES ('m1', 's', '"legacy travel notes"', '""', 'user', ?, 'alice', 1)''', (NOW,))
+        rowid = conn.execute('''INSERT INTO message_search (messageId, sessionId, creatorId, role, timestamp)
+                                VALUES ('m1', 's', 'alice', 'user', ?)''', (NOW,)).lastrowid
+        conn.execute('INSERT INTO message_fts (rowid, content) VALUES (?, ?)', (rowid, "legacy travel notes"))
+        # a search row left behind by a message deleted before its index
+        conn.execute('''INSERT INTO message_search (messageId, sessionId, creatorId, role, timestamp)
+                        VALUES ('gone', 's', 'alice', 'user', ?)''', (NOW,))
+
+    engine.write(legacy_index)
+    messages = MessageMapper(engine=engine)
+
+    assert engine.query_one("SELECT COUNT(*) FROM sqlite_master WHERE name = 'message_fts_content'")[0] == 0
+    assert [hit.messageId for hit in messages.search_messages("alice", "travel")[0]] == ["m1"]
+    assert engine.query_one('SELECT COUNT(*) FROM message_search')[0] == 1
+    engine.close()
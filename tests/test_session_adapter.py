@@ -0,0 +1,74 @@
+import asyncio
+import concurrent.futures
+import threading
+
+import pytest
+
+pytest.importorskip("isek")
+pytest.importorskip("dotenv")
+
+from session_adapter import BackgroundLoop, SessionAdapter
+
+
+class EchoAgent:
+    name = "echo"
+
+    def run(self, prompt):
+        return f"echo: {prompt}"
+
+
+def test_background_loop_reuses_one_loop_thread():
+    loop = BackgroundLoop()
+
+    async def current():
+        return asyncio.get_running_loop(), threading.current_thread()
+
+    first = loop.run(current())
+    second = loop.run(current())
+    assert first == second
+    assert first[1] is not threading.current_thread()
+    loop.stop()
+    assert first[0].is_closed()
+
+
+def test_background_loop_runs_from_inside_another_running_loop():
+    loop = BackgroundLoop()
+
+    async def caller():
+        return loop.run(asyncio.sleep(0, result="done"))
+
+    assert asyncio.run(caller()) == "done"
+    loop.stop()
+
+
+def test_stop_cancels_running_coroutines():
+    loop = BackgroundLoop()
+    started = threading.Event()
+    outcome = []
+
+    async def forever():
+        started.set()
+        await asyncio.sleep(3600)
+
+    def call():
+        try:
+            loop.run(forever())
+        except BaseException as e:
+            outcome.append(type(e))
+
+    caller = threading.Thread(target=call)
+    caller.start()
+    assert started.wait(5)
+    loop.stop()
+    caller.join(5)
+    assert outcome == [concurrent.futures.CancelledError]
+
+
+def test_run_drives_requests_on_the_background_loop_and_shutdown_stops_it():
+    adapter = SessionAdapter(agent=EchoAgent())
+
+    assert "echo: hi" in adapter.run('{"type": "chat", "user_id": "u", "session_id": "s", "user_message": "hi"}')
+    assert adapter._background_loop._thread.is_alive()
+    thread = adapter._background_loop._thread
+    adapter.shutdown()
+    assert not thread.is_alive()